@@ -0,0 +1,6 @@
+"""
+Throughput benchmarks for the scraper pipeline.
+
+Run from priceScraper/agentScraping, e.g.:
+    python -m benchmarks.bench_embedding
+"""
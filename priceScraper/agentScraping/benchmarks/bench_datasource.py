@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Direct JSON extraction (core.datasource) vs browser rendering, on fixtures.
+
+Fetches every category page over plain HTTP, extracts its products from the
+embedded page data and cleans them with fairprice.clean_and_filter_products.
+Generated fixtures are checked against the products they were built from; with
+--browser the same pages are also rendered through crawl4ai with the CSS
+schema, both paths are compared product by product, and CPU time per page is
+reported for each (needs a Playwright browser, but no network).
+
+USAGE:
+    python -m benchmarks.bench_datasource --categories 20 --products 40
+    python -m benchmarks.bench_datasource --browser
+    python -m benchmarks.bench_datasource --fixtures path/to/recorded/pages --paths /category/bakery --browser
+"""
+
+import time, asyncio, argparse, tempfile
+import fairprice
+from core.datasource import DataSource, DEFAULT_FIELDS
+from benchmarks.fixtures import build_fairprice_site, serve_fixtures, fixture_product
+
+COMPARED_FIELDS = ('name', 'price', 'quantity')
+
+def product_keys(products):
+    return sorted(tuple(p.get(field, '') for field in COMPARED_FIELDS) for p in products)
+
+def direct(urls):
+    source = DataSource(dict({k: v for k, v in DEFAULT_FIELDS.items() if k != 'product_link'},
+                             product_url=lambda item: f"/product/{item['slug']}" if item.get('slug') else ''))
+    products, fallbacks = {}, 0
+    for url in urls:
+        rows, _ = source.fetch(url)
+        if rows is None:
+            fallbacks += 1
+            continue
+        products[url] = fairprice.clean_and_filter_products(rows, url)
+    return products, fallbacks
+
+async def browser(urls):
+    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+    from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
+    config = CrawlerRunConfig(extraction_strategy=JsonCssExtractionStrategy(fairprice.css_schema), verbose=False)
+    products = {}
+    async with AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False, text_mode=True)) as crawler:
+        for url in urls:
+            products[url] = await fairprice.extract_products(await crawler.arun(url, config=config))
+    return products
+
+def timed(fn, *args):
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+def main():
+    parser = argparse.ArgumentParser(description="Direct JSON extraction vs browser rendering")
+    parser.add_argument('--fixtures', help="directory of recorded pages (default: generate synthetic ones)")
+    parser.add_argument('--paths', nargs='*', help="category paths inside --fixtures")
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--products', type=int, default=40, help="products per generated category")
+    parser.add_argument('--browser', action='store_true', help="also render every page with crawl4ai")
+    args = parser.parse_args()
+
+    root = args.fixtures or tempfile.mkdtemp(prefix="datasource-fixtures-")
+    paths = args.paths or build_fairprice_site(root, args.categories, args.products, shared_products=0,
+                                               next_data=True)
+    server, base_url = serve_fixtures(root)
+    urls = [f"{base_url}{path}" for path in paths]
+
+    (direct_products, fallbacks), direct_wall, direct_cpu = timed(direct, urls)
+    total = sum(len(p) for p in direct_products.values())
+    print(f"\n📊 Direct extraction over {len(urls)} fixture pages")
+    print(f"   {total} products, {fallbacks} pages would fall back to the browser")
+    print(f"   {direct_wall:.2f}s wall, {direct_cpu * 1000 / len(urls):.1f}ms CPU per page "
+          f"({len(urls) / max(direct_cpu, 1e-9):.0f} pages per CPU-second)")
+
+    if not args.fixtures:
+        expected = [[fixture_product(path.rsplit('/', 1)[1], i) for i in range(args.products)] for path in paths]
+        expected = [{'name': p['name'], 'price': f"${p['price']}", 'quantity': p['quantity']}
+                    for items in expected for p in items]
+        actual = [p for products in direct_products.values() for p in products]
+        print(f"   matches fixture data  {'✅' if product_keys(expected) == product_keys(actual) else '❌'}")
+
+    if args.browser:
+        wall, cpu = time.perf_counter(), time.process_time()
+        rendered = asyncio.run(browser(urls))
+        browser_wall, browser_cpu = time.perf_counter() - wall, time.process_time() - cpu
+        same = all(product_keys(direct_products.get(url, [])) == product_keys(rendered[url]) for url in urls)
+        print("\n📊 Browser rendering over the same pages (CPU of this process; the browser's own is extra)")
+        print(f"   {sum(len(p) for p in rendered.values())} products, {browser_wall:.2f}s wall, "
+              f"{browser_cpu * 1000 / len(urls):.1f}ms CPU per page")
+        print(f"   wall-time speedup     {browser_wall / direct_wall:.1f}x")
+        print(f"   identical products    {'✅' if same else '❌'}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
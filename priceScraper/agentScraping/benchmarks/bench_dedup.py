@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Dedup scaling: the old `any(...)` scan vs the hash index in core.dedup.
+
+The old check compares every product against every product kept so far, so
+it is only run up to --legacy-max rows; the hash index is run on all sizes.
+
+USAGE:
+    python -m benchmarks.bench_dedup --sizes 1000 5000 10000 50000
+"""
+
+import time, random, argparse
+from core.dedup import Deduplicator
+
+def synthetic_rows(count, duplicate_ratio=0.2, seed=42):
+    """Rows with roughly `duplicate_ratio` repeats of earlier (name, price) pairs"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        if rows and rng.random() < duplicate_ratio:
+            rows.append(dict(rng.choice(rows)))
+        else:
+            rows.append({'name': f"Product {i} {rng.choice(['Milk', 'Bread', 'Rice', 'Eggs'])}",
+                         'supermarket': 'Sheng Siong', 'price': f"${rng.randint(1, 50)}.{rng.randint(0, 99):02d}"})
+    return rows
+
+def legacy_dedup(rows):
+    """The per-page check clean_and_filter_products used before"""
+    cleaned = []
+    for row in rows:
+        duplicate = any(
+            existing['name'].lower() == row['name'].lower() and existing['price'] == row['price']
+            for existing in cleaned
+        )
+        if not duplicate:
+            cleaned.append(row)
+    return cleaned
+
+def timed(fn, rows):
+    start = time.perf_counter()
+    result = fn(rows)
+    return time.perf_counter() - start, len(result)
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedup scaling benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000, 10000, 50000])
+    parser.add_argument('--legacy-max', type=int, default=10000)
+    args = parser.parse_args()
+
+    print("📊 Dedup scaling")
+    print(f"   {'rows':>7} {'kept':>7} {'any() scan':>12} {'hash index':>12} {'speedup':>9}")
+    for size in args.sizes:
+        rows = synthetic_rows(size)
+        hash_time, kept = timed(lambda r: Deduplicator().filter(r), rows)
+        if size <= args.legacy_max:
+            legacy_time, legacy_kept = timed(legacy_dedup, rows)
+            assert legacy_kept == kept, "hash index must keep the same rows as the old scan"
+            print(f"   {size:>7} {kept:>7} {legacy_time:>11.3f}s {hash_time:>11.4f}s {legacy_time / hash_time:>8.0f}x")
+        else:
+            print(f"   {size:>7} {kept:>7} {'(skipped)':>12} {hash_time:>11.4f}s {'':>9}")
+
+if __name__ == "__main__":
+    main()
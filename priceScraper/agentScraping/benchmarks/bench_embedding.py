@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput: the old per-product loop vs core.embedding.EmbeddingClient.
+
+Both run against the local stub backend, so the numbers only reflect request
+overhead and concurrency, not the real embedding model. The in-process
+hashing embedder (core.local_embedding) is timed alongside, with no backend.
+
+USAGE:
+    python -m benchmarks.bench_embedding --products 2000 --latency-ms 20
+"""
+
+import asyncio, time, argparse
+import requests
+from core.embedding import EmbeddingClient, embedding_text
+from core.local_embedding import HashingEmbedder
+from core.stub_backend import start_stub_backend
+
+def synthetic_products(count):
+    return [{'name': f"Product {i}", 'quantity': f"{100 + i % 900} g", 'price': f"${1 + i % 50}.{i % 100:02d}"}
+            for i in range(count)]
+
+async def legacy_add_embeddings(products, base_url):
+    """The loop coldstorage.py/shengsiong.py used: one blocking POST per product"""
+    for product in products:
+        response = await asyncio.to_thread(
+            requests.post,
+            f"{base_url}/products/embed-text",
+            headers={'Content-Type': 'application/json'},
+            json={"text": embedding_text(product)},
+            timeout=60,
+        )
+        if response.status_code == 200:
+            product["embedding"] = response.json().get('embedding')
+
+async def client_add_embeddings(products, base_url, batch_size, concurrency):
+    with EmbeddingClient(base_url, batch_size=batch_size, concurrency=concurrency) as client:
+        await client.embed_products(products)
+
+async def hashing_add_embeddings(products, workers):
+    with HashingEmbedder(workers=workers) as embedder:
+        await embedder.embed_products(products)
+
+def timed(label, count, coro):
+    start = time.perf_counter()
+    asyncio.run(coro)
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<40} {elapsed:8.2f}s {count / elapsed:10.1f} products/sec")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding client throughput benchmark")
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--legacy-products', type=int, default=200,
+                        help="the old loop is slow, so it runs on a smaller sample")
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None, help="hashing embedder processes (default: all cores)")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    batch_server, batch_url = start_stub_backend(latency=latency)
+    single_server, single_url = start_stub_backend(latency=latency, batch=False)
+
+    print(f"📊 Embedding throughput ({args.latency_ms:.0f}ms stub latency)")
+    timed("legacy loop", args.legacy_products,
+          legacy_add_embeddings(synthetic_products(args.legacy_products), single_url))
+    timed(f"client, no batch route (c={args.concurrency})", args.products,
+          client_add_embeddings(synthetic_products(args.products), single_url, args.batch_size, args.concurrency))
+    timed(f"client, batch={args.batch_size} (c={args.concurrency})", args.products,
+          client_add_embeddings(synthetic_products(args.products), batch_url, args.batch_size, args.concurrency))
+    timed("local hashing, no backend", args.products,
+          hashing_add_embeddings(synthetic_products(args.products), args.workers))
+
+    batch_server.shutdown()
+    single_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+FairPrice crawl: sequential category loop vs concurrent category deep crawls.
+
+Runs fairprice.scrape_categories against local HTML fixtures (needs crawl4ai
+and a Playwright browser, but no network), checks that both modes return the
+same products and prints the wall time of each.
+
+USAGE:
+    python -m benchmarks.bench_fairprice --categories 6 --latency-ms 200
+    python -m benchmarks.bench_fairprice --fixtures path/to/recorded/pages --paths /category/bakery /category/frozen
+"""
+
+import json, time, asyncio, argparse, tempfile
+from crawl4ai import AsyncWebCrawler, BrowserConfig
+import fairprice
+from benchmarks.fixtures import build_fairprice_site, serve_fixtures
+
+async def run(urls, concurrency):
+    async with AsyncWebCrawler(config=BrowserConfig(headless=True, verbose=False, text_mode=True)) as crawler:
+        start = time.perf_counter()
+        products = await fairprice.scrape_categories(crawler, urls, concurrency)
+        return products, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="FairPrice sequential vs parallel crawl benchmark")
+    parser.add_argument('--fixtures', help="directory of recorded pages (default: generate synthetic ones)")
+    parser.add_argument('--paths', nargs='*', help="category paths to crawl inside --fixtures")
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--products', type=int, default=12, help="products per generated category")
+    parser.add_argument('--latency-ms', type=float, default=200.0, help="added per page request")
+    parser.add_argument('--concurrency', type=int, default=fairprice.MAX_CONCURRENT_CATEGORIES)
+    args = parser.parse_args()
+
+    root = args.fixtures or tempfile.mkdtemp(prefix="fairprice-fixtures-")
+    paths = args.paths or build_fairprice_site(root, args.categories, args.products)
+    server, base_url = serve_fixtures(root, args.latency_ms / 1000)
+    urls = [f"{base_url}{path}" for path in paths]
+
+    sequential, sequential_time = asyncio.run(run(urls, 1))
+    parallel, parallel_time = asyncio.run(run(urls, args.concurrency))
+    server.shutdown()
+
+    # Pages inside one deep crawl finish in any order, so compare as sets
+    same = sorted(json.dumps(p, sort_keys=True) for p in sequential) == \
+        sorted(json.dumps(p, sort_keys=True) for p in parallel)
+    print(f"\n📊 FairPrice crawl over {len(urls)} fixture categories ({args.latency_ms:.0f}ms per page)")
+    print(f"   sequential        {sequential_time:8.2f}s  {len(sequential)} products")
+    print(f"   parallel (c={args.concurrency})  {parallel_time:8.2f}s  {len(parallel)} products")
+    print(f"   speedup           {sequential_time / parallel_time:8.2f}x")
+    print(f"   identical output  {'✅' if same else '❌'}")
+
+if __name__ == "__main__":
+    main()
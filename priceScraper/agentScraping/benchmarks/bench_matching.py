@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Cross-store matching: IVF index search vs an exact all-pairs scan.
+
+Synthetic stores share a set of items, each store adding its own noise to
+the item's vector (a different name or quantity format for the same
+product) plus items only it sells. The exact scan is a batched matrix
+product against every vector and is only run up to --exact-max products per
+store; recall@k is how many of its top k the index also returns.
+
+USAGE:
+    python -m benchmarks.bench_matching --sizes 1000 10000 30000
+"""
+
+import time, argparse
+import numpy as np
+from core.matching import IVFIndex, find_matches, normalize
+
+def synthetic_stores(size, stores=3, shared=0.3, dim=768, noise=0.3, categories=200, seed=42):
+    """{store: (rows, matrix)} with `shared` of each store's products sold by every store
+
+    Items are spread around `categories` centres, the way milks sit closer to
+    each other than to detergents.
+    """
+    rng = np.random.default_rng(seed)
+    shared_count = int(size * shared)
+    count = shared_count + stores * (size - shared_count)
+    centres = rng.normal(size=(categories, dim)).astype(np.float32)
+    items = normalize(centres[rng.integers(0, categories, count)] + rng.normal(size=(count, dim)).astype(np.float32))
+    result = {}
+    for s in range(stores):
+        own = shared_count + s * (size - shared_count)
+        ids = np.r_[0:shared_count, own:own + size - shared_count]
+        matrix = items[ids] + noise / np.sqrt(dim) * rng.normal(size=(size, dim)).astype(np.float32)
+        result[f"Store {s}"] = ([{'name': f"Item {i}", 'supermarket': f"Store {s}"} for i in ids], matrix)
+    return result
+
+def exact_search(queries, vectors, k, batch_size=1024):
+    queries, vectors = normalize(queries), normalize(vectors)
+    return np.concatenate([np.argsort(-(queries[i:i + batch_size] @ vectors.T), axis=1)[:, :k]
+                           for i in range(0, len(queries), batch_size)])
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-store matching benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 30000], help="products per store")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--exact-max', type=int, default=10000)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    args = parser.parse_args()
+
+    print("📊 Cross-store matching (3 stores)")
+    print(f"   {'per store':>9} {'build':>8} {'search':>8} {'exact':>8} {'recall@k':>9} {'match':>8} {'groups':>7} {'pure':>6}")
+    for size in args.sizes:
+        stores = synthetic_stores(size)
+        (_, a), (_, b) = list(stores.values())[:2]
+
+        start = time.perf_counter()
+        index = IVFIndex(b, nprobe=args.nprobe)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        _, found = index.search(a, args.k)
+        search = time.perf_counter() - start
+
+        if size <= args.exact_max:
+            start = time.perf_counter()
+            expected = exact_search(a, b, args.k)
+            exact = f"{time.perf_counter() - start:>7.2f}s"
+            recall = f"{np.mean([len(set(x) & set(y)) / args.k for x, y in zip(found, expected)]):>9.3f}"
+        else:
+            exact, recall = f"{'(skip)':>8}", f"{'':>9}"
+
+        start = time.perf_counter()
+        groups = find_matches(stores, threshold=args.threshold, nprobe=args.nprobe)
+        match = time.perf_counter() - start
+        # A pure group holds one item only; the synthetic names say which
+        pure = sum(1 for g in groups if len({p['name'] for p in g['products']}) == 1)
+        print(f"   {size:>9} {build:>7.2f}s {search:>7.2f}s {exact} {recall} {match:>7.2f}s {len(groups):>7} {pure:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Cleaning throughput: the old per-row regex code vs core.normalize.
+
+The legacy functions below are the Cold Storage and Sheng Siong
+`clean_and_filter_products` bodies from before core.normalize, with the
+`re.search`/`re.sub` calls exactly as they were. The new cleaners also parse
+price_cents and the structured quantity, so they do strictly more work; the
+benchmark checks that every field the old code produced is unchanged.
+
+USAGE:
+    python -m benchmarks.bench_normalize --rows 20000 --repeat 3
+"""
+
+import re, time, random, argparse
+from coldstorage import clean_and_filter_products as coldstorage_clean
+from shengsiong import clean_and_filter_products as shengsiong_clean
+from core.normalize import parse_quantity, parse_price_cents, space_quantity, quantity_slug
+
+QUANTITIES = ['1kg', '500g', '1.5 kg', '6 x 250ml', '2x500g', '10s', '3 pcs', '1L', '330ml', '12 pack']
+NAMES = ['Fresh Milk', 'Jasmine Rice', 'Kampong Eggs', 'Greek Yoghurt - Plain', "Farmer's Choice Bread",
+         'Orange Juice (No Sugar)', 'Chicken   Breast', 'Instant Noodles']
+
+def synthetic_rows(count, seed=42):
+    """Raw extracted rows in both stores' shapes"""
+    rng = random.Random(seed)
+    coldstorage, shengsiong = [], []
+    for i in range(count):
+        name, quantity = f"{rng.choice(NAMES)} {i}", rng.choice(QUANTITIES)
+        price = f"${rng.randint(1, 1500):,}.{rng.randint(0, 99):02d}"
+        # Half the Cold Storage rows carry the quantity only at the end of the name
+        inline = rng.random() < 0.5
+        coldstorage.append({'full_name': f"{name} {quantity}" if inline else name,
+                            'quantity': '' if inline else quantity, 'price': f" {price} ",
+                            'promotion_description': rng.choice(['', 'new', '2 for $5']),
+                            'image_url': f"/img/{i}.jpg", 'product_link': f"/en/p/{i}"})
+        shengsiong.append({'name': name, 'quantity': quantity, 'price': price,
+                           'promotion_description': '', 'image_url': f"/img/{i}.jpg"})
+    return coldstorage, shengsiong
+
+def legacy_coldstorage(raw_products, page_url):
+    cleaned_products = []
+    for raw_product in raw_products:
+        full_name = raw_product.get('full_name', '').strip()
+        quantity_field = raw_product.get('quantity', '').strip()
+        price = raw_product.get('price', '').strip()
+        promotion = raw_product.get('promotion_description', '').strip()
+        image_url = raw_product.get('image_url', '').strip()
+        product_link = raw_product.get('product_link', '').strip()
+        if not full_name or len(full_name) < 2:
+            continue
+        name = full_name
+        quantity = quantity_field if quantity_field else ""
+        if not quantity:
+            quantity_patterns = [
+                r'\b(\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb|pc|pcs|pack|s))\b$',
+                r'\b(\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb))\b$',
+                r'\b(\d+(?:\.\d+)?x\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb))\b$',
+                r'\b(\d+\s*(?:kg|g|ml|l|oz|lb|pc|pcs|pack|s))\b$',
+                r'\b(\d+(?:\.\d+)?\s*(?:kg|g|ml|l|oz|lb))\b$'
+            ]
+            for pattern in quantity_patterns:
+                match = re.search(pattern, full_name, re.IGNORECASE)
+                if match:
+                    quantity = match.group(1).strip()
+                    name = re.sub(pattern, '', full_name, flags=re.IGNORECASE).strip()
+                    break
+        name = re.sub(r'\s+', ' ', name).strip()
+        if price:
+            price_match = re.search(r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)', price)
+            price = f"${price_match.group(1)}" if price_match else ""
+        if quantity:
+            quantity = re.sub(r'\s+', ' ', quantity).strip()
+            quantity = re.sub(r'(\d+)([a-zA-Z]+)', r'\1 \2', quantity)
+        if promotion:
+            promotion = re.sub(r'\s+', ' ', promotion).strip()
+            if promotion.lower() in ['new', 'popular', 'bestseller', '']:
+                promotion = ""
+        if product_link.startswith('/en/p/'):
+            product_url = f"https://coldstorage.com.sg{product_link}"
+        else:
+            slug = name.lower()
+            slug = re.sub(r'[^\w\s-]', '', slug)
+            slug = re.sub(r'[-\s]+', '-', slug)
+            slug = slug.strip('-')
+            product_url = f"https://coldstorage.com.sg/en/search?q={slug}"
+        if image_url and not image_url.startswith('http'):
+            image_url = f"https://coldstorage.com.sg{image_url}"
+        cleaned_products.append({'name': name, 'supermarket': 'Cold Storage', 'quantity': quantity,
+                                 'price': price, 'promotion_description': promotion,
+                                 'promotion_end_date_text': '', 'product_url': product_url,
+                                 'image_url': image_url, 'embedding': None})
+    return cleaned_products
+
+def legacy_shengsiong(raw_products, page_url):
+    cleaned_products = []
+    for raw_product in raw_products:
+        name = raw_product.get('name', '').strip()
+        quantity = raw_product.get('quantity', '').strip()
+        price = raw_product.get('price', '').strip()
+        promotion = raw_product.get('promotion_description', '').strip()
+        image_url = raw_product.get('image_url', '').strip()
+        if not name or len(name) < 3 or not price:
+            continue
+        name = re.sub(r'\s+', ' ', name).strip()
+        price_match = re.search(r'\$(\d+(?:,\d{3})*(?:\.\d{2})?)', price)
+        if not price_match:
+            continue
+        price = f"${price_match.group(1)}"
+        if quantity:
+            quantity = re.sub(r'\s+', ' ', quantity).strip()
+        if promotion:
+            promotion = re.sub(r'\s+', ' ', promotion).strip()
+        slug = name.lower()
+        slug = re.sub(r'[^\w\s-]', '', slug)
+        slug = re.sub(r'[-\s]+', '-', slug)
+        slug = slug.strip('-')
+        if quantity:
+            qty_clean = re.sub(r'[^\w]', '-', quantity.lower())
+            slug = f"{slug}-{qty_clean}"
+            slug = re.sub(r'-+', '-', slug).strip('-')
+        product_url = f"https://shengsiong.com.sg/product/{slug}"
+        if image_url and not image_url.startswith('http'):
+            image_url = f"https://shengsiong.com.sg{image_url}"
+        cleaned_products.append({'name': name, 'supermarket': 'Sheng Siong', 'quantity': quantity,
+                                 'price': price, 'promotion_description': promotion,
+                                 'promotion_end_date_text': '', 'product_url': product_url,
+                                 'image_url': image_url, 'embedding': None})
+    return cleaned_products
+
+def best_time(fn, pages, repeat):
+    """Best wall time over `repeat` runs of fn over every page; returns (seconds, products)"""
+    best, products = None, []
+    for _ in range(repeat):
+        for cached in (parse_quantity, parse_price_cents, space_quantity, quantity_slug):
+            cached.cache_clear()
+        pages_copy = [[dict(row) for row in page] for page in pages]
+        start = time.perf_counter()
+        products = [p for page in pages_copy for p in fn(page, 'https://example.test/')]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, products
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalization throughput benchmark")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    coldstorage_rows, shengsiong_rows = synthetic_rows(args.rows)
+    pages = lambda rows: [rows[i:i + args.page_size] for i in range(0, len(rows), args.page_size)]
+
+    print(f"📊 Cleaning {args.rows} rows in pages of {args.page_size} (best of {args.repeat})")
+    print(f"   {'store':<13} {'per-row re':>12} {'normalize':>12} {'speedup':>8}")
+    for store, rows, legacy, new in [('Cold Storage', coldstorage_rows, legacy_coldstorage, coldstorage_clean),
+                                     ('Sheng Siong', shengsiong_rows, legacy_shengsiong, shengsiong_clean)]:
+        legacy_time, expected = best_time(legacy, pages(rows), args.repeat)
+        new_time, actual = best_time(new, pages(rows), args.repeat)
+        # Page-level dedup may drop rows in the new cleaners; compare what both kept
+        kept = {p['product_url']: p for p in actual}
+        for product in expected:
+            if product['product_url'] in kept:
+                got = kept[product['product_url']]
+                assert all(got[k] == v for k, v in product.items()), f"field mismatch: {product} vs {got}"
+        print(f"   {store:<13} {args.rows / legacy_time:>9.0f}/s {args.rows / new_time:>9.0f}/s {legacy_time / new_time:>7.1f}x")
+
+    parsed = [p for p in actual if p['quantity_unit']]
+    print(f"\n   Sheng Siong quantities parsed: {len(parsed)}/{len(actual)}, priced: "
+          f"{sum(1 for p in actual if p['price_cents'] is not None)}/{len(actual)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Event loop lag while extracted pages are parsed and cleaned: on the loop vs
+in core.offload's worker processes.
+
+Crawls of --categories categories run at once, each handing --pages pages of
+--page-size Cold Storage rows (as extracted JSON text) to the cleaner, the
+way adapter.products_from_results() does after a deep crawl. A watcher
+sleeps LAG_INTERVAL at a time meanwhile and records how late it wakes up;
+that delay is what every other page in flight waits too. Worker start-up
+is paid before timing starts.
+
+USAGE:
+    python -m benchmarks.bench_offload --workers 0 2 4
+"""
+
+import json, time, asyncio, argparse
+from coldstorage import clean_and_filter_products
+from core.offload import CleaningPool
+from core.metrics import LAG_INTERVAL
+from benchmarks.bench_normalize import synthetic_rows
+
+PAGE_URL = "https://coldstorage.com.sg/en/category/100011/1.html"
+
+async def crawl(pool, pages):
+    """One category: its pages arrive a little apart, then are cleaned together"""
+    await asyncio.sleep(0.01)
+    cleaned = await pool.clean_pages(clean_and_filter_products, [(page, PAGE_URL) for page in pages])
+    return sum(len(products or []) for products, _, _ in cleaned)
+
+async def run(pool, categories):
+    loop = asyncio.get_running_loop()
+    lags, done = [], False
+
+    async def watch():
+        while not done:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lags.append(max(0.0, loop.time() - start - LAG_INTERVAL))
+
+    watcher = asyncio.create_task(watch())
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(crawl(pool, pages) for pages in categories))
+    elapsed = time.perf_counter() - start
+    done = True
+    await watcher
+    return sum(counts), elapsed, sorted(lags) or [0.0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop lag benchmark for offloaded cleaning")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4], help="0 = clean on the event loop")
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--pages', type=int, default=20, help="pages per category")
+    parser.add_argument('--page-size', type=int, default=200, help="rows per page")
+    args = parser.parse_args()
+
+    rows, _ = synthetic_rows(args.categories * args.pages * args.page_size)
+    size = args.page_size
+    pages = [json.dumps(rows[i:i + size]) for i in range(0, len(rows), size)]
+    categories = [pages[i:i + args.pages] for i in range(0, len(pages), args.pages)]
+
+    print(f"📊 Cleaning {len(rows)} rows: {args.categories} categories x {args.pages} pages x {size} rows")
+    print(f"   {'workers':>7} {'time':>8} {'rows/s':>9} {'lag p50':>9} {'lag max':>9}")
+    for workers in args.workers:
+        pool = CleaningPool(workers)
+        if workers:
+            asyncio.run(pool.clean_pages(clean_and_filter_products, [(pages[0], PAGE_URL)] * workers))  # Warm up
+        cleaned, elapsed, lags = asyncio.run(run(pool, categories))
+        pool.close()
+        print(f"   {workers:>7} {elapsed:>7.2f}s {cleaned / elapsed:>9.0f} "
+              f"{lags[len(lags) // 2] * 1000:>7.1f}ms {lags[-1] * 1000:>7.1f}ms")
+
+if __name__ == "__main__":
+    main()
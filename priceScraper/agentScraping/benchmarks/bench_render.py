@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Render profiles on fixture pages: bytes transferred and render time.
+
+Renders infinite-scroll listing pages (benchmarks/fixtures.build_render_site)
+once with the full profile the stores used before (everything loaded, 1s
+scroll steps) and once per light-profile scroll delay, counting the bytes the
+fixture server sent and the products extracted. The smallest delay that still
+loads every product is the one to configure; it depends on how long the
+site's product feed takes (--feed-latency-ms). Needs crawl4ai and a
+Playwright browser, but no network.
+
+USAGE:
+    python -m benchmarks.bench_render
+    python -m benchmarks.bench_render --feed-latency-ms 400 --delays 1.0 0.5 0.3 0.1
+"""
+
+import time, asyncio, argparse, tempfile
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
+import fairprice
+from core.render_profile import RenderProfile, install_render_hooks
+from benchmarks.fixtures import build_render_site, serve_fixtures
+
+async def render(server, urls, profile):
+    """(products, seconds per page, bytes sent) for rendering `urls` with `profile`"""
+    config = CrawlerRunConfig(extraction_strategy=JsonCssExtractionStrategy(fairprice.css_schema, verbose=False),
+                              verbose=False, **profile.run_kwargs())
+    browser_config = BrowserConfig(headless=True, verbose=False, text_mode=False)
+    async with AsyncWebCrawler(config=browser_config) as crawler:
+        install_render_hooks(crawler)
+        bytes_before = server.bytes_sent
+        start = time.perf_counter()
+        products = 0
+        for url in urls:
+            results = await crawler.arun(url, config=config)
+            products += len(await fairprice.extract_products(results))
+        elapsed = time.perf_counter() - start
+    return products, elapsed / len(urls), server.bytes_sent - bytes_before
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs light render profile on fixture pages")
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--products', type=int, default=60, help="products per page")
+    parser.add_argument('--batch', type=int, default=20, help="products per infinite-scroll batch")
+    parser.add_argument('--feed-latency-ms', type=float, default=250, help="delay of each infinite-scroll batch")
+    parser.add_argument('--delays', type=float, nargs='*', default=[1.0, 0.5, 0.3, 0.1],
+                        help="light-profile scroll delays to try")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="render-fixtures-")
+    server, base_url = serve_fixtures(root, path_latency={'/feed/': args.feed_latency_ms / 1000})
+    # The same server under another host name plays the third-party tracker
+    paths = build_render_site(root, base_url.replace('127.0.0.1', 'localhost'), args.pages, args.products, args.batch)
+    urls = [f"{base_url}{path}" for path in paths]
+    expected = args.pages * args.products
+
+    runs = [('full, 1.0s', RenderProfile.full())]
+    runs += [(f"light, {delay}s", RenderProfile(scroll_delay=delay)) for delay in args.delays]
+    rows = []
+    for label, profile in runs:
+        products, seconds, sent = asyncio.run(render(server, urls, profile))
+        rows.append((label, products, seconds, sent, profile))
+    server.shutdown()
+
+    print(f"\n📊 {len(urls)} pages, {expected} products, {args.feed_latency_ms:.0f}ms feed latency")
+    print(f"   {'profile':<14}{'products':>10}{'s/page':>9}{'KB/page':>10}")
+    for label, products, seconds, sent, _ in rows:
+        mark = '✅' if products == expected else '❌'
+        print(f"   {label:<14}{products:>10}{seconds:>9.2f}{sent / 1024 / len(urls):>10.0f}  {mark}")
+    complete = [row for row in rows[1:] if row[1] == expected]
+    if complete:
+        label, _, seconds, sent, profile = min(complete, key=lambda row: row[2])
+        _, _, base_seconds, base_sent, _ = rows[0]
+        print(f"\n   Fastest complete light profile: {label} -> {base_seconds / seconds:.1f}x faster, "
+              f"{100 * (1 - sent / max(base_sent, 1)):.0f}% fewer bytes")
+        print(f"   {profile.summary()}")
+    else:
+        print("\n   ❌ No light profile loaded every product; try longer --delays")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Offline HTML fixtures and a local server for crawl benchmarks.
+
+Pages are written as files under a fixture root and served by path, e.g.
+root/category/bakery.html answers http://127.0.0.1:PORT/category/bakery.
+A directory of recorded pages laid out the same way can be served instead of
+the generated ones (see --fixtures in the benchmark scripts).
+
+The generated pages reproduce only the markup the store selectors read, so
+extraction behaves like it does on the live sites. With next_data=True the
+category pages also embed their products as Next.js page data, the way the
+direct extraction in core/datasource.py reads them. build_render_site() adds
+what a real listing page also downloads (images, a video, a web font, a
+third-party tracker) and loads its products in infinite-scroll batches.
+The server counts the bytes it sends, so a benchmark can see what a render
+profile saves.
+"""
+
+import os, json, time, threading
+from urllib.parse import urlparse
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+FAIRPRICE_PRODUCT = """
+<div class="sc-ceabcf8-7">
+  <div class="sc-976d3ef0-3"><img class="sc-976d3ef0-5" src="/images/{slug}.jpg"></div>
+  <div class="sc-747538d2-0">
+    <div class="sc-747538d2-6"><span class="sc-747538d2-3">{name}</span><span class="sc-e94e62e6-2">{quantity}</span></div>
+    <div class="sc-747538d2-2"><span class="sc-747538d2-3">${price}</span></div>
+    <div class="sc-747538d2-8"><span class="sc-ab6170a9-1">{promotion}</span><span class="sc-747538d2-11">{promotion_end}</span></div>
+  </div>
+  <a href="/product/{slug}">View</a>
+</div>
+"""
+
+RENDER_PAGE = """<html><head>
+<link rel="stylesheet" href="/assets/site.css">
+<script src="{tracker_url}"></script>
+</head><body>
+<video src="/assets/promo.mp4" autoplay muted preload="auto"></video>
+<div id="products">{first_batch}</div>
+<script>
+(function () {{
+  var page = "{page}", batches = {batches}, next = 1, loading = false;
+  function more() {{
+    if (loading || next >= batches) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+    loading = true;
+    fetch("/feed/" + page + "/" + next + ".html").then(function (r) {{ return r.text(); }}).then(function (html) {{
+      document.getElementById("products").insertAdjacentHTML("beforeend", html);
+      next += 1;
+      loading = false;
+      more();
+    }});
+  }}
+  window.addEventListener("scroll", more);
+}})();
+</script>
+</body></html>"""
+RENDER_CSS = "@font-face { font-family: Shop; src: url(/assets/shop.woff2); } body { font-family: Shop; }"
+
+def _write(root, path, html):
+    file_path = os.path.join(root, path.strip('/') + '.html')
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(f"<html><body>{html}</body></html>")
+
+def fixture_product(category, i):
+    return {
+        'slug': f"{category}-item-{i}",
+        'name': f"{category.title()} Item {i}",
+        'quantity': f"{100 + 50 * (i % 10)} g",
+        'price': f"{1 + i % 20}.{(i * 7) % 100:02d}",
+        'promotion': "2 for $5" if i % 4 == 0 else "",
+        'promotion_end': "Valid till 31 Dec" if i % 4 == 0 else "",
+    }
+
+def next_data_script(items):
+    """<script id="__NEXT_DATA__"> carrying the products of a listing page"""
+    products = [{
+        'name': p['name'],
+        'slug': p['slug'],
+        'final_price': float(p['price']),
+        'metaData': {'DisplayUnit': p['quantity']},
+        'images': [f"/images/{p['slug']}.jpg"],
+    } for p in items]
+    data = {'props': {'pageProps': {'data': {'product': products, 'category': {'name': 'Fixture'}}}}}
+    return f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script>'
+
+def build_fairprice_site(root, categories=4, products_per_category=12, shared_products=2, next_data=False):
+    """Category listing pages that link to product pages; returns the category paths
+
+    The first `shared_products` items of each category also appear in the next
+    category, like SKUs listed under several FairPrice categories.
+    """
+    paths = []
+    for c in range(categories):
+        category = f"category-{c}"
+        items = [fixture_product(category, i) for i in range(products_per_category)]
+        if c + 1 < categories:
+            items += [fixture_product(f"category-{c + 1}", i) for i in range(shared_products)]
+        html = ''.join(FAIRPRICE_PRODUCT.format(**p) for p in items)
+        _write(root, f"/category/{category}", html + (next_data_script(items) if next_data else ''))
+        for p in items:
+            _write(root, f"/product/{p['slug']}", FAIRPRICE_PRODUCT.format(**p))
+        paths.append(f"/category/{category}")
+    return paths
+
+def _write_raw(root, path, data):
+    file_path = os.path.join(root, path.strip('/'))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+
+def build_render_site(root, third_party_origin, pages=4, products_per_page=60, batch_size=20,
+                      image_bytes=30_000, asset_bytes=200_000):
+    """Infinite-scroll listing pages with the assets a real one pulls in; returns the page paths
+
+    Each page ships its first `batch_size` products and fetches the rest from
+    /feed/<page>/<n>.html as the user scrolls to the bottom. The tracker script
+    is loaded from `third_party_origin` (e.g. the same server addressed as
+    localhost while pages are opened on 127.0.0.1), so it counts as third party.
+    """
+    _write_raw(root, '/assets/site.css', RENDER_CSS)
+    _write_raw(root, '/assets/shop.woff2', os.urandom(asset_bytes // 4))
+    _write_raw(root, '/assets/promo.mp4', os.urandom(asset_bytes))
+    _write_raw(root, '/assets/tracker.js', f"/*{'x' * asset_bytes}*/ window.tracked = true;")
+    paths = []
+    for page in range(pages):
+        name = f"render-{page}"
+        items = [fixture_product(name, i) for i in range(products_per_page)]
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        for n, batch in enumerate(batches[1:], 1):
+            _write_raw(root, f"/feed/{name}/{n}.html", ''.join(FAIRPRICE_PRODUCT.format(**p) for p in batch))
+        for p in items:
+            _write_raw(root, f"/images/{p['slug']}.jpg", os.urandom(image_bytes))
+        _write_raw(root, f"/listing/{name}.html", RENDER_PAGE.format(
+            tracker_url=f"{third_party_origin}/assets/tracker.js", page=name, batches=len(batches),
+            first_batch=''.join(FAIRPRICE_PRODUCT.format(**p) for p in batches[0]),
+        ))
+        paths.append(f"/listing/{name}")
+    return paths
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    # Set per server in serve_fixtures()
+    latency = 0.0
+    path_latency = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def translate_path(self, path):
+        file_path = super().translate_path(path.split('?')[0])
+        if not os.path.exists(file_path) and os.path.exists(file_path + '.html'):
+            return file_path + '.html'
+        return file_path
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        delay = self.latency + sum(d for prefix, d in self.path_latency.items() if path.startswith(prefix))
+        if delay:
+            time.sleep(delay)
+        super().do_GET()
+
+    def copyfile(self, source, outputfile):
+        data = source.read()
+        outputfile.write(data)
+        with self.server.stats_lock:
+            self.server.bytes_sent += len(data)
+            self.server.requests += 1
+
+def serve_fixtures(root, latency=0.0, path_latency=None):
+    """Serve `root` in a daemon thread; returns (server, base_url)
+
+    Every request waits `latency` seconds, plus the delay of each matching
+    prefix in `path_latency` (e.g. {'/feed/': 0.3} for a slow product feed).
+    server.bytes_sent and server.requests count the response bodies sent.
+    """
+    handler = type('Handler', (FixtureHandler,), {'latency': latency, 'path_latency': path_latency or {}})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), lambda *args: handler(*args, directory=root))
+    server.daemon_threads = True
+    server.stats_lock = threading.Lock()
+    server.bytes_sent = server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
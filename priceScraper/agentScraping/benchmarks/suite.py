@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: one run, every stage, one JSON report.
+
+Sections (all offline; the backend is core.stub_backend on a local port):
+    cleaning   rows/s through the Cold Storage and Sheng Siong cleaners, page by page
+    dedup      rows/s of core.dedup at growing sizes, and how per-row cost scales
+    embedding  products/s through EmbeddingClient, and the share that failed
+    upload     products/s through AdaptiveUploader, with retries and batch latency
+    pipeline   products/s from cleaned pages through dedup, embedding and upload (StreamingPipeline)
+    matching   products/s through cross-store matching (core.matching) on synthetic embeddings
+
+The stub's latency and error rate are set from the command line; injected
+errors come from a seeded generator, so two runs see the same failures.
+Every metric records its unit and whether higher is better, and --baseline
+compares against an earlier report, printing the change per metric and
+exiting with status 1 when one got worse by more than --tolerance.
+
+USAGE:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --quick --only cleaning dedup
+    python -m benchmarks.suite --latency-ms 50 --error-rate 0.05 --output report.json
+    python -m benchmarks.suite --baseline cache/benchmarks/suite-20240101-120000.json
+"""
+
+import os, io, sys, json, time, asyncio, argparse, platform, subprocess
+from datetime import datetime
+from contextlib import redirect_stdout
+from coldstorage import clean_and_filter_products as coldstorage_clean
+from shengsiong import clean_and_filter_products as shengsiong_clean
+from core.normalize import parse_quantity, parse_price_cents, space_quantity, quantity_slug
+from core.dedup import Deduplicator
+from core.embedding import EmbeddingClient, embedding_text
+from core.upload import AdaptiveUploader, percentile
+from core.pipeline import StreamingPipeline
+from core.stub_backend import start_stub_backend
+from core.matching import find_matches
+from benchmarks.bench_normalize import synthetic_rows as synthetic_raw_rows
+from benchmarks.bench_dedup import synthetic_rows as synthetic_dedup_rows
+from benchmarks.bench_matching import synthetic_stores
+
+SECTIONS = ('cleaning', 'dedup', 'embedding', 'upload', 'pipeline', 'matching')
+REPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "benchmarks")
+PAGE_SIZE = 40  # Products per listing page fed to the cleaners
+COLDSTORAGE_PAGE = "https://coldstorage.com.sg/en/category/100011/1.html"
+SHENGSIONG_PAGE = "https://shengsiong.com.sg/breakfast-spreads"
+
+def metric(value, unit, higher_is_better=True):
+    return {'value': round(value, 4), 'unit': unit, 'higher_is_better': higher_is_better}
+
+def pages(rows, size=PAGE_SIZE):
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+def quietly(coro):
+    """Run a coroutine with the per-batch progress lines discarded"""
+    with redirect_stdout(io.StringIO()):
+        return asyncio.run(coro)
+
+def clear_normalize_caches():
+    for cached in (parse_quantity, parse_price_cents, space_quantity, quantity_slug):
+        cached.cache_clear()
+
+def best_of(repeat, fn):
+    """Fastest of `repeat` runs of fn(), in seconds (normalize caches start cold every time)"""
+    times = []
+    for _ in range(repeat):
+        clear_normalize_caches()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def synthetic_products(count):
+    return [{'name': f"Product {i}", 'supermarket': 'Sheng Siong', 'quantity': f"{100 + i % 900} g",
+             'price': f"${1 + i % 50}.{i % 100:02d}", 'product_url': f"https://example.com/p/{i}",
+             'embedding': None} for i in range(count)]
+
+def bench_cleaning(args):
+    coldstorage_rows, shengsiong_rows = synthetic_raw_rows(args.rows)
+    results = {}
+    for store, rows, clean, page_url in [('coldstorage', coldstorage_rows, coldstorage_clean, COLDSTORAGE_PAGE),
+                                         ('shengsiong', shengsiong_rows, shengsiong_clean, SHENGSIONG_PAGE)]:
+        seconds = best_of(args.repeat, lambda: [clean(page, page_url) for page in pages(rows)])
+        results[f"cleaning.{store}"] = metric(len(rows) / seconds, 'rows/s')
+    return results
+
+def bench_dedup(args):
+    results, per_row = {}, {}
+    for size in args.dedup_sizes:
+        rows = synthetic_dedup_rows(size)
+        seconds = best_of(args.repeat, lambda: Deduplicator().filter(rows))
+        per_row[size] = seconds / size
+        results[f"dedup.{size}"] = metric(size / seconds, 'rows/s')
+    smallest, largest = min(per_row), max(per_row)
+    # 1.0 means per-row cost does not grow with the catalogue (linear overall)
+    results['dedup.scaling'] = metric(per_row[largest] / per_row[smallest], 'x per-row cost', higher_is_better=False)
+    return results
+
+def bench_embedding(args, base_url):
+    texts = [embedding_text(p) for p in synthetic_products(args.products)]
+
+    async def run():
+        with EmbeddingClient(base_url, batch_size=args.batch_size, concurrency=args.concurrency) as client:
+            start = time.perf_counter()
+            embeddings = await client.embed_texts(texts)
+            return embeddings, time.perf_counter() - start
+
+    embeddings, seconds = quietly(run())
+    failed = sum(1 for e in embeddings if e is None)
+    return {
+        'embedding.throughput': metric(len(texts) / seconds, 'products/s'),
+        'embedding.failed': metric(failed / len(texts), 'share of products', higher_is_better=False),
+    }
+
+def bench_upload(args, base_url):
+    products = synthetic_products(args.products)
+
+    async def run():
+        with AdaptiveUploader(base_url, concurrency=args.concurrency) as uploader:
+            uploaded = await uploader.upload(products)
+            return uploaded, uploader
+
+    uploaded, uploader = quietly(run())
+    latencies = sorted(uploader.latencies)
+    return {
+        'upload.throughput': metric(len(uploaded) / uploader.elapsed, 'products/s'),
+        'upload.uploaded': metric(len(uploaded) / len(products), 'share of products'),
+        'upload.retries': metric(uploader.retries, 'retries', higher_is_better=False),
+        'upload.batch_p50': metric(percentile(latencies, 50), 's', higher_is_better=False),
+        'upload.batch_p90': metric(percentile(latencies, 90), 's', higher_is_better=False),
+    }
+
+def bench_pipeline(args, base_url):
+    _, raw_rows = synthetic_raw_rows(args.products)
+
+    async def run():
+        with EmbeddingClient(base_url, batch_size=args.batch_size, concurrency=args.concurrency) as client, \
+                AdaptiveUploader(base_url, concurrency=args.concurrency) as uploader:
+            pipeline = StreamingPipeline(embed=client.embed_products, upload=uploader.upload,
+                                         embed_batch_size=args.batch_size * args.concurrency,
+                                         dedup=Deduplicator(), collect=False)
+            start = time.perf_counter()
+            async with pipeline:
+                for page in pages(raw_rows):
+                    await pipeline.put(shengsiong_clean(page, SHENGSIONG_PAGE))
+            return pipeline.stats['scrape']['products'], time.perf_counter() - start
+
+    products, seconds = quietly(run())
+    return {'pipeline.throughput': metric(products / seconds, 'products/s')}
+
+def bench_matching(args):
+    stores = synthetic_stores(args.match_size)
+    products = sum(len(rows) for rows, _ in stores.values())
+    groups = []
+    seconds = best_of(args.repeat, lambda: groups.append(find_matches(stores, threshold=0.8)))
+    # Synthetic names say which item a product is; a pure group holds one item only
+    pure = sum(1 for g in groups[-1] if len({p['name'] for p in g['products']}) == 1)
+    return {
+        'matching.throughput': metric(products / seconds, 'products/s'),
+        'matching.pure_groups': metric(pure / max(1, len(groups[-1])), 'share of groups'),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(report, baseline, tolerance):
+    """Print the change of every metric against `baseline`; returns the names that regressed"""
+    regressed = []
+    print(f"\n📈 Against {baseline.get('created', '?')} ({baseline.get('commit') or 'unknown commit'})")
+    settings = baseline.get('settings', {})
+    changed = [f"{k} {settings[k]} -> {v}" for k, v in report['settings'].items()
+               if k != 'only' and k in settings and settings[k] != v]
+    if changed:
+        print(f"   ⚠️ Settings differ, so the numbers are not like for like: {'; '.join(changed)}")
+    for name, current in report['metrics'].items():
+        previous = baseline.get('metrics', {}).get(name)
+        if previous is None:
+            print(f"   {name:<26} {'(new)':>12}")
+            continue
+        if previous['value']:
+            change = (current['value'] - previous['value']) / abs(previous['value'])
+            worse = (-change if current['higher_is_better'] else change) > tolerance
+            shown = f"{change:>+8.1%}"
+        else:
+            worse = current['value'] < 0 if current['higher_is_better'] else current['value'] > 0
+            shown = f"{'n/a':>8}"
+        if worse:
+            regressed.append(name)
+        print(f"   {name:<26} {previous['value']:>12.4g} -> {current['value']:<12.4g} {shown}  {'⚠️' if worse else '✅'}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper pipeline benchmark suite with a JSON report")
+    parser.add_argument('--only', nargs='*', choices=SECTIONS, help="sections to run (default: all)")
+    parser.add_argument('--quick', action='store_true', help="small sizes, for a smoke test")
+    parser.add_argument('--rows', type=int, default=20000, help="raw rows per store for cleaning")
+    parser.add_argument('--dedup-sizes', type=int, nargs='*', default=[1000, 10000, 100000])
+    parser.add_argument('--products', type=int, default=5000, help="products for embedding/upload/pipeline")
+    parser.add_argument('--match-size', type=int, default=10000, help="products per store for matching")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per CPU-bound measurement (best is kept)")
+    parser.add_argument('--batch-size', type=int, default=64, help="embedding batch size")
+    parser.add_argument('--concurrency', type=int, default=4, help="embedding/upload requests in flight")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="stub backend latency per request")
+    parser.add_argument('--per-item-ms', type=float, default=0.2, help="stub backend latency per text/product")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of stub requests answered 503")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help=f"report path (default: {REPORT_DIR}/suite-<timestamp>.json)")
+    parser.add_argument('--baseline', help="earlier report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed slowdown before flagging, 0.10 = 10%%")
+    args = parser.parse_args()
+    if args.quick:
+        args.rows, args.dedup_sizes, args.products, args.repeat = 2000, [1000, 10000], 500, 1
+        args.match_size = 2000
+    sections = args.only or SECTIONS
+
+    server, base_url = start_stub_backend(latency=args.latency_ms / 1000, per_item_latency=args.per_item_ms / 1000,
+                                          error_rate=args.error_rate, seed=args.seed)
+    metrics = {}
+    for section in sections:
+        start = time.perf_counter()
+        if section == 'cleaning':
+            metrics.update(bench_cleaning(args))
+        elif section == 'dedup':
+            metrics.update(bench_dedup(args))
+        elif section == 'embedding':
+            metrics.update(bench_embedding(args, base_url))
+        elif section == 'upload':
+            metrics.update(bench_upload(args, base_url))
+        elif section == 'pipeline':
+            metrics.update(bench_pipeline(args, base_url))
+        elif section == 'matching':
+            metrics.update(bench_matching(args))
+        print(f"⏱️ {section} done in {time.perf_counter() - start:.1f}s")
+    server.shutdown()
+
+    created = datetime.now()
+    report = {
+        'created': created.isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'backend': dict(server.stats),
+        'metrics': metrics,
+    }
+
+    print(f"\n📊 Benchmark suite ({report['commit'] or 'unknown commit'}), "
+          f"{server.stats['requests']} backend requests, {server.stats['errors']} injected errors")
+    for name, m in metrics.items():
+        print(f"   {name:<26} {m['value']:>14,.2f} {m['unit']}")
+
+    output = args.output or os.path.join(REPORT_DIR, f"suite-{created:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Report: {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressed = compare(report, json.load(f), args.tolerance)
+        if regressed:
+            print(f"\n⚠️ {len(regressed)} metrics worse than the baseline by more than {args.tolerance:.0%}: "
+                  f"{', '.join(regressed)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -10,14 +10,48 @@ USAGE:
 
 CONFIGURATION:
     - TEST_MODE: Set to True for single page testing, False for full scraping
-    - ENABLE_EMBEDDING: Set to True to generate embeddings (requires backend)
+    - ENABLE_EMBEDDING: Set to True to generate embeddings (requires backend unless EMBEDDER is local)
+    - EMBEDDER: Where embeddings come from; the local ones run offline (see core/local_embedding.py)
     - ENABLE_DB_UPLOAD: Set to True to upload to database (requires backend)
+    - EMBEDDING_BATCH_SIZE / EMBEDDING_CONCURRENCY: Tune the batched embedding client
+    - ENABLE_EMBEDDING_CACHE: Reuse embeddings of unchanged products from cache/embeddings.sqlite
+    - DELTA_UPLOAD: Upload only the delta against cache/snapshot.sqlite
+    - UPLOAD_CONCURRENCY: Number of upload batches in flight
+    - STREAMING_PIPELINE: Overlap scraping, embedding and upload (production mode only)
+    - PARALLEL_PAGES: Fetch category pages concurrently under a per-host rate limit
+    - COLUMNAR_OUTPUT: Also save typed columns and an embedding matrix (see core/columnar.py)
+    - PAGE_FINGERPRINTS / FAST_REFRESH: Skip rendering pages that did not change (see core/page_fingerprints.py)
+    - DIRECT_EXTRACTION: Try embedded page JSON before the browser (see core/datasource.py)
+    - LIGHT_RENDERING / SCROLL_DELAY: Render profile for listing pages (see core/render_profile.py)
+    - CLEANING_WORKERS: Processes that parse and clean extracted JSON off the event loop (see core/offload.py)
+    - BROWSER_PAGES / PAGE_RECYCLE_AFTER: Warm pages kept open, and navigations before one is replaced (see core/browser_pool.py)
+
+Stage timings and counters are printed at exit and written to
+cache/metrics/coldstorage.json/.prom (see core/metrics.py).
 """
 
-import os, json, asyncio, csv, requests, math, re
+import os, asyncio, re
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+from crawl4ai import BrowserConfig, CrawlerRunConfig
+from core.embedding import make_embedder, embed_products
+from core.output import save_products as save_products_to_files, ProductWriter
+from core.columnar import save_columnar
+from core.adapter import StoreAdapter
+from core.scheduler import ScrapeFailed
+from core.dedup import dedup_key, Deduplicator
+from core.normalize import (clean_whitespace, slugify, split_name_quantity, space_quantity,
+                            format_price, annotate_products, category_from_url)
+from core.upload import upload_products, upload_delta, settle_removed
+from core.pipeline import StreamingPipeline
+from core.ratelimit import HostRateLimiter
+from core.page_fingerprints import PageFingerprintStore
+from core.render_profile import RenderProfile, install_render_hooks
+from core.datasource import DataSource, DEFAULT_FIELDS as DATA_SOURCE_FIELDS
+from core.metrics import metrics
+from core.offload import cleaning_pool
+from core.browser_pool import BrowserPool
 
 # Load environment variables
 load_dotenv()
@@ -26,6 +60,27 @@ load_dotenv()
 TEST_MODE = False  # Set to False for production scraping
 ENABLE_EMBEDDING = True  # Set to True when backend is ready
 ENABLE_DB_UPLOAD = True  # Set to True when ready to upload to database
+EMBEDDER = os.getenv("EMBEDDER", "remote")  # 'remote' (backend), 'hashing' (in-process, no model) or 'sentence-transformers'
+EMBEDDING_BATCH_SIZE = 64  # Texts per embedding request (batch route only)
+EMBEDDING_CONCURRENCY = 4  # Embedding requests in flight at once
+ENABLE_EMBEDDING_CACHE = True  # Set to False to bypass the on-disk embedding cache
+DELTA_UPLOAD = True  # Only upload products that changed since the last run
+UPLOAD_CONCURRENCY = 4  # Upload batches in flight at once (batch size adapts automatically)
+STREAMING_PIPELINE = True  # Embed and upload pages while categories are still being scraped
+PARALLEL_PAGES = True  # Fetch all pages of a category concurrently once the page count is known
+MAX_PAGES_PER_HOST = 6  # Pages rendering at once against coldstorage.com.sg
+MIN_PAGE_INTERVAL = 0.5  # Seconds between page starts against coldstorage.com.sg
+BROWSER_PAGES = MAX_PAGES_PER_HOST  # Warm browser pages reused across pages and categories; also caps the renders in flight
+PAGE_RECYCLE_AFTER = 50  # Navigations before a page is closed and replaced, to cap its memory
+COLUMNAR_OUTPUT = True  # Also write typed columns (.parquet/.npz) and a float32 .embeddings.npy matrix
+PAGE_FINGERPRINTS = True  # Record each listing page's products in cache/pages.sqlite (probed only with FAST_REFRESH)
+FAST_REFRESH = False  # Replay pages the site reports unchanged instead of rendering them (hourly refreshes)
+DIRECT_EXTRACTION = False  # Read products from the page's JSON over plain HTTP first; falls back to the browser
+LIGHT_RENDERING = True  # Block images, media, fonts and third-party scripts while rendering listing pages
+SCROLL_DELAY = 0.3  # Seconds per scroll step; products are in the page, scrolling only attaches lazy tiles
+CLEANING_WORKERS = 0  # Processes for JSON parsing and cleaning (None = one per core, 0 = on the event loop)
+
+STORE = 'coldstorage'  # Adapter name and metrics label
 
 # URLs
 URL_TO_SCRAPE = "https://coldstorage.com.sg/en/category/100011/1.html"
@@ -46,6 +101,16 @@ LIST_URL_TO_SCRAPE = [
     "https://coldstorage.com.sg/en/category/100013/1.html",
 ]
 
+# Shared by every category so the per-host limits hold across the whole run
+page_limiter = HostRateLimiter(max_concurrent=MAX_PAGES_PER_HOST, min_interval=MIN_PAGE_INTERVAL)
+page_store = PageFingerprintStore(fast_refresh=FAST_REFRESH) if PAGE_FINGERPRINTS else None
+# The CSS schema calls the name 'full_name'
+data_source = DataSource({('full_name' if k == 'name' else k): v for k, v in DATA_SOURCE_FIELDS.items()}) \
+    if DIRECT_EXTRACTION else None
+# Listing pages are read, not looked at: the light profile skips images, fonts and trackers
+render_profile = RenderProfile(first_party_hosts=('coldstorage.com.sg',), scroll_delay=SCROLL_DELAY) if LIGHT_RENDERING \
+    else RenderProfile.full()
+
 # CSS selectors for Cold Storage
 css_schema = {
     "name": "base", 
@@ -63,6 +128,7 @@ css_schema = {
 def clean_and_filter_products(raw_products, page_url):
     """Clean and filter products extracted via CSS selectors"""
     cleaned_products = []
+    seen = set()
     
     for raw_product in raw_products:
         # Extract fields
@@ -84,47 +150,26 @@ def clean_and_filter_products(raw_products, page_url):
         
         # Try to extract quantity from the end of the name if not found separately
         if not quantity:
-            # Look for quantity patterns at the end: numbers + units
-            quantity_patterns = [
-                r'\b(\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb|pc|pcs|pack|s))\b$',
-                r'\b(\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb))\b$',
-                r'\b(\d+(?:\.\d+)?x\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb))\b$',
-                r'\b(\d+\s*(?:kg|g|ml|l|oz|lb|pc|pcs|pack|s))\b$',
-                r'\b(\d+(?:\.\d+)?\s*(?:kg|g|ml|l|oz|lb))\b$'
-            ]
-            
-            for pattern in quantity_patterns:
-                match = re.search(pattern, full_name, re.IGNORECASE)
-                if match:
-                    quantity = match.group(1).strip()
-                    # Remove quantity from name
-                    name = re.sub(pattern, '', full_name, flags=re.IGNORECASE).strip()
-                    break
+            name, quantity = split_name_quantity(full_name)
         
         # Debug: Print extracted product link to help troubleshoot (disabled for cleaner output)
         # if product_link:
         #     print(f"🔗 DEBUG: Product '{name[:30]}...' ({quantity}) -> Link: {product_link}")
             
         # Clean name
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = clean_whitespace(name)
         
         # Extract and clean price if available
         if price:
-            price_match = re.search(r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)', price)
-            if price_match:
-                price = f"${price_match.group(1)}"
-            else:
-                price = ""
+            price = format_price(price)
         
-        # Clean quantity
+        # Clean quantity ("1s" -> "1 s", "125g" -> "125 g")
         if quantity:
-            quantity = re.sub(r'\s+', ' ', quantity).strip()
-            # Add space between number and unit for consistency (e.g., "1s" -> "1 s", "125g" -> "125 g")
-            quantity = re.sub(r'(\d+)([a-zA-Z]+)', r'\1 \2', quantity)
+            quantity = space_quantity(quantity)
         
         # Clean promotion
         if promotion:
-            promotion = re.sub(r'\s+', ' ', promotion).strip()
+            promotion = clean_whitespace(promotion)
             # Remove common non-promotional text
             if promotion.lower() in ['new', 'popular', 'bestseller', '']:
                 promotion = ""
@@ -145,18 +190,10 @@ def clean_and_filter_products(raw_products, page_url):
             else:
                 # Invalid or unexpected link format, create fallback
                 print(f"⚠️ Unexpected product link format: {product_link}")
-                slug = name.lower()
-                slug = re.sub(r'[^\w\s-]', '', slug)
-                slug = re.sub(r'[-\s]+', '-', slug)
-                slug = slug.strip('-')
-                product_url = f"https://coldstorage.com.sg/en/search?q={slug}"
+                product_url = f"https://coldstorage.com.sg/en/search?q={slugify(name)}"
         else:
             # No product link found, create search URL as fallback
-            slug = name.lower()
-            slug = re.sub(r'[^\w\s-]', '', slug)
-            slug = re.sub(r'[-\s]+', '-', slug)
-            slug = slug.strip('-')
-            product_url = f"https://coldstorage.com.sg/en/search?q={slug}"
+            product_url = f"https://coldstorage.com.sg/en/search?q={slugify(name)}"
         
         # Clean image URL
         if image_url and not image_url.startswith('http'):
@@ -165,14 +202,12 @@ def clean_and_filter_products(raw_products, page_url):
             elif image_url:
                 image_url = f"https://coldstorage.com.sg/{image_url}"
         
-        # Check for duplicates (only skip if both name and price match exactly)
-        duplicate = any(
-            existing['name'].lower() == name.lower() and 
-            existing.get('price') == price and price  # Only check price if both have prices
-            for existing in cleaned_products
-        )
-        if duplicate:
-            continue
+        # Check for duplicates (only skip if both name and price match; O(1) set lookup)
+        key = dedup_key(name, price)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
         
         cleaned_products.append({
             'name': name,
@@ -186,57 +221,113 @@ def clean_and_filter_products(raw_products, page_url):
             'embedding': None
         })
     
-    return cleaned_products
+    return annotate_products(cleaned_products, category=category_from_url(page_url))
 
-async def scrape_url_with_pagination(crawler, base_url, config, semaphore=None):
+async def scrape_url_with_pagination(crawler, base_url, config, semaphore=None, on_page=None):
     """Scrape a URL and handle pagination to get all products"""
+    impl = _scrape_pages_in_parallel if PARALLEL_PAGES else _scrape_url_with_pagination_impl
     if semaphore:
         async with semaphore:
-            return await _scrape_url_with_pagination_impl(crawler, base_url, config)
+            with metrics.span('category', store=STORE):
+                return await impl(crawler, base_url, config, on_page)
     else:
-        return await _scrape_url_with_pagination_impl(crawler, base_url, config)
+        with metrics.span('category', store=STORE):
+            return await impl(crawler, base_url, config, on_page)
 
-async def _scrape_url_with_pagination_impl(crawler, base_url, config):
-    """Internal implementation of pagination scraping"""
-    all_products = []
-    page_num = 1
-    max_pages = 2 if TEST_MODE else 50  # Limit pages in test mode
-    
-    try:
-        while page_num <= max_pages:
-            # Construct URL for current page
-            if page_num == 1:
-                current_url = base_url
-            else:
-                # Cold Storage pagination format: replace /1.html with /2.html, /3.html, etc.
-                current_url = base_url.replace('/1.html', f'/{page_num}.html')
-            
-            print(f"📄 Scraping page {page_num}: {current_url}")
-            
-            results = await crawler.arun(current_url, config=config)
-            page_products = []
-            
+def _page_url(base_url, page_num):
+    if page_num == 1:
+        return base_url
+    # Cold Storage pagination format: replace /1.html with /2.html, /3.html, etc.
+    return base_url.replace('/1.html', f'/{page_num}.html')
+
+async def _fetch_page(crawler, base_url, config, page_num):
+    """Fetch and clean one listing page; returns (products, pager page count). No products means stop here.
+
+    A page that fails to render raises ScrapeFailed, so it is not taken for the end of the category.
+
+    With PAGE_FINGERPRINTS on, the page goes through page_store, which skips
+    the render in fast refresh mode when the site says the page is unchanged.
+    With DIRECT_EXTRACTION on, the page's embedded JSON is tried before the browser.
+    """
+    current_url = _page_url(base_url, page_num)
+    print(f"📄 Scraping page {page_num}: {current_url}")
+
+    async def render():
+        if data_source:
+            async with page_limiter.limit(current_url):
+                with metrics.span('direct', store=STORE):
+                    rows, html = await data_source.extract(current_url)
+            if rows:
+                page_products = await cleaning_pool.run(clean_and_filter_products, rows, current_url)
+                metrics.inc('pages_total', store=STORE, result='direct')
+                metrics.inc('products_total', len(page_products), store=STORE, stage='scraped')
+                return page_products, _page_count_from_html(base_url, html)
+
+        async with page_limiter.limit(current_url):
+            with metrics.span('render', store=STORE):
+                results = await crawler.arun(current_url, config=config)
+        page_products = []
+        html = ''
+
+        with metrics.span('extract', store=STORE):
             for result in results:
                 if hasattr(result, "success") and result.success:
                     print(f"✅ Successfully scraped page {page_num}")
-                    
-                    data = json.loads(result.extracted_content)
-                    if isinstance(data, list) and len(data) > 0:
-                        raw_products = clean_and_filter_products(data, result.url)
+                    html = html or (result.html or '')
+                    metrics.inc('page_bytes_total', len(result.html or ''), store=STORE)
+
+                    raw_products = await cleaning_pool.clean_page(clean_and_filter_products,
+                                                                  result.extracted_content, result.url)
+                    if raw_products is not None:
                         page_products.extend(raw_products)
+                        metrics.inc('pages_total', store=STORE, result='ok')
                         print(f"📦 Found {len(raw_products)} products on page {page_num}")
                     else:
+                        metrics.inc('pages_total', store=STORE, result='empty')
                         print(f"⚠️ No product data found on page {page_num}")
                         break  # No more products, stop pagination
                 else:
+                    metrics.inc('pages_total', store=STORE, result='failed')
                     print(f"❌ Failed to scrape page {page_num}")
-                    break  # Failed to load page, stop pagination
+                    raise ScrapeFailed(f"page {page_num} failed to render: {getattr(result, 'error_message', '')}")
+
+        metrics.inc('products_total', len(page_products), store=STORE, stage='scraped')
+        return page_products, _page_count_from_html(base_url, html)
+
+    if page_store:
+        return await page_store.fetch(current_url, render)
+    return await render()
+
+def _page_count_from_html(base_url, html):
+    """Highest page number linked from the pager, or 0 if the pager cannot be read"""
+    prefix = urlparse(base_url).path[:-len('1.html')]
+    linked = [int(n) for n in re.findall(re.escape(prefix) + r'(\d+)\.html', html)]
+    # Element UI pager renders page numbers as <li class="number">N</li>
+    numbered = [int(n) for n in re.findall(r'class="number[^"]*"[^>]*>\s*(\d+)\s*<', html)]
+    return max(linked + numbered, default=0)
+
+async def _scrape_url_with_pagination_impl(crawler, base_url, config, on_page=None):
+    """Internal implementation of pagination scraping
+
+    If `on_page` is given, each page's cleaned products are awaited through it
+    as soon as the page is extracted (see core.pipeline.StreamingPipeline).
+    A page that fails raises ScrapeFailed carrying the products of the pages before it.
+    """
+    all_products = []
+    page_num = 1
+    max_pages = 2 if TEST_MODE else 50  # Limit pages in test mode
+    
+    try:
+        while page_num <= max_pages:
+            page_products, _ = await _fetch_page(crawler, base_url, config, page_num)
             
             if not page_products:
                 print(f"🛑 No products found on page {page_num}, stopping pagination")
                 break
             
             all_products.extend(page_products)
+            if on_page:
+                await on_page(page_products)
             page_num += 1
             
             # Add delay between pages to be respectful
@@ -247,137 +338,216 @@ async def _scrape_url_with_pagination_impl(crawler, base_url, config):
         
     except Exception as e:
         print(f"⚠️ Error during pagination scraping: {e}")
-        return all_products
+        raise ScrapeFailed(f"page {page_num}: {e}", all_products) from e
+
+async def _scrape_pages_in_parallel(crawler, base_url, config, on_page=None):
+    """Same result as the sequential walk, but pages 2..N are fetched concurrently
+
+    The page count comes from the pager on page 1; if the pager cannot be read
+    it is probed with an exponential then binary search. Pages are then
+    accepted in order up to the first page without products, exactly like the
+    sequential walk, and the walk continues sequentially past N in case the
+    pager under-reported. If the walk reaches a page that failed, ScrapeFailed
+    is raised with the products of the pages before it.
+    """
+    max_pages = 2 if TEST_MODE else 50  # Limit pages in test mode
+    fetched = {}
+    errors = {}  # page_num -> exception of pages that failed
+
+    async def fetch(page_num):
+        if page_num not in fetched:
+            try:
+                fetched[page_num] = (await _fetch_page(crawler, base_url, config, page_num))[0]
+            except Exception as e:
+                print(f"⚠️ Error scraping page {page_num}: {e}")
+                fetched[page_num], errors[page_num] = [], e
+        return fetched[page_num]
 
-async def scrape_url(crawler, url, config):
-    """Scrape a single URL and return products"""
     try:
-        results = await crawler.arun(url, config=config)
-        products = []
-        
-        for result in results:
-            if hasattr(result, "success") and result.success:
-                print(f"✅ Successfully scraped: {result.url}")
-                
-                data = json.loads(result.extracted_content)
-                if isinstance(data, list) and len(data) > 0:
-                    raw_products = clean_and_filter_products(data, result.url)
-                    products.extend(raw_products)
-                    print(f"📦 Found {len(raw_products)} products")
+        first_page, pager_count = await _fetch_page(crawler, base_url, config, 1)
+    except Exception as e:
+        print(f"⚠️ Error during pagination scraping: {e}")
+        raise ScrapeFailed(f"page 1: {e}") from e
+    fetched[1] = first_page
+
+    page_count = 0
+    if first_page:
+        page_count = min(pager_count, max_pages)
+        if page_count:
+            print(f"🔢 Pager reports {page_count} pages")
+        else:
+            # Exponential probe for an empty page, then binary search for the last full one
+            good, bad = 1, None
+            probe = 2
+            while probe <= max_pages and bad is None:
+                if await fetch(probe):
+                    good, probe = probe, probe * 2
+                else:
+                    bad = probe
+            bad = bad or max_pages + 1
+            while bad - good > 1:
+                middle = (good + bad) // 2
+                if await fetch(middle):
+                    good = middle
                 else:
-                    print(f"⚠️ No product data found in extracted content")
+                    bad = middle
+            page_count = good
+            print(f"🔢 Probed {page_count} pages")
+
+    tasks = {n: asyncio.create_task(fetch(n)) for n in range(2, page_count + 1)}
+    all_products = []
+    page_num = 1
+    try:
+        while page_num <= max_pages:
+            if page_num in tasks:
+                page_products = await tasks[page_num]
             else:
-                print(f"❌ Failed to scrape: {url}")
-                
-        return products
-    except Exception as e:
-        print(f"⚠️ Error scraping {url}: {e}")
-        return []
+                page_products = await fetch(page_num)
+
+            if not page_products:
+                if page_num in errors:
+                    raise ScrapeFailed(f"page {page_num}: {errors[page_num]}", all_products) from errors[page_num]
+                print(f"🛑 No products found on page {page_num}, stopping pagination")
+                break
+
+            all_products.extend(page_products)
+            if on_page:
+                await on_page(page_products)
+            page_num += 1
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    print(f"📊 Total products scraped from {page_num-1} pages: {len(all_products)}")
+    return all_products
 
 async def add_embeddings(products):
-    """Add embeddings to products via backend API"""
+    """Add embeddings to products via the backend or a local embedder (EMBEDDER)"""
     if not ENABLE_EMBEDDING:
         return
-        
-    for product in products:
-        embedding_input = f"{product.get('name', '')} {product.get('quantity', '')} {product.get('price', '')}"
-        
-        try:
-            response = await asyncio.to_thread(
-                requests.post,
-                "http://localhost:3000/products/embed-text",
-                headers={
-                    'Content-Type': 'application/json',
-                    'X-API-Key': os.getenv("JWT_SECRET")
-                },
-                json={"text": embedding_input},
-                timeout=60,
-            )
-            if response.status_code == 200:
-                output = response.json()
-                product["embedding"] = output.get('embedding')
-            else:
-                print(f"⚠️ Embedding failed for: {product.get('name', 'Unknown')}")
-        except Exception as e:
-            print(f"⚠️ Embedding request failed: {e}")
 
-async def upload_to_database(products):
-    """Upload products to database in batches"""
+    with metrics.span('embed', store=STORE):
+        await embed_products(products, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY,
+                             use_cache=ENABLE_EMBEDDING_CACHE, embedder=EMBEDDER)
+    metrics.inc('products_total', sum(1 for p in products if p.get('embedding')), store=STORE, stage='embedded')
+
+async def upload_to_database(products, complete=True):
+    """Upload products to database (only new/changed products when DELTA_UPLOAD is on)
+
+    Products missing from the snapshot are only settled as removed after a complete production run.
+    """
     if not ENABLE_DB_UPLOAD or not products:
         return
-        
-    BATCH_SIZE = 5
-    total_batches = math.ceil(len(products) / BATCH_SIZE)
-    
-    print(f"🚀 Uploading {len(products)} products in {total_batches} batches...")
-    
-    success_count = 0
-    for i in range(0, len(products), BATCH_SIZE):
-        batch = products[i:i + BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        
-        try:
-            response = await asyncio.to_thread(
-                requests.post,
-                "http://localhost:3000/products/upload",
-                headers={
-                    'Content-Type': 'application/json',
-                    'X-API-Key': os.getenv("JWT_SECRET")
-                },
-                json=batch,
-                timeout=120,
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ Batch {batch_num}/{total_batches} uploaded")
-                success_count += len(batch)
-            else:
-                print(f"⚠️ Batch {batch_num} failed: {response.status_code}")
-                
-        except Exception as e:
-            print(f"⚠️ Batch {batch_num} upload failed: {e}")
-            
-        await asyncio.sleep(1)  # Rate limiting
-    
-    print(f"🎉 Upload completed: {success_count}/{len(products)} products uploaded")
+
+    with metrics.span('upload', store=STORE):
+        if DELTA_UPLOAD:
+            await upload_delta('Cold Storage', products, full_run=complete and not TEST_MODE,
+                               concurrency=UPLOAD_CONCURRENCY)
+        else:
+            await upload_products(products, concurrency=UPLOAD_CONCURRENCY)
 
 def save_products(products):
     """Save products to CSV and JSON files"""
-    if not products:
-        print("⚠️ No products to save")
-        return
-        
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-    # Save to CSV
-    csv_file = os.path.join(script_dir, "coldstorage_products.csv")
-    csv_columns = ['name', 'supermarket', 'quantity', 'price', 'promotion_description', 
-                   'promotion_end_date_text', 'product_url', 'image_url', 'embedding']
-    
-    with open(csv_file, mode='w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=csv_columns)
-        writer.writeheader()
-        for product in products:
-            cleaned_product = {col: product.get(col, '') for col in csv_columns}
-            writer.writerow(cleaned_product)
-
-    # Save to JSON
-    json_file = os.path.join(script_dir, "coldstorage_products.json")
-    with open(json_file, mode='w', encoding='utf-8') as f:
-        json.dump(products, f, indent=2, ensure_ascii=False)
-
-    print(f"✅ Saved {len(products)} products to:")
-    print(f"   📄 CSV: {csv_file}")
-    print(f"   📄 JSON: {json_file}")
-    
-    # Show sample products
-    print(f"\n📦 Sample products:")
-    for i, product in enumerate(products[:3]):
-        print(f"   {i+1}. {product['name']} - {product['price']} ({product['quantity']})")
-        print(f"      URL: {product['product_url']}")
+    save_products_to_files(products, "coldstorage_products", columnar=COLUMNAR_OUTPUT)
+
+def make_crawl_config():
+    """Crawler settings for one Cold Storage listing page"""
+    return CrawlerRunConfig(
+        extraction_strategy=JsonCssExtractionStrategy(css_schema, verbose=False),
+        verbose=False,
+        remove_overlay_elements=True,
+        **render_profile.run_kwargs(),
+        page_timeout=90000,
+        wait_for="css:.ware-wrapper,.row-container",
+    )
+
+class ColdStorageAdapter(StoreAdapter):
+    """Cold Storage for run_all.py: numbered pages (/1.html, /2.html, ...) per category"""
+    name = STORE
+    supermarket = 'Cold Storage'
+    css_schema = css_schema
+    urls = LIST_URL_TO_SCRAPE
+    test_urls = [URL_TO_SCRAPE]
+    page_store = page_store
+    data_source = data_source
+    render_profile = render_profile
+    rate_limiter = page_limiter
+
+    def crawl_config(self):
+        return make_crawl_config()
+
+    def clean_and_filter_products(self, raw_products, page_url):
+        return clean_and_filter_products(raw_products, page_url)
+
+    async def scrape_category(self, crawler, url, on_page=None):
+        return await scrape_url_with_pagination(crawler, url, self.crawl_config(), on_page=on_page)
+
+    async def scrape_task(self, crawler, task, on_page=None):
+        """One listing page per task, so a category's pages spread over the workers
+
+        Page 1 queues the other pages the pager shows; a page past the pager's
+        count (or any page, when the pager cannot be read) queues the next one,
+        and the first page without products ends the category, as in the
+        sequential walk.
+        """
+        page_num = task.get('page', 1)
+        max_pages = 2 if TEST_MODE else 50  # Limit pages in test mode
+        products, page_count = await _fetch_page(crawler, task['url'], self.crawl_config(), page_num)
+        if on_page and products:
+            await on_page(products)
+        pages = []
+        if products:
+            if page_num == 1 and page_count > 1:
+                pages = range(2, page_count + 1)
+            elif page_num >= page_count:
+                pages = [page_num + 1]
+        return products, [{'store': self.name, 'url': task['url'], 'page': n} for n in pages if n <= max_pages]
+
+async def scrape_streaming(crawler, urls, config, semaphore, writer):
+    """Scrape categories while earlier pages are already being embedded, uploaded and written to `writer`
+
+    Returns whether every category finished.
+    """
+    async def upload(batch):
+        if DELTA_UPLOAD:
+            # Removed products are settled once after the run, when the full catalogue is known
+            await upload_delta('Cold Storage', batch, full_run=False, concurrency=UPLOAD_CONCURRENCY)
+        else:
+            await upload_products(batch, concurrency=UPLOAD_CONCURRENCY)
+
+    with make_embedder(EMBEDDER, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY,
+                       use_cache=ENABLE_EMBEDDING and ENABLE_EMBEDDING_CACHE) as client:
+        pipeline = StreamingPipeline(
+            embed=client.embed_products if ENABLE_EMBEDDING else None,
+            upload=upload if ENABLE_DB_UPLOAD else None,
+            embed_batch_size=EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY,
+            dedup=Deduplicator(),
+            sink=writer.write,
+            collect=False,
+            name=STORE,
+        )
+        async with pipeline:
+            tasks = [scrape_url_with_pagination(crawler, url, config, semaphore, on_page=pipeline.put)
+                     for url in urls]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = False
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            failed = True
+            print(f"⚠️ Error scraping {urls[i]}: {result}")
+        else:
+            print(f"✅ Completed category {i+1}/{len(urls)}: {len(result)} products")
+
+    if client.cache:
+        print(client.cache.summary())
+        client.cache.close()
+    return not failed
 
 async def main():
+    metrics.report_at_exit(STORE)
+    metrics.watch_event_loop()
+    cleaning_pool.configure(CLEANING_WORKERS)
     print("🚀 Starting Cold Storage Product Scraper")
     print("=" * 50)
     
@@ -389,15 +559,7 @@ async def main():
         urls_to_scrape = LIST_URL_TO_SCRAPE
     
     # Configure crawler
-    crawl_config = CrawlerRunConfig(
-        scan_full_page=True,
-        scroll_delay=1.0,
-        extraction_strategy=JsonCssExtractionStrategy(css_schema, verbose=False),
-        verbose=False,
-        remove_overlay_elements=True,
-        page_timeout=90000,
-        wait_for="css:.ware-wrapper,.row-container",
-    )
+    crawl_config = make_crawl_config()
     
     browser_config = BrowserConfig(
         headless=True,
@@ -412,11 +574,23 @@ async def main():
     # Create semaphore to limit concurrent requests (max 3 concurrent categories)
     semaphore = asyncio.Semaphore(3)
     
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        if len(urls_to_scrape) == 1:
+    streaming = STREAMING_PIPELINE and not TEST_MODE
+    # Streamed pages go straight to coldstorage_products.ndjson/.csv; nothing keeps the whole catalogue
+    writer = ProductWriter("coldstorage_products") if streaming else None
+    complete = True  # Cleared by any category that lost a page
+    
+    async with BrowserPool(browser_config, size=BROWSER_PAGES, recycle_after=PAGE_RECYCLE_AFTER) as crawler:
+        install_render_hooks(crawler)
+        if streaming:
+            print(f"\n🔄 Streaming {len(urls_to_scrape)} categories through scrape → embed → upload (max 3 concurrent)...")
+            complete = await scrape_streaming(crawler, urls_to_scrape, crawl_config, semaphore, writer)
+        elif len(urls_to_scrape) == 1:
             # Single URL - no need for parallel processing
             print(f"\n🔍 Scraping category: {urls_to_scrape[0]}")
-            products = await scrape_url_with_pagination(crawler, urls_to_scrape[0], crawl_config)
+            try:
+                products = await scrape_url_with_pagination(crawler, urls_to_scrape[0], crawl_config)
+            except ScrapeFailed as e:
+                complete, products = False, e.products
             all_products.extend(products)
         else:
             # Multiple URLs - use parallel processing with rate limiting
@@ -434,19 +608,44 @@ async def main():
             # Process results
             for i, result in enumerate(results):
                 if isinstance(result, Exception):
+                    complete = False
                     print(f"⚠️ Error scraping {urls_to_scrape[i]}: {result}")
+                    if isinstance(result, ScrapeFailed):
+                        all_products.extend(result.products)
                 else:
                     all_products.extend(result)
                     print(f"✅ Completed category {i+1}/{len(urls_to_scrape)}: {len(result)} products")
     
+    # The same SKU is listed in several categories; keep its first occurrence
+    if not streaming:
+        dedup = Deduplicator()
+        all_products = dedup.filter(all_products)
+        if dedup.dropped:
+            print(f"🧹 Dropped {dedup.dropped} products already seen in another category")
+    
     # In test mode, limit to 5 products
     if TEST_MODE and len(all_products) > 5:
         print(f"🧪 TEST MODE: Limiting to 5 products (found {len(all_products)})")
         all_products = all_products[:5]
     
-    print(f"\n📊 Total products found: {len(all_products)}")
+    print(f"\n📊 Total products found: {writer.count if streaming else len(all_products)}")
+    print(render_profile.summary())
+    print(crawler.summary())
+    print(cleaning_pool.summary())
+    cleaning_pool.close()
+    if page_store:
+        print(page_store.summary())
+        page_store.close()
     
-    if all_products:
+    if streaming:
+        # Already embedded, uploaded and written page by page
+        writer.close()
+        if COLUMNAR_OUTPUT and writer.count:
+            save_columnar(writer.reader(), writer.basename)
+        # Only a complete run can tell which products disappeared
+        if ENABLE_DB_UPLOAD and DELTA_UPLOAD and complete and writer.count:
+            await settle_removed('Cold Storage', [p['product_url'] for p in writer.reader()])
+    elif all_products:
         # Add embeddings if enabled
         if ENABLE_EMBEDDING:
             print("🔗 Adding embeddings...")
@@ -456,7 +655,7 @@ async def main():
         save_products(all_products)
         
         # Upload to database if enabled
-        await upload_to_database(all_products)
+        await upload_to_database(all_products, complete)
     
     print(f"\n{'='*50}")
     print("🏁 Scraper finished!")
@@ -0,0 +1,6 @@
+"""
+Shared building blocks for the supermarket scrapers in this directory.
+
+Each store script (coldstorage.py, shengsiong.py, fairprice.py) keeps its own
+selectors and cleaning rules and imports the common plumbing from here.
+"""
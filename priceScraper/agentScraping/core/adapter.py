@@ -0,0 +1,105 @@
+"""
+Store adapter interface used by the multi-store runner (run_all.py).
+
+Each store script exposes one StoreAdapter subclass describing what differs
+per store: selectors, category URLs, crawl settings, cleaning rules and how a
+category is paginated. Everything else (browser, scheduling, embedding,
+upload, output) is shared.
+"""
+
+from core.metrics import metrics
+from core.offload import cleaning_pool
+from core.scheduler import ScrapeFailed
+
+class StoreAdapter:
+    """Base class for a supermarket; subclasses set the class attributes below"""
+
+    name = None          # short id used for output file names, e.g. 'coldstorage'
+    supermarket = None   # value of product['supermarket'], e.g. 'Cold Storage'
+    css_schema = None    # JsonCssExtractionStrategy schema
+    urls = []            # category URLs for a full run
+    test_urls = []       # category URLs for TEST_MODE
+    run_dedup = True     # drop repeats of (name, price) across pages and categories
+    page_store = None    # core.page_fingerprints.PageFingerprintStore for conditional re-crawls
+    data_source = None   # core.datasource.DataSource: read products over plain HTTP before rendering
+    render_profile = None  # core.render_profile.RenderProfile used by crawl_config()
+    rate_limiter = None  # core.ratelimit.HostRateLimiter pacing the store's page renders
+
+    def crawl_config(self):
+        """CrawlerRunConfig for one category crawl (a fresh one per call)"""
+        raise NotImplementedError
+
+    def clean_and_filter_products(self, raw_products, page_url):
+        """Turn raw extracted rows into cleaned product dicts"""
+        raise NotImplementedError
+
+    async def products_from_results(self, results):
+        """Parse and clean every successful crawl result (in one cleaning_pool task)
+
+        Raises ScrapeFailed, carrying the other results' products, if any result failed.
+        """
+        products = []
+        with metrics.span('extract', store=self.name):
+            succeeded = []
+            for result in results:
+                if getattr(result, 'success', False):
+                    succeeded.append(result)
+                    metrics.inc('page_bytes_total', len(getattr(result, 'html', None) or ''), store=self.name)
+                else:
+                    metrics.inc('pages_total', store=self.name, result='failed')
+                    print(f"❌ Failed to scrape: {getattr(result, 'url', '')}")
+            pages = await cleaning_pool.clean_pages(self.clean_and_filter_products,
+                                                    [(result.extracted_content, result.url) for result in succeeded])
+            for page_products, _, error in pages:
+                if error is not None:
+                    raise error
+                if page_products is not None:
+                    products.extend(page_products)
+                    metrics.inc('pages_total', store=self.name, result='ok')
+                else:
+                    metrics.inc('pages_total', store=self.name, result='empty')
+        metrics.inc('products_total', len(products), store=self.name, stage='scraped')
+        if len(succeeded) < len(results):
+            raise ScrapeFailed(f"{len(results) - len(succeeded)} of {len(results)} pages failed to render", products)
+        return products
+
+    async def scrape_category(self, crawler, url, on_page=None):
+        """Pagination strategy. Default: the category is a single listing page.
+
+        Stores with numbered pages or deep crawls override this. `on_page` is
+        awaited with each page's cleaned products as soon as they are ready.
+        A category that lost pages raises ScrapeFailed rather than returning
+        what it has, so the run is not taken for a complete one.
+        """
+        async def render():
+            if self.data_source:
+                with metrics.span('direct', store=self.name):
+                    rows, _ = await self.data_source.extract(url)
+                if rows:
+                    products = await cleaning_pool.run(self.clean_and_filter_products, rows, url)
+                    metrics.inc('pages_total', store=self.name, result='direct')
+                    metrics.inc('products_total', len(products), store=self.name, stage='scraped')
+                    return products, 0
+            with metrics.span('render', store=self.name):
+                results = await crawler.arun(url, config=self.crawl_config())
+            return await self.products_from_results(results), 0
+
+        try:
+            if self.page_store:
+                products, _ = await self.page_store.fetch(url, render)
+            else:
+                products, _ = await render()
+        except ScrapeFailed as e:
+            if on_page and e.products:
+                await on_page(e.products)  # Keep what did render; the category still counts as failed
+            raise
+        if on_page and products:
+            await on_page(products)
+        return products
+
+    async def scrape_task(self, crawler, task, on_page=None):
+        """Scrape one work-queue task (core/work_queue.py); returns (products, follow-up tasks)
+
+        Default: a task is a whole category, {'store': name, 'url': url}.
+        """
+        return await self.scrape_category(crawler, task['url'], on_page=on_page), []
@@ -0,0 +1,166 @@
+"""
+Warm browser pages shared by every category of a run (and every job of a daemon).
+
+Without a session, crawl4ai opens a new page for every arun() and closes it
+afterwards, so each listing page pays for page setup again and starts with
+nothing cached. BrowserPool starts the browser once and renders every
+arun() on one of at most `size` long-lived pages (crawl4ai sessions), so
+the site's scripts, styles and cookies stay warm from one listing page to
+the next, across categories. A page is closed and replaced after
+`recycle_after` navigations, so a site that leaks memory cannot grow the
+renderer without bound.
+
+It stands in for AsyncWebCrawler:
+
+    async with BrowserPool(browser_config, size=BROWSER_PAGES, recycle_after=PAGE_RECYCLE_AFTER) as crawler:
+        install_render_hooks(crawler)
+        results = await crawler.arun(url, config=config)
+    print(crawler.summary())
+
+Pages are kept per render profile, so a page keeps the request routing it
+was given (core/render_profile.py). Each pooled page gets a browser context
+of its own: crawl4ai 0.6.3 keys contexts by the run config and closes a
+session's context with its page (kill_session(), also on its session TTL),
+which must not take other pooled pages down with it. For the same reason
+the pool closes a page that sat idle for `idle_timeout` itself, before
+crawl4ai's 30-minute session TTL does. A deep crawl (FairPrice)
+renders many URLs at once, which one page cannot do, so it is passed
+straight to the browser, as is any config that already names a session.
+`size` also caps the pooled renders in flight: further arun() calls wait
+for a free page (browser_page_wait_seconds).
+"""
+
+import copy, time, asyncio, itertools
+from crawl4ai import AsyncWebCrawler
+from core.render_profile import PROFILE_KEY
+from core.metrics import metrics
+
+BROWSER_PAGES = 6  # Pages kept open, and pooled renders in flight
+RECYCLE_AFTER = 50  # Navigations before a page is closed and replaced (0 = never)
+IDLE_TIMEOUT = 1500  # Seconds an idle page is kept; under crawl4ai's 30-minute session TTL
+PAGE_KEY = 'pool_page'  # Key in CrawlerRunConfig.shared_data naming the pooled page
+
+def _lane(config):
+    """Pages are only reused by configs with the same render profile"""
+    return (getattr(config, 'shared_data', None) or {}).get(PROFILE_KEY)
+
+class BrowserPool:
+    """A started AsyncWebCrawler whose arun() reuses a bounded set of pages
+
+    Pass `crawler` to pool an already started crawler (it is not closed with
+    the pool); otherwise one is started from `browser_config`.
+    """
+
+    def __init__(self, browser_config=None, size=BROWSER_PAGES, recycle_after=RECYCLE_AFTER, crawler=None,
+                 idle_timeout=IDLE_TIMEOUT):
+        self.browser_config = browser_config
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self.idle_timeout = idle_timeout
+        self.crawler = crawler
+        self.owns_crawler = crawler is None
+        self.semaphore = asyncio.Semaphore(self.size)
+        self.idle = []  # Pages not rendering, least recently used first
+        self.busy = 0
+        self.ids = itertools.count(1)
+        self.stats = {'opened': 0, 'recycled': 0, 'navigations': 0, 'unpooled': 0}
+
+    async def start(self):
+        if self.crawler is None:
+            self.crawler = AsyncWebCrawler(config=self.browser_config)
+            await self.crawler.start()
+        return self
+
+    async def close(self):
+        while self.idle:
+            await self._close_page(self.idle.pop())
+        if self.owns_crawler and self.crawler is not None:
+            await self.crawler.close()
+            self.crawler = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def crawler_strategy(self):
+        return self.crawler.crawler_strategy
+
+    async def arun(self, url, config=None, **kwargs):
+        # Any arun() may let crawl4ai expire sessions, so stale pages go first
+        await self._close_idle()
+        if (config is None or getattr(config, 'deep_crawl_strategy', None) is not None
+                or getattr(config, 'session_id', None)):
+            self.stats['unpooled'] += 1
+            return await self.crawler.arun(url, config=config, **kwargs)
+
+        start = time.perf_counter()
+        async with self.semaphore:
+            metrics.observe('browser_page_wait_seconds', time.perf_counter() - start)
+            page = await self._take(_lane(config))
+            config = copy.copy(config)
+            config.session_id = page['session_id']
+            # Part of crawl4ai's context key, so the page is opened in a context of its own
+            config.shared_data = {**(getattr(config, 'shared_data', None) or {}), PAGE_KEY: page['session_id']}
+            try:
+                return await self.crawler.arun(url, config=config, **kwargs)
+            except Exception:
+                page['broken'] = True  # Unknown state after a failed navigation; start the next render afresh
+                raise
+            finally:
+                page['navigations'] += 1
+                self.stats['navigations'] += 1
+                metrics.inc('browser_navigations_total')
+                await self._release(page)
+
+    async def _take(self, lane):
+        """Most recently used idle page of `lane`, or a new one (closing the stalest idle page when full)"""
+        for i in range(len(self.idle) - 1, -1, -1):
+            if self.idle[i]['lane'] is lane:
+                self.busy += 1
+                return self.idle.pop(i)
+        if self.idle and len(self.idle) + self.busy >= self.size:
+            await self._close_page(self.idle.pop(0))
+        self.busy += 1
+        self.stats['opened'] += 1
+        metrics.inc('browser_pages_total', event='opened')
+        # crawl4ai opens the page on the first arun() with this session id
+        return {'session_id': f"pool-{next(self.ids)}", 'lane': lane, 'navigations': 0, 'broken': False}
+
+    async def _close_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = [page for page in self.idle if page['last_used'] < cutoff]
+        if not stale:
+            return
+        self.idle = [page for page in self.idle if page['last_used'] >= cutoff]
+        for page in stale:
+            self.stats['recycled'] += 1
+            metrics.inc('browser_pages_total', event='idle')
+            await self._close_page(page)
+
+    async def _release(self, page):
+        self.busy -= 1
+        page['last_used'] = time.monotonic()
+        if page['broken'] or (self.recycle_after and page['navigations'] >= self.recycle_after):
+            self.stats['recycled'] += 1
+            metrics.inc('browser_pages_total', event='recycled')
+            await self._close_page(page)
+        else:
+            self.idle.append(page)
+
+    async def _close_page(self, page):
+        """Close one pooled page and its own browser context (a no-op if it never rendered)"""
+        try:
+            await self.crawler.crawler_strategy.kill_session(page['session_id'])
+        except Exception as e:
+            print(f"⚠️ Could not close browser page {page['session_id']}: {e}")
+
+    def summary(self):
+        s = self.stats
+        line = (f"🌐 Browser pool: {s['navigations']} renders on {s['opened']} pages "
+                f"(max {self.size} open), {s['recycled']} recycled")
+        if s['unpooled']:
+            line += f", {s['unpooled']} deep crawls outside the pool"
+        return line
@@ -0,0 +1,110 @@
+"""
+Columnar output: typed scalar columns plus a float32 embedding matrix.
+
+    <basename>.embeddings.npy   float32 (n, dim) matrix; row i belongs to product i.
+                                np.load(..., mmap_mode='r') maps it without copying.
+                                Products without an embedding get a row of NaN.
+    <basename>.parquet          typed scalar columns, when pyarrow is installed
+    <basename>.columns.npz      the same columns as NumPy arrays otherwise
+
+Missing integers are stored as null in Parquet and as -1 in the .npz;
+missing floats as NaN in both.
+"""
+
+import os
+import numpy as np
+from core.output import OUTPUT_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; falls back to .npz
+    pa = pq = None
+
+# (column, type) in file order; types are 'str', 'int' or 'float'
+COLUMNS = [
+    ('name', 'str'), ('supermarket', 'str'), ('category', 'str'), ('quantity', 'str'), ('price', 'str'),
+    ('price_cents', 'int'), ('quantity_count', 'int'), ('quantity_amount', 'float'), ('quantity_unit', 'str'),
+    ('unit_price_cents', 'float'), ('unit_price_basis', 'str'), ('promotion_description', 'str'),
+    ('promotion_end_date_text', 'str'), ('product_url', 'str'), ('image_url', 'str'),
+]
+ARROW_TYPES = {'str': 'string', 'int': 'int64', 'float': 'float32'}
+NUMPY_TYPES = {'int': np.int64, 'float': np.float32}
+MISSING = {'str': '', 'int': -1, 'float': np.nan}
+
+def embedding_shape(products):
+    """(rows, dim) of the embedding matrix for `products`"""
+    rows, dim = 0, 0
+    for product in products:
+        rows += 1
+        if not dim and product.get('embedding'):
+            dim = len(product['embedding'])
+    return rows, dim
+
+def _column_values(products, embeddings_file):
+    """Fill the .npy matrix row by row and return the scalar columns as lists
+
+    `products` may be a list or any re-iterable (e.g. output.NdjsonProducts); it
+    is walked twice, once for the shape and once to fill the file, so only the
+    scalar columns are ever held in memory.
+    """
+    rows, dim = embedding_shape(products)
+    matrix = np.lib.format.open_memmap(embeddings_file, mode='w+', dtype=np.float32, shape=(rows, dim))
+    columns = {column: [] for column, _ in COLUMNS}
+    for i, product in enumerate(products):
+        embedding = product.get('embedding')
+        matrix[i] = embedding if embedding and len(embedding) == dim else np.nan
+        for column in columns:
+            columns[column].append(product.get(column))
+    matrix.flush()
+    del matrix
+    return columns
+
+def _parquet_table(columns):
+    arrays = []
+    for column, kind in COLUMNS:
+        values = columns[column]
+        if kind == 'str':
+            values = [None if value is None else str(value) for value in values]
+        arrays.append(pa.array(values, type=getattr(pa, ARROW_TYPES[kind])()))
+    return pa.Table.from_arrays(arrays, names=[column for column, _ in COLUMNS])
+
+def _numpy_columns(columns):
+    arrays = {}
+    for column, kind in COLUMNS:
+        values = [MISSING[kind] if value is None else value for value in columns[column]]
+        arrays[column] = np.array(values, dtype=NUMPY_TYPES.get(kind, str))
+    return arrays
+
+def save_columnar(products, basename, output_dir=OUTPUT_DIR):
+    """Write the embedding matrix and the scalar columns; returns (columns_file, embeddings_file)"""
+    if not products:
+        return None, None
+
+    embeddings_file = os.path.join(output_dir, f"{basename}.embeddings.npy")
+    columns = _column_values(products, embeddings_file)
+
+    if pq is not None:
+        columns_file = os.path.join(output_dir, f"{basename}.parquet")
+        # Few distinct values (store, category, unit) compress well as dictionaries
+        pq.write_table(_parquet_table(columns), columns_file, compression='zstd',
+                       use_dictionary=['supermarket', 'category', 'quantity_unit', 'unit_price_basis'])
+    else:
+        columns_file = os.path.join(output_dir, f"{basename}.columns.npz")
+        np.savez_compressed(columns_file, **_numpy_columns(columns))
+
+    print(f"   📦 Columns: {columns_file}")
+    print(f"   📦 Embeddings: {embeddings_file}")
+    return columns_file, embeddings_file
+
+def load_columnar(basename, output_dir=OUTPUT_DIR):
+    """Read back ({column: array}, embeddings); the embedding matrix is memory-mapped"""
+    embeddings = np.load(os.path.join(output_dir, f"{basename}.embeddings.npy"), mmap_mode='r')
+    parquet_file = os.path.join(output_dir, f"{basename}.parquet")
+    if pq is not None and os.path.exists(parquet_file):
+        table = pq.read_table(parquet_file)
+        columns = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+    else:
+        with np.load(os.path.join(output_dir, f"{basename}.columns.npz")) as data:
+            columns = {name: data[name] for name in data.files}
+    return columns, embeddings
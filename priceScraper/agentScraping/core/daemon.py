@@ -0,0 +1,135 @@
+"""
+Long-lived scrape daemon: the browser starts once and every job reuses it.
+
+A cold run spends its first seconds starting Chromium and opening pages;
+in daemon mode run_all.py keeps one BrowserPool (core/browser_pool.py)
+open and runs each scrape job on it, so a job starts rendering at once,
+on pages that already have the stores' scripts cached. Jobs are posted to
+a small HTTP API on localhost and run one at a time, in order:
+
+    python3 run_all.py --daemon
+    curl -X POST localhost:8765/jobs -d '{"stores": ["coldstorage"], "fast_refresh": true}'
+    curl localhost:8765/jobs                     # queued, running and finished jobs
+    curl -X POST localhost:8765/shutdown         # after the running job
+
+With `interval`, an empty job (the daemon's defaults) is also queued every
+`interval` seconds, for a scraper that refreshes on a schedule.
+"""
+
+import json, time, asyncio, threading, itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+MAX_FINISHED_JOBS = 100  # Finished jobs kept for GET /jobs
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    daemon = None  # Set per server in ScrapeDaemon.start_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/jobs':
+            self._send(200, self.daemon.job_list())
+        else:
+            self._send(404, {'message': f"Cannot GET {self.path}"})
+
+    def do_POST(self):
+        if self.path == '/jobs':
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                args = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                self._send(400, {'message': f"Invalid JSON: {e}"})
+                return
+            if not isinstance(args, dict):
+                self._send(400, {'message': "A job is a JSON object"})
+                return
+            self._send(202, self.daemon.submit(args))
+        elif self.path == '/shutdown':
+            self.daemon.stop()
+            self._send(202, {'message': "Stopping after the running job"})
+        else:
+            self._send(404, {'message': f"Cannot POST {self.path}"})
+
+class ScrapeDaemon:
+    """Runs `await run_job(args)` for every posted job, one at a time, until stopped"""
+
+    def __init__(self, run_job, host='127.0.0.1', port=DEFAULT_PORT, interval=None):
+        self.run_job = run_job
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.loop = None
+        self.queue = None
+        self.server = None
+
+    def job_list(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs]
+
+    def submit(self, args):
+        """Queue a job (callable from any thread); returns its record"""
+        with self.lock:
+            job = {'id': next(self.ids), 'args': args, 'status': 'queued', 'submitted': time.time()}
+            self.jobs.append(job)
+            finished = [j for j in self.jobs if j['status'] in ('done', 'failed')]
+            for old in finished[:-MAX_FINISHED_JOBS]:
+                self.jobs.remove(old)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, job)
+        return dict(job)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    def start_server(self):
+        handler = type('Handler', (DaemonHandler,), {'daemon': self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{self.host}:{self.server.server_address[1]}"
+
+    async def _schedule(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.submit({})
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        url = self.start_server()
+        print(f"🛰️ Scrape daemon listening on {url} (POST /jobs, GET /jobs, POST /shutdown)")
+        scheduler = asyncio.create_task(self._schedule()) if self.interval else None
+        try:
+            while True:
+                job = await self.queue.get()
+                if job is None:
+                    break
+                with self.lock:
+                    job['status'], job['started'] = 'running', time.time()
+                print(f"\n🛰️ Job {job['id']}: {json.dumps(job['args'])}")
+                try:
+                    result = await self.run_job(job['args'])
+                    status, detail = 'done', {'result': result}
+                except Exception as e:
+                    status, detail = 'failed', {'error': f"{type(e).__name__}: {e}"}
+                    print(f"❌ Job {job['id']} failed: {e}")
+                with self.lock:
+                    job.update(detail, status=status, finished=time.time())
+                print(f"🛰️ Job {job['id']} {status} in {job['finished'] - job['started']:.1f}s")
+        finally:
+            if scheduler:
+                scheduler.cancel()
+            self.server.shutdown()
+            self.server.server_close()
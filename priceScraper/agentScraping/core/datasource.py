@@ -0,0 +1,156 @@
+"""
+Browserless product extraction from a listing page's JSON.
+
+Rendering a page in the browser only to read product tiles back out of the DOM
+is the most expensive way to get the data; most storefronts ship the same
+products as JSON. A DataSource fetches the page over plain HTTP and looks, in
+order, at:
+  1. the store's listing JSON endpoint, if `api_url(page_url)` gives one
+  2. <script id="__NEXT_DATA__"> and other application/json script tags
+  3. <script type="application/ld+json"> (schema.org Product / ItemList)
+
+Anything in that JSON that has a name and a price is mapped onto the raw row
+shape the store's CSS schema produces, so the store's own
+clean_and_filter_products() runs unchanged. When nothing usable is found the
+caller falls back to the browser.
+"""
+
+import re, json, asyncio
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from core.page_fingerprints import USER_AGENT
+
+REQUEST_TIMEOUT = 20
+JSON_SCRIPT = re.compile(
+    r'<script[^>]*type=["\']application/(?:ld\+)?json["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+NEXT_DATA = re.compile(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+
+# Raw row field -> JSON keys to try, in order. A dotted path walks nested
+# objects; a number indexes a list, and a list met on the way uses its first item.
+DEFAULT_FIELDS = {
+    'name': ['name', 'productName', 'displayName', 'title'],
+    'price': ['final_price', 'finalPrice', 'offers.price', 'offers.lowPrice', 'salePrice', 'price.value', 'price'],
+    'quantity': ['metaData.DisplayUnit', 'displayUnit', 'packSize', 'pack_size', 'size', 'unit', 'weight'],
+    'promotion_description': ['promotion.description', 'promotionText', 'promoText', 'offers.description'],
+    'image_url': ['images.0.url', 'images.0', 'image.url', 'image', 'imageUrl', 'image_url', 'thumbnail'],
+    'product_link': ['url', 'link', 'href'],
+}
+
+def get_path(item, path):
+    value = item
+    for part in path.split('.'):
+        if isinstance(value, list):
+            if part.isdigit():
+                index = int(part)
+                value = value[index] if index < len(value) else None
+                continue
+            value = value[0] if value else None
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def format_price_value(value):
+    """Numbers become "$x.xx"; strings are left for the store's cleaner"""
+    if isinstance(value, bool):
+        return ''
+    if isinstance(value, (int, float)):
+        return f"${value:.2f}"
+    return str(value) if isinstance(value, str) else ''
+
+class DataSource:
+    """Plain-HTTP product extraction for one store
+
+    `fields` maps the store's raw row fields to candidate JSON keys (see
+    DEFAULT_FIELDS) or to a callable taking the JSON item. `min_products` is
+    the fewest rows that count as a successful extraction.
+    """
+
+    def __init__(self, fields=None, api_url=None, min_products=1, pool_size=16):
+        self.fields = fields or DEFAULT_FIELDS
+        self.api_url = api_url
+        self.min_products = min_products
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.stats = {'direct': 0, 'fallback': 0}
+
+    def _get(self, url):
+        response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response
+
+    def row_from_item(self, item, page_url):
+        """Map one JSON object onto a raw row, or None if it is not a product"""
+        row = {}
+        for field, candidates in self.fields.items():
+            if callable(candidates):
+                value = candidates(item)
+            else:
+                value = next((v for v in (get_path(item, c) for c in candidates) if v not in (None, '', [])), None)
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if field == 'price':
+                value = format_price_value(value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            row[field] = value if isinstance(value, str) else ''
+        name_field = 'full_name' if 'full_name' in row else 'name'
+        if not row.get(name_field) or not row.get('price'):
+            return None
+        for field in ('image_url', 'product_link', 'product_url'):
+            if row.get(field):
+                row[field] = urljoin(page_url, row[field])
+        return row
+
+    def rows_from_json(self, data, page_url):
+        """Every product-like object in a JSON document, in document order"""
+        rows, stack = [], [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                row = self.row_from_item(node, page_url)
+                if row is not None:
+                    rows.append(row)
+                    continue  # Variants and nested offers belong to this product
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+        return rows
+
+    def rows_from_html(self, html, page_url):
+        blocks = NEXT_DATA.findall(html) or JSON_SCRIPT.findall(html)
+        rows = []
+        for block in blocks:
+            try:
+                rows.extend(self.rows_from_json(json.loads(block), page_url))
+            except ValueError:
+                continue
+        return rows
+
+    def fetch(self, page_url):
+        """(rows or None, html) for a listing page; None means fall back to the browser"""
+        html = ''
+        try:
+            if self.api_url and (api_url := self.api_url(page_url)):
+                rows = self.rows_from_json(self._get(api_url).json(), page_url)
+                if len(rows) >= self.min_products:
+                    return rows, html
+            html = self._get(page_url).text
+            rows = self.rows_from_html(html, page_url)
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Direct extraction failed for {page_url}: {e}")
+            return None, html
+        return (rows, html) if len(rows) >= self.min_products else (None, html)
+
+    async def extract(self, page_url):
+        rows, html = await asyncio.to_thread(self.fetch, page_url)
+        self.stats['direct' if rows else 'fallback'] += 1
+        return rows, html
+
+    def summary(self):
+        return (f"⚡ Direct extraction: {self.stats['direct']} pages without the browser, "
+                f"{self.stats['fallback']} fell back to rendering")
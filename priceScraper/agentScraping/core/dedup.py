@@ -0,0 +1,38 @@
+"""
+Hash-based product deduplication.
+
+Products are duplicates when their lower-cased, whitespace-collapsed name and
+their price are equal. Products without a price are never treated as
+duplicates, since the name alone is too weak a key. Lookups go through a set,
+so deduplicating n products costs O(n) instead of the O(n^2) `any(...)` scan
+over every product kept so far.
+"""
+
+def dedup_key(name, price):
+    """Key for duplicate detection, or None if the product has no price"""
+    if not price:
+        return None
+    return (' '.join(name.lower().split()), price)
+
+class Deduplicator:
+    """Remembers every key seen during a run (across pages, categories and stores)"""
+
+    def __init__(self):
+        self.seen = set()
+        self.dropped = 0
+
+    def add(self, product):
+        """Return True if the product is new, False if it duplicates an earlier one"""
+        key = dedup_key(product.get('name', ''), product.get('price'))
+        if key is None:
+            return True
+        # The same name and price at two stores are two different listings
+        key = (product.get('supermarket', ''),) + key
+        if key in self.seen:
+            self.dropped += 1
+            return False
+        self.seen.add(key)
+        return True
+
+    def filter(self, products):
+        return [product for product in products if self.add(product)]
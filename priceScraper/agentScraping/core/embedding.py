@@ -0,0 +1,258 @@
+"""
+Batched embedding client shared by the store scrapers.
+
+The scrapers used to send one blocking POST to /products/embed-text per
+product. This client packs many texts into each request, keeps several
+requests in flight over one pooled keep-alive session, and falls back to
+single-text calls when the backend does not know the batch route. With an
+EmbeddingCache attached, only texts missing from the cache are sent.
+
+BATCH CONTRACT:
+    POST /products/embed-batch
+    Request:  {"texts": ["text 1", "text 2", ...]}
+    Response: {"statusCode": 200, "embeddings": [[...], [...], ...]}
+              (one embedding per text, same order; null for a failed text)
+
+    A 404 or 405 on this route means "no batch support" and switches the
+    client to /products/embed-text for the rest of its lifetime.
+
+EMBEDDERS:
+    Every embedder has the same interface (embed_texts / embed_products, used
+    as a context manager), so the backend can be swapped for an in-process
+    model with make_embedder() or the EMBEDDER environment variable:
+        'remote'                 EmbeddingClient, the backend (default)
+        'hashing'                HashingEmbedder, feature hashing on all cores; no model, no network
+        'sentence-transformers'  SentenceTransformerEmbedder, a local model (optional dependency)
+    Vectors of different embedders are not comparable; the cache keeps them
+    apart by model name.
+"""
+
+import os, asyncio, time
+import requests
+from requests.adapters import HTTPAdapter
+from core.embedding_cache import EmbeddingCache, EMBEDDING_MODEL
+from core.metrics import metrics
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3000")
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_CONCURRENCY = 4
+EMBEDDER = os.getenv("EMBEDDER", "remote")
+EMBEDDERS = ('remote', 'hashing', 'sentence-transformers')
+
+def embedding_text(product):
+    """Text sent to the embedding model for a product (name, quantity and price)"""
+    return f"{product.get('name', '')} {product.get('quantity', '')} {product.get('price', '')}"
+
+def make_session(pool_size):
+    """Create a keep-alive session whose connection pool fits `pool_size` parallel requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers['Content-Type'] = 'application/json'
+    api_key = os.getenv("JWT_SECRET")
+    if api_key:
+        session.headers['X-API-Key'] = api_key
+    return session
+
+class Embedder:
+    """Cache lookup, bookkeeping and product handling shared by all embedders
+
+    Subclasses set `model` (the cache namespace) and implement
+    _embed_uncached(texts), returning one vector or None per text.
+    """
+
+    model = None
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.stats = {'requests': 0, 'texts': 0, 'embedded': 0, 'failed': 0, 'seconds': 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    @property
+    def mode(self):
+        """How texts were embedded, for the progress line"""
+        return self.model
+
+    async def _embed_uncached(self, texts):
+        raise NotImplementedError
+
+    async def _embed_counted(self, texts):
+        start = time.perf_counter()
+        embeddings = await self._embed_uncached(texts)
+        embedded = sum(1 for e in embeddings if e is not None)
+        self.stats['texts'] += len(texts)
+        self.stats['embedded'] += embedded
+        self.stats['failed'] += len(texts) - embedded
+        self.stats['seconds'] += time.perf_counter() - start
+        metrics.inc('texts_total', embedded, result='embedded')
+        metrics.inc('texts_total', len(texts) - embedded, result='failed')
+        return embeddings
+
+    async def embed_texts(self, texts):
+        """Return one embedding (or None on failure) per text, in input order"""
+        if not texts:
+            return []
+        if self.cache is None:
+            return await self._embed_counted(texts)
+
+        embeddings = self.cache.get_many(texts)
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = await self._embed_counted(missing_texts)
+            self.cache.put_many(missing_texts, fresh)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+        return embeddings
+
+    async def embed_products(self, products):
+        """Set product['embedding'] for every product in place"""
+        start = time.perf_counter()
+        texts_before = self.stats['texts']
+        embeddings = await self.embed_texts([embedding_text(p) for p in products])
+        failed = 0
+        for product, embedding in zip(products, embeddings):
+            if embedding is None:
+                failed += 1
+                continue
+            product['embedding'] = embedding
+
+        elapsed = time.perf_counter() - start
+        rate = len(products) / elapsed if elapsed > 0 else 0.0
+        mode = self.mode if self.stats['texts'] > texts_before else "cache only"
+        print(f"🔗 Embedded {len(products) - failed}/{len(products)} products in {elapsed:.1f}s "
+              f"({rate:.1f} products/sec, {mode} mode)")
+        if failed:
+            print(f"⚠️ Embedding failed for {failed} products")
+
+class EmbeddingClient(Embedder):
+    """Embeds texts through the backend in batches with bounded concurrency"""
+
+    model = EMBEDDING_MODEL
+
+    def __init__(self, base_url=BACKEND_URL, batch_size=DEFAULT_BATCH_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, timeout=60, cache=None):
+        super().__init__(cache)
+        self.base_url = base_url.rstrip('/')
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.session = make_session(self.concurrency)
+        # None = not probed yet, True/False once the backend has answered
+        self.batch_supported = None
+
+    def close(self):
+        self.session.close()
+
+    @property
+    def mode(self):
+        return {True: "batch", False: "single-text"}.get(self.batch_supported, "remote")
+
+    def _post(self, path, payload):
+        self.stats['requests'] += 1
+        start, status = time.perf_counter(), 'error'
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe('request_seconds', time.perf_counter() - start, endpoint=path)
+            metrics.inc('requests_total', endpoint=path, status=status)
+
+    async def _embed_batch(self, texts, semaphore):
+        """Embed one chunk via the batch route; returns None if the route is missing or did not answer"""
+        async with semaphore:
+            try:
+                response = await asyncio.to_thread(self._post, "/products/embed-batch", {"texts": texts})
+            except Exception as e:
+                print(f"⚠️ Embedding batch request failed: {e}")
+                return None
+
+        if response.status_code in (404, 405):
+            self.batch_supported = False
+            return None
+        self.batch_supported = True
+        if response.status_code != 200:
+            print(f"⚠️ Embedding batch failed: {response.status_code}")
+            return [None] * len(texts)
+
+        embeddings = response.json().get('embeddings') or []
+        if len(embeddings) != len(texts):
+            print(f"⚠️ Embedding batch returned {len(embeddings)} vectors for {len(texts)} texts")
+            return [None] * len(texts)
+        return embeddings
+
+    async def _embed_single(self, text, semaphore):
+        async with semaphore:
+            try:
+                response = await asyncio.to_thread(self._post, "/products/embed-text", {"text": text})
+            except Exception as e:
+                print(f"⚠️ Embedding request failed: {e}")
+                return None
+        if response.status_code != 200:
+            return None
+        return response.json().get('embedding')
+
+    async def _embed_uncached(self, texts):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = [None] * len(chunks)
+
+        pending = list(range(len(chunks)))
+        # Probe one chunk at a time until the backend answers, so an old backend answers 404 once,
+        # not N times, and an unreachable one is not sent every text on its own
+        while pending and self.batch_supported is None:
+            i = pending.pop(0)
+            results[i] = await self._embed_batch(chunks[i], semaphore)
+
+        if self.batch_supported:
+            batch_results = await asyncio.gather(*(self._embed_batch(chunks[i], semaphore) for i in pending))
+            for i, embeddings in zip(pending, batch_results):
+                results[i] = embeddings
+
+        # None marks a chunk the batch route did not embed (no answer, or no route), in the probe or the gather;
+        # those go through the single-text fallback once the backend has said it has no batch route
+        unanswered = [i for i, embeddings in enumerate(results) if embeddings is None]
+        if self.batch_supported is False:
+            fallback = await asyncio.gather(*(asyncio.gather(*(self._embed_single(t, semaphore) for t in chunks[i]))
+                                              for i in unanswered))
+            for i, embeddings in zip(unanswered, fallback):
+                results[i] = embeddings
+
+        return [e for chunk, embeddings in zip(chunks, results) for e in (embeddings or [None] * len(chunk))]
+
+def make_embedder(kind=EMBEDDER, base_url=BACKEND_URL, batch_size=DEFAULT_BATCH_SIZE,
+                  concurrency=DEFAULT_CONCURRENCY, use_cache=False):
+    """Embedder named by `kind` (see EMBEDDERS), with an EmbeddingCache for its model when `use_cache` is set"""
+    if kind == 'remote':
+        embedder = EmbeddingClient(base_url, batch_size=batch_size, concurrency=concurrency)
+    elif kind == 'hashing':
+        from core.local_embedding import HashingEmbedder
+        embedder = HashingEmbedder()
+    elif kind == 'sentence-transformers':
+        from core.local_embedding import SentenceTransformerEmbedder
+        embedder = SentenceTransformerEmbedder()
+    else:
+        raise ValueError(f"Unknown embedder {kind!r}; expected one of {EMBEDDERS}")
+    if use_cache:
+        embedder.cache = EmbeddingCache(model=embedder.model)
+    return embedder
+
+async def embed_products(products, base_url=BACKEND_URL, batch_size=DEFAULT_BATCH_SIZE,
+                         concurrency=DEFAULT_CONCURRENCY, use_cache=True, embedder=EMBEDDER):
+    """Embed products in place with `embedder`, reusing cached vectors when `use_cache` is set"""
+    with make_embedder(embedder, base_url, batch_size=batch_size, concurrency=concurrency,
+                       use_cache=use_cache) as client:
+        await client.embed_products(products)
+    if client.cache:
+        print(client.cache.summary())
+        client.cache.close()
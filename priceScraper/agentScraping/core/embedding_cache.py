@@ -0,0 +1,95 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Entries are keyed by sha256(model + text), so a product is only re-embedded
+when its embedding input (name, quantity, price) or the embedding model
+changes. Vectors are stored as packed float32 in a single SQLite file and the
+least recently used entries are evicted once the cache grows past
+`max_entries`.
+"""
+
+import os, time, sqlite3, hashlib
+from array import array
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "embeddings.sqlite")
+DEFAULT_MAX_ENTRIES = 200_000
+
+def cache_key(text, model=EMBEDDING_MODEL):
+    return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of text -> embedding vector"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, model=EMBEDDING_MODEL, max_entries=DEFAULT_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def get_many(self, texts):
+        """Return a list with the cached vector (or None) for each text"""
+        keys = [cache_key(t, self.model) for t in texts]
+        found = {}
+        # SQLite caps bound parameters per statement, so look up in slices
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for key, blob in self.db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ):
+                found[key] = array('f', blob).tolist()
+
+        if found:
+            now = time.time()
+            self.db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                [(now, key) for key in found])
+            self.db.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts, embeddings):
+        """Store vectors for texts; None embeddings are skipped"""
+        now = time.time()
+        rows = [(cache_key(t, self.model), array('f', e).tobytes(), now)
+                for t, e in zip(texts, embeddings) if e is not None]
+        self.db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+        self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)", (excess,)
+            )
+            self.evictions += excess
+
+    def summary(self):
+        total = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / total if total else 0.0
+        return (f"🗃️ Embedding cache: {self.hits} hits, {self.misses} misses "
+                f"({hit_rate:.1f}% hit rate), {self.evictions} evicted")
@@ -0,0 +1,136 @@
+"""
+In-process embedders: no backend, no network round-trip.
+
+HashingEmbedder needs no extra packages. Each text becomes a bag of word
+and character 3-gram features (the 3-grams are taken with the spaces
+removed, so "2L" and "2 L" share them), hashed into `dimension` signed
+buckets and L2-normalized. Batches run in a process pool on every core. The
+vectors are stable across runs and machines (crc32, not Python's salted
+hash()), so they can be cached and compared; there is no IDF weighting,
+because that would make a text's vector depend on the batch it came in.
+
+SentenceTransformerEmbedder runs a small sentence-transformers model on the
+CPU (LOCAL_EMBEDDING_BACKEND=onnx uses ONNX Runtime instead of PyTorch).
+The model is downloaded on first use.
+
+Both are drop-in replacements for core.embedding.EmbeddingClient:
+
+    with make_embedder('hashing', use_cache=True) as embedder:
+        await embedder.embed_products(products)
+"""
+
+import os, re, math, zlib, asyncio, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from core.embedding import Embedder
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional; only EMBEDDER='sentence-transformers' needs it
+    SentenceTransformer = None
+
+HASHING_DIMENSION = 768  # Same width as the backend model, so the output files keep their shape
+CHAR_NGRAM = 3
+WORD_WEIGHT = 1.0
+NGRAM_WEIGHT = 0.5
+LOCAL_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_BACKEND = os.getenv("LOCAL_EMBEDDING_BACKEND", "torch")  # 'onnx' or 'openvino' need the matching extras
+
+WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+def hash_features(text):
+    """(feature, weight) pairs of one text"""
+    words = WORD.findall(text.lower())
+    compact = ''.join(words)
+    features = [(f"w:{word}", WORD_WEIGHT) for word in words]
+    features += [(f"c:{compact[i:i + CHAR_NGRAM]}", NGRAM_WEIGHT) for i in range(len(compact) - CHAR_NGRAM + 1)]
+    return features
+
+def hash_sparse(texts, dimension=HASHING_DIMENSION):
+    """{bucket: value} of each text's unit vector; this is what the worker processes send back"""
+    sparse = []
+    for text in texts:
+        buckets = {}
+        for feature, weight in hash_features(text):
+            h = zlib.crc32(feature.encode('utf-8'))
+            # The top bit picks the sign, so colliding features tend to cancel instead of pile up
+            buckets[h % dimension] = buckets.get(h % dimension, 0.0) + (weight if h & 0x80000000 else -weight)
+        norm = math.sqrt(sum(value * value for value in buckets.values())) or 1.0
+        sparse.append({bucket: value / norm for bucket, value in buckets.items()})
+    return sparse
+
+def densify(sparse, dimension=HASHING_DIMENSION):
+    """Full-length lists; built directly, since a dense array's tolist() would allocate every zero"""
+    vectors = []
+    for buckets in sparse:
+        vector = [0.0] * dimension
+        for bucket, value in buckets.items():
+            vector[bucket] = value
+        vectors.append(vector)
+    return vectors
+
+def hash_batch(texts, dimension=HASHING_DIMENSION):
+    """One unit vector (a list of floats) per text; all zeros for a text without features"""
+    return densify(hash_sparse(texts, dimension), dimension)
+
+class HashingEmbedder(Embedder):
+    """Feature-hashing embedder; batches of `batch_size` texts are spread over `workers` processes"""
+
+    def __init__(self, dimension=HASHING_DIMENSION, batch_size=512, workers=None, cache=None):
+        super().__init__(cache)
+        self.dimension = dimension
+        self.batch_size = max(1, batch_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.model = f"hashing-{dimension}-v1"
+        self.pool = None  # Started on the first input larger than one batch
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    @property
+    def mode(self):
+        return f"local hashing, workers={self.workers}"
+
+    async def _embed_uncached(self, texts):
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        self.stats['requests'] += len(chunks)
+        if len(chunks) == 1 or self.workers == 1:
+            batches = [await asyncio.to_thread(hash_batch, chunk, self.dimension) for chunk in chunks]
+        else:
+            if self.pool is None:
+                # spawn, not fork: the parent has an event loop and worker threads running
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            loop = asyncio.get_running_loop()
+            # Workers return the few non-zero buckets per text; the full lists are only built here
+            sparse = await asyncio.gather(*(loop.run_in_executor(self.pool, hash_sparse, chunk, self.dimension)
+                                            for chunk in chunks))
+            batches = [densify(batch, self.dimension) for batch in sparse]
+        return [vector for batch in batches for vector in batch]
+
+class SentenceTransformerEmbedder(Embedder):
+    """sentence-transformers model on the CPU; PyTorch/ONNX Runtime spread each batch over all cores"""
+
+    def __init__(self, model_name=LOCAL_MODEL, backend=LOCAL_BACKEND, batch_size=64, cache=None):
+        if SentenceTransformer is None:
+            raise ImportError("EMBEDDER='sentence-transformers' needs: pip install sentence-transformers")
+        super().__init__(cache)
+        self.model = model_name
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.encoder = None  # Loaded on the first texts that miss the cache
+
+    @property
+    def mode(self):
+        return f"local {self.model.rsplit('/', 1)[-1]} ({self.backend})"
+
+    def _encode(self, texts):
+        if self.encoder is None:
+            options = {} if self.backend == 'torch' else {'backend': self.backend}
+            self.encoder = SentenceTransformer(self.model, device='cpu', **options)
+        return self.encoder.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                   convert_to_numpy=True, show_progress_bar=False)
+
+    async def _embed_uncached(self, texts):
+        self.stats['requests'] += (len(texts) + self.batch_size - 1) // self.batch_size
+        return (await asyncio.to_thread(self._encode, texts)).tolist()
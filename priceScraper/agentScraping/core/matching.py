@@ -0,0 +1,227 @@
+"""
+Cross-store product matching over the embedding vectors.
+
+The same item is sold by FairPrice, Cold Storage and Sheng Siong under
+slightly different names ("Meiji Fresh Milk 2L" / "MEIJI Fresh Milk 2 L"),
+so matching goes by embedding similarity instead of by name. Every store's
+vectors are put in an in-process IVF index (k-means centroids over a float32
+matrix, each vector filed under its nearest centroid); a query only scans
+the `nprobe` lists whose centroids are closest to it, and queries run in
+batches as matrix products, so 30k products match in seconds instead of
+the ~450M comparisons of an all-pairs scan.
+
+Two products of different stores are matched when each is the other's
+nearest neighbour in that store (within its top `k`) and their cosine
+similarity is at least `threshold`. Matched pairs are joined into candidate
+groups, one row per product:
+
+    cross_store_matches.json  [{"group": 0, "score": 0.97, "stores": 3, "products": [{...}, ...]}, ...]
+    cross_store_matches.csv   group, score, supermarket, name, quantity, price, unit_price_cents, product_url
+
+`score` is the weakest link of the group, so groups are listed surest first.
+"""
+
+import os, csv, json, time
+import numpy as np
+from core.output import OUTPUT_DIR
+
+MATCHES_BASENAME = 'cross_store_matches'
+MATCH_FIELDS = ['supermarket', 'name', 'quantity', 'price', 'unit_price_cents', 'product_url']
+DEFAULT_THRESHOLD = 0.92  # Cosine similarity two products need to be offered as the same item
+EXACT_SEARCH_BELOW = 2048  # Smaller stores are scanned in full; an index would not pay for its training
+KMEANS_ITERATIONS = 8
+TRAIN_PER_LIST = 40  # k-means runs on a sample of at most this many vectors per list
+
+def normalize(matrix):
+    """Unit-length float32 rows, so a dot product is a cosine similarity"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def _top_k(scores, k):
+    """(scores, columns) of the best k columns per row, highest first"""
+    if scores.shape[1] > k:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, columns, axis=1)
+    else:
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(columns, order, axis=1)
+
+class IVFIndex:
+    """Inverted-file index over unit vectors, searched by inner product
+
+    `nlist` defaults to ~sqrt(n) lists; with n below EXACT_SEARCH_BELOW it is
+    1 and search() is an exact, batched scan. Raising `nprobe` trades speed
+    for recall.
+    """
+
+    def __init__(self, vectors, nlist=None, nprobe=8, seed=0):
+        vectors = normalize(vectors)
+        n = len(vectors)
+        if nlist is None:
+            nlist = 1 if n < EXACT_SEARCH_BELOW else int(np.sqrt(n))
+        self.nlist = max(1, min(nlist, n))
+        self.nprobe = min(nprobe, self.nlist)
+        self.centroids = self._train(vectors, np.random.default_rng(seed))
+        assignment = self._nearest_list(vectors)
+        # Vectors are stored grouped by list, so scanning a list is one contiguous slice
+        self.ids = np.argsort(assignment, kind='stable')
+        self.vectors = np.ascontiguousarray(vectors[self.ids])
+        self.offsets = np.searchsorted(assignment[self.ids], np.arange(self.nlist + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _train(self, vectors, rng):
+        if self.nlist == 1:
+            return np.zeros((1, vectors.shape[1]), dtype=np.float32)
+        sample_size = min(len(vectors), self.nlist * TRAIN_PER_LIST)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            # Per-list sums as one matrix product with the (list x vector) membership matrix
+            members = np.zeros((self.nlist, sample_size), dtype=np.float32)
+            members[assignment, np.arange(sample_size)] = 1
+            sums = members @ sample
+            counts = members.sum(axis=1)
+            # An empty list keeps its old centroid rather than collapsing to zero
+            centroids = np.where(counts[:, None] > 0, normalize(sums), centroids)
+        return centroids
+
+    def _nearest_list(self, vectors, batch_size=8192):
+        return np.concatenate([np.argmax(vectors[i:i + batch_size] @ self.centroids.T, axis=1)
+                               for i in range(0, len(vectors), batch_size)] or [np.zeros(0, dtype=np.int64)])
+
+    def search(self, queries, k=10, batch_size=8192):
+        """(scores, ids) of the k most similar vectors per query, best first; missing hits are -inf / -1"""
+        queries = normalize(queries)
+        k = max(1, min(k, len(self)))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            if self.nprobe == self.nlist:
+                probes = np.broadcast_to(np.arange(self.nlist), (len(batch), self.nlist))
+            else:
+                probes = np.argpartition(-(batch @ self.centroids.T), self.nprobe - 1, axis=1)[:, :self.nprobe]
+            # Each list is scanned once per batch, against all the queries that probe it; every
+            # (query, probe) slot keeps that list's best k, and the slots are merged at the end
+            flat = probes.ravel()
+            order = np.argsort(flat, kind='stable')
+            bounds = np.searchsorted(flat[order], np.arange(self.nlist + 1))
+            slot_scores = np.full((len(batch), self.nprobe, k), -np.inf, dtype=np.float32)
+            slot_ids = np.full((len(batch), self.nprobe, k), -1, dtype=np.int64)
+            for list_id in range(self.nlist):
+                lo, hi = self.offsets[list_id], self.offsets[list_id + 1]
+                probed = order[bounds[list_id]:bounds[list_id + 1]]
+                if lo == hi or not len(probed):
+                    continue
+                rows, slots = probed // self.nprobe, probed % self.nprobe
+                found, columns = _top_k(batch[rows] @ self.vectors[lo:hi].T, k)
+                slot_scores[rows, slots, :found.shape[1]] = found
+                slot_ids[rows, slots, :found.shape[1]] = self.ids[lo + columns]
+            best, columns = _top_k(slot_scores.reshape(len(batch), -1), k)
+            scores[start:start + len(batch)] = best
+            ids[start:start + len(batch)] = np.take_along_axis(slot_ids.reshape(len(batch), -1), columns, axis=1)
+        return scores, ids
+
+def load_vectors(products):
+    """(rows, matrix) for the products that have an embedding
+
+    `rows` keeps only the MATCH_FIELDS of each product, so `products` can be a
+    stream (e.g. output.NdjsonProducts) without the catalogue staying in memory.
+    """
+    rows, vectors, dim = [], [], 0
+    for product in products:
+        embedding = product.get('embedding')
+        if not embedding or (dim and len(embedding) != dim):
+            continue
+        dim = len(embedding)
+        rows.append({field: product.get(field) for field in MATCH_FIELDS})
+        vectors.append(np.asarray(embedding, dtype=np.float32))
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    return rows, matrix
+
+def _mutual_pairs(a_matrix, a_index, b_matrix, b_index, k, threshold):
+    """(i, j, score) for products i of store a and j of store b that are in each other's top k"""
+    a_scores, a_hits = b_index.search(a_matrix, k)
+    _, b_hits = a_index.search(b_matrix, k)
+    pairs = []
+    for i in range(len(a_matrix)):
+        for score, j in zip(a_scores[i], a_hits[i]):
+            if j < 0 or score < threshold:
+                break
+            if i in b_hits[j]:
+                pairs.append((i, int(j), float(score)))
+    return pairs
+
+def find_matches(stores, threshold=DEFAULT_THRESHOLD, k=1, nprobe=8):
+    """Candidate groups of the same item across stores
+
+    `stores` maps a store name to its load_vectors() result. Returns groups
+    as dicts (see the module docstring), surest first.
+    """
+    stores = {name: (rows, normalize(matrix)) for name, (rows, matrix) in stores.items() if len(rows)}
+    names = sorted(stores)
+    indexes = {name: IVFIndex(stores[name][1], nprobe=nprobe) for name in names}
+
+    # Union-find over (store, row) nodes; each group also tracks its weakest link
+    parent, weakest = {}, {}
+    def root(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for x, a in enumerate(names):
+        for b in names[x + 1:]:
+            for i, j, score in _mutual_pairs(stores[a][1], indexes[a], stores[b][1], indexes[b], k, threshold):
+                ra, rb = root((a, i)), root((b, j))
+                low = min(score, weakest.get(ra, 1.0), weakest.get(rb, 1.0))
+                parent[rb] = ra
+                weakest[ra] = low
+
+    members = {}
+    for node in parent:
+        members.setdefault(root(node), []).append(node)
+    groups = []
+    for group_root, nodes in members.items():
+        nodes.sort()
+        products = [stores[name][0][i] for name, i in nodes]
+        groups.append({'score': round(weakest[group_root], 4), 'stores': len({name for name, _ in nodes}),
+                       'products': products})
+    groups.sort(key=lambda g: (-g['score'], -g['stores'], g['products'][0]['name'] or ''))
+    for number, group in enumerate(groups):
+        group['group'] = number
+    return groups
+
+def save_matches(stores, basename=MATCHES_BASENAME, output_dir=OUTPUT_DIR, threshold=DEFAULT_THRESHOLD, k=1):
+    """Match `stores` ({name: products}) and write <basename>.json and <basename>.csv; returns the two paths"""
+    start = time.perf_counter()
+    vectors = {name: load_vectors(products) for name, products in stores.items()}
+    if sum(1 for rows, _ in vectors.values() if rows) < 2:
+        print("⚠️ Cross-store matching needs embedded products from at least two stores")
+        return None, None
+    groups = find_matches(vectors, threshold=threshold, k=k)
+
+    json_file = os.path.join(output_dir, f"{basename}.json")
+    with open(json_file, mode='w', encoding='utf-8') as f:
+        json.dump([{'group': g['group'], 'score': g['score'], 'stores': g['stores'], 'products': g['products']}
+                   for g in groups], f, ensure_ascii=False, indent=1)
+
+    csv_file = os.path.join(output_dir, f"{basename}.csv")
+    with open(csv_file, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['group', 'score'] + MATCH_FIELDS)
+        for group in groups:
+            writer.writerows([group['group'], group['score']] + [p.get(field) for field in MATCH_FIELDS]
+                             for p in group['products'])
+
+    searched = sum(len(rows) for rows, _ in vectors.values())
+    print(f"✅ {len(groups)} cross-store groups from {searched} products in {time.perf_counter() - start:.1f}s "
+          f"(similarity >= {threshold}):")
+    print(f"   📄 JSON: {json_file}")
+    print(f"   📄 CSV: {csv_file}")
+    return json_file, csv_file
@@ -0,0 +1,199 @@
+"""
+Run metrics: per-stage spans, counters and latency histograms.
+
+One process-wide registry (`metrics`) collects what the scrapers and the
+shared clients do:
+
+    with metrics.span('render', store='coldstorage'):     # time a stage
+        results = await crawler.arun(url, config=config)
+    metrics.inc('pages_total', store='coldstorage', result='ok')
+    metrics.inc('page_bytes_total', len(html), store='coldstorage')
+    metrics.observe('request_seconds', latency, endpoint='upload')
+    metrics.watch_event_loop()                             # in main(): event loop lag
+
+Spans are stored as the `stage_seconds` histogram, so "where did the time
+go" is a lookup. Stages run concurrently (pages in parallel, embedding while
+scraping), so the busy seconds of all stages can add up to more than the
+run's wall time.
+
+At exit the registry prints a summary table and writes
+    cache/metrics/<run>.json   everything, with p50/p90/p99 per histogram
+    cache/metrics/<run>.prom   Prometheus text format (node_exporter textfile collector)
+"""
+
+import os, json, time, atexit, asyncio, threading
+from contextlib import contextmanager
+
+METRICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "metrics")
+PREFIX = 'scraper'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MAX_SAMPLES = 100_000  # Raw values kept per histogram for exact percentiles in the summary
+LAG_INTERVAL = 0.1  # Seconds between event loop lag samples
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+def _series(entry):
+    """name{k=v,...} for the summary table"""
+    labels = ','.join(f"{k}={v}" for k, v in sorted(entry['labels'].items()))
+    return f"{entry['name']}{{{labels}}}" if labels else entry['name']
+
+class Metrics:
+    """Counters and histograms keyed by name and labels; safe to update from worker threads"""
+
+    def __init__(self, prefix=PREFIX, buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._exit_report = None
+        self._watcher = None
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0,
+                                                    'count': 0, 'samples': []}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+            if len(histogram['samples']) < MAX_SAMPLES:
+                histogram['samples'].append(value)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time a block as `stage`; a block that raises also counts in stage_errors_total"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc('stage_errors_total', stage=stage, **labels)
+            raise
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def watch_event_loop(self, interval=LAG_INTERVAL):
+        """Sample how late the running event loop wakes up (event_loop_lag_seconds) until it stops
+
+        A sleep that should last `interval` and lasts longer was held up by
+        code running on the loop, i.e. by CPU work that blocked every crawl.
+        """
+        async def watch():
+            loop = asyncio.get_running_loop()
+            while True:
+                start = loop.time()
+                await asyncio.sleep(interval)
+                self.observe('event_loop_lag_seconds', max(0.0, loop.time() - start - interval))
+        self._watcher = asyncio.get_running_loop().create_task(watch())
+        return self._watcher
+
+    def to_dict(self):
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), h in sorted(self.histograms.items()):
+                samples = sorted(h['samples'])
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets, h['counts']):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                buckets['+Inf'] = h['count']
+                histograms.append({
+                    'name': name, 'labels': dict(labels), 'count': h['count'], 'sum': round(h['sum'], 6),
+                    'p50': _percentile(samples, 50), 'p90': _percentile(samples, 90),
+                    'p99': _percentile(samples, 99), 'max': samples[-1] if samples else 0.0,
+                    'buckets': buckets,
+                })
+        return {'started': self.started, 'elapsed': round(time.time() - self.started, 3),
+                'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self):
+        """Prometheus text exposition format"""
+        data = self.to_dict()
+        lines, typed = [], set()
+        for counter in data['counters']:
+            name = f"{self.prefix}_{counter['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(sorted(counter['labels'].items()))} {counter['value']}")
+        for histogram in data['histograms']:
+            name = f"{self.prefix}_{histogram['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            labels = sorted(histogram['labels'].items())
+            for bound, count in histogram['buckets'].items():
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_label_text(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, title='Run metrics'):
+        """Table of stage spans, request latencies and counters"""
+        data = self.to_dict()
+        lines = [f"\n📈 {title} ({data['elapsed']:.1f}s wall)"]
+        histograms = data['histograms']
+        width = max([len(_series(m)) + 2 for m in histograms + data['counters']] + [30])
+        if histograms:
+            lines.append(f"   {'histogram':<{width}}{'count':>7}{'busy s':>10}{'mean':>9}{'p50':>9}{'p90':>9}{'max':>9}")
+        for h in histograms:
+            mean = h['sum'] / h['count'] if h['count'] else 0.0
+            lines.append(f"   {_series(h):<{width}}{h['count']:>7}{h['sum']:>10.2f}{mean:>9.3f}{h['p50']:>9.3f}"
+                         f"{h['p90']:>9.3f}{h['max']:>9.3f}")
+        for c in data['counters']:
+            lines.append(f"   {_series(c):<{width}}{c['value']:>7}")
+        return '\n'.join(lines)
+
+    def save(self, run, directory=METRICS_DIR):
+        """Write <run>.json and <run>.prom; returns the two paths"""
+        os.makedirs(directory, exist_ok=True)
+        json_file = os.path.join(directory, f"{run}.json")
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.to_dict(), run=run), f, indent=2)
+        prom_file = os.path.join(directory, f"{run}.prom")
+        # Written next to the target and renamed, so a textfile collector never reads half a file
+        with open(f"{prom_file}.tmp", 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(f"{prom_file}.tmp", prom_file)
+        return json_file, prom_file
+
+    def report_at_exit(self, run, directory=METRICS_DIR):
+        """Print the summary and save the files when the process exits (also after a failure)"""
+        if self._exit_report is None:
+            atexit.register(self._report)
+        self._exit_report = (run, directory)
+
+    def _report(self):
+        run, directory = self._exit_report
+        print(self.summary(f"Run metrics: {run}"))
+        json_file, prom_file = self.save(run, directory)
+        print(f"   📄 JSON: {json_file}")
+        print(f"   📄 Prometheus: {prom_file}")
+
+metrics = Metrics()
@@ -0,0 +1,187 @@
+"""
+Product normalization shared by the store scrapers.
+
+Every pattern is compiled once at import time, and the batch helpers work on a
+whole page of rows at a time, so cleaning a page no longer goes back through
+`re`'s pattern cache for every field of every row. Besides the string clean-up
+the stores already did (whitespace, slugs, "$x.xx" prices, "125 g" quantities),
+this module parses quantities into `Quantity(count, amount, unit)` with
+canonical units and prices into integer cents, and derives a unit price from the
+two (cents per 100 g, per 100 ml or per piece):
+
+    parse_quantity("6 x 250ml")  -> Quantity(count=6, amount=250.0, unit='ml')
+    parse_quantity("1.5kg")      -> Quantity(count=1, amount=1500.0, unit='g')
+    parse_quantity("10s")        -> Quantity(count=1, amount=10.0, unit='pcs')
+    parse_price_cents("$1,234.5") -> 123450
+    unit_price(350, Quantity(2, 500.0, 'g')) -> (35.0, '100g')
+"""
+
+import re
+from urllib.parse import urlparse
+from functools import lru_cache
+from collections import namedtuple
+
+SLUG_STRIP = re.compile(r'[^\w\s-]')
+SLUG_SEPARATORS = re.compile(r'[-\s]+')
+SLUG_NON_WORD = re.compile(r'[^\w]')
+SLUG_DASHES = re.compile(r'-+')
+NUMBER_UNIT = re.compile(r'(\d+)([a-zA-Z]+)')
+
+# Quantity at the end of a product name, tried in this order (first match wins).
+# The old list also had "\d+(.\d+)?(kg|g|ml|l|oz|lb)" with and without "\s*";
+# whenever those match, an earlier pattern here already has, so they are gone.
+NAME_QUANTITY_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'\b(\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb|pc|pcs|pack|s))\b$',
+    r'\b(\d+(?:\.\d+)?x\d+(?:\.\d+)?(?:kg|g|ml|l|oz|lb))\b$',
+    r'\b(\d+\s*(?:kg|g|ml|l|oz|lb|pc|pcs|pack|s))\b$',
+])
+# Last letter of every unit above; names ending in anything else skip the regexes
+QUANTITY_LAST_LETTERS = frozenset('gGlLzZbBcCsSkK')
+
+PRICE = re.compile(r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)')
+PRICE_WITH_SIGN = re.compile(r'\$(\d+(?:,\d{3})*(?:\.\d{2})?)')
+PRICE_CENTS = re.compile(r'(\d+(?:,\d{3})*)(?:\.(\d{1,2}))?')
+
+# "6 x 250ml", "250ml x 6", "1.5kg", "10s", "3 pcs"
+QUANTITY = re.compile(
+    r'(?:(?P<count>\d+)\s*[x×]\s*)?'
+    r'(?P<amount>\d+(?:\.\d+)?)\s*'
+    r'(?P<unit>kg|kgs|g|gm|gms|gram|grams|mg|ml|cl|l|ltr|litre|litres|liter|liters|oz|lb|lbs|'
+    r'pcs|pc|pieces|piece|pack|packs|s|sachets|sticks|rolls|tabs|tablets|capsules)\b'
+    r'(?:\s*[x×]\s*(?P<suffix_count>\d+)\b)?',
+    re.IGNORECASE
+)
+
+# Canonical unit and the factor that converts into it
+UNITS = {
+    'mg': ('g', 0.001), 'g': ('g', 1), 'gm': ('g', 1), 'gms': ('g', 1), 'gram': ('g', 1), 'grams': ('g', 1),
+    'kg': ('g', 1000), 'kgs': ('g', 1000), 'oz': ('g', 28.3495), 'lb': ('g', 453.592), 'lbs': ('g', 453.592),
+    'ml': ('ml', 1), 'cl': ('ml', 10), 'l': ('ml', 1000), 'ltr': ('ml', 1000),
+    'litre': ('ml', 1000), 'litres': ('ml', 1000), 'liter': ('ml', 1000), 'liters': ('ml', 1000),
+}
+# Unit price basis for each canonical unit: (label, amount the price is quoted per)
+UNIT_PRICE_BASIS = {'g': ('100g', 100), 'ml': ('100ml', 100), 'pcs': ('pc', 1)}
+# Listing page suffix ("3.html") and path segments that never name a category
+PAGE_SEGMENT = re.compile(r'^\d+\.html$')
+NON_CATEGORY_SEGMENTS = {'en', 'category'}
+
+PIECE_UNITS = {'pcs', 'pc', 'pieces', 'piece', 'pack', 'packs', 's', 'sachets', 'sticks', 'rolls',
+               'tabs', 'tablets', 'capsules'}
+
+class Quantity(namedtuple('Quantity', 'count amount unit')):
+    """`count` items of `amount` each, in 'g', 'ml' or 'pcs'"""
+
+    @property
+    def total(self):
+        return self.count * self.amount
+
+def clean_whitespace(text):
+    """Collapse runs of whitespace and strip (same result as re.sub(r'\\s+', ' ', text).strip())"""
+    return ' '.join(text.split())
+
+def slugify(text):
+    """Lower-case URL slug: punctuation dropped, spaces and dashes collapsed to one dash"""
+    return SLUG_SEPARATORS.sub('-', SLUG_STRIP.sub('', text.lower())).strip('-')
+
+@lru_cache(maxsize=4096)
+def quantity_slug(quantity):
+    """Slug suffix for a quantity string ("1 kg" -> "1-kg", "6 x 250ml" -> "6-x-250ml")"""
+    return SLUG_DASHES.sub('-', SLUG_NON_WORD.sub('-', quantity.lower())).strip('-')
+
+def join_slug(slug, suffix):
+    """Join two slugs with one dash (either may be empty)"""
+    return f"{slug}-{suffix}".strip('-')
+
+def split_name_quantity(full_name):
+    """Split a trailing quantity off a product name; returns (name, quantity or '')"""
+    if not full_name or full_name[-1] not in QUANTITY_LAST_LETTERS:
+        return full_name, ''
+    for pattern in NAME_QUANTITY_PATTERNS:
+        match = pattern.search(full_name)
+        if match:
+            return (full_name[:match.start()] + full_name[match.end():]).strip(), match.group(1).strip()
+    return full_name, ''
+
+@lru_cache(maxsize=4096)
+def space_quantity(quantity):
+    """Whitespace-clean a quantity and put a space between number and unit ("125g" -> "125 g")"""
+    return NUMBER_UNIT.sub(r'\1 \2', clean_whitespace(quantity))
+
+def format_price(text, require_sign=False):
+    """Normalize a price string to "$x.xx" form, or '' if it has no price in it"""
+    match = (PRICE_WITH_SIGN if require_sign else PRICE).search(text)
+    return f"${match.group(1)}" if match else ''
+
+@lru_cache(maxsize=16384)
+def parse_price_cents(text):
+    """Price string -> integer cents ("$1,234.50" -> 123450), or None"""
+    if not text:
+        return None
+    match = PRICE_CENTS.search(text)
+    if not match:
+        return None
+    dollars = int(match.group(1).replace(',', ''))
+    cents = int((match.group(2) or '0').ljust(2, '0'))
+    return dollars * 100 + cents
+
+@lru_cache(maxsize=4096)
+def parse_quantity(text):
+    """Quantity string -> Quantity(count, amount, unit), or None if it has no recognisable unit
+
+    Quantity strings repeat a lot across a catalogue ("1 kg", "500 g"), so
+    results are memoized (as are space_quantity, quantity_slug and parse_price_cents).
+    """
+    if not text:
+        return None
+    match = QUANTITY.search(text)
+    if not match:
+        return None
+    unit = match.group('unit').lower()
+    amount = float(match.group('amount'))
+    count = int(match.group('count') or match.group('suffix_count') or 1)
+    if unit in PIECE_UNITS:
+        return Quantity(count, amount, 'pcs')
+    canonical, factor = UNITS[unit]
+    return Quantity(count, round(amount * factor, 4), canonical)
+
+def unit_price(price_cents, quantity):
+    """(cents per basis, basis) for a price and Quantity, or (None, None)
+
+    The basis is '100g', '100ml' or 'pc'; a "6 x 250ml" pack is priced on its
+    1500 ml total.
+    """
+    if price_cents is None or not quantity or quantity.total <= 0:
+        return None, None
+    basis, per = UNIT_PRICE_BASIS[quantity.unit]
+    return round(price_cents * per / quantity.total, 2), basis
+
+def category_from_url(url):
+    """Category slug from a category page URL
+
+    ".../en/category/100011/3.html" -> "100011", ".../category/bakery" -> "bakery",
+    "https://shengsiong.com.sg/fruits" -> "fruits"
+    """
+    segments = [s for s in urlparse(url).path.split('/') if s]
+    segments = [s for s in segments if s not in NON_CATEGORY_SEGMENTS and not PAGE_SEGMENT.match(s)]
+    return segments[-1] if segments else ''
+
+def annotate_products(products, category=None):
+    """Add structured price/quantity fields to a page of products (in place) and return it
+
+    Adds 'price_cents', 'quantity_count', 'quantity_amount', 'quantity_unit',
+    'unit_price_cents' and 'unit_price_basis' (None when the value could not be
+    parsed), and 'category' when one is given.
+    """
+    parse = parse_quantity
+    cents = parse_price_cents
+    for product in products:
+        quantity = parse(product.get('quantity') or '')
+        price_cents = product['price_cents'] = cents(product.get('price') or '')
+        if quantity:
+            product['quantity_count'], product['quantity_amount'], product['quantity_unit'] = quantity
+        else:
+            product['quantity_count'] = product['quantity_amount'] = product['quantity_unit'] = None
+        product['unit_price_cents'], product['unit_price_basis'] = unit_price(price_cents, quantity)
+        if category is not None:
+            product['category'] = category
+    return products
@@ -0,0 +1,95 @@
+"""
+Parsing and cleaning of extracted product JSON in worker processes.
+
+json.loads(result.extracted_content) and clean_and_filter_products() are
+pure CPU work, and inline they run on the event loop that also drives every
+browser page, so a big page stalls the crawl of all concurrent categories.
+With workers configured, the pool ships the extracted JSON text (a string,
+cheap to pickle) for all of a crawl's pages in one task and gets the cleaned
+products back, so the loop only waits on a future and cleaning spreads
+over the cores.
+
+    cleaning_pool.configure(CLEANING_WORKERS)        # once, in main(); 0 = inline
+    products = await cleaning_pool.clean_page(clean_and_filter_products, result.extracted_content, result.url)
+
+`clean` must be picklable: a module-level function (or a partial of one).
+Workers are spawned, not forked, and import the cleaner's module once
+when they start. Check metrics' event_loop_lag_seconds to see whether the
+loop needs this.
+"""
+
+import os, json, asyncio, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+PAGES_PER_TASK = 16  # Pages handed to a worker at once; big enough to amortize pickling, small enough to spread
+
+def parse_and_clean(clean, pages):
+    """Worker side: [(extracted_content, url)] -> one (products, data, error) per page
+
+    `products` is clean(rows, url) when the page held a non-empty list of
+    rows; otherwise `data` is whatever the JSON held instead. A page that
+    fails to parse or clean gets its exception as `error`.
+    """
+    results = []
+    for content, url in pages:
+        try:
+            data = json.loads(content)
+            if isinstance(data, list) and data:
+                results.append((clean(data, url), None, None))
+            else:
+                results.append((None, data, None))
+        except Exception as e:
+            results.append((None, None, e))
+    return results
+
+class CleaningPool:
+    """Runs cleaners in a process pool, or inline when configured with 0 workers"""
+
+    def __init__(self, workers=0, pages_per_task=PAGES_PER_TASK):
+        self.workers = workers
+        self.pages_per_task = max(1, pages_per_task)
+        self.executor = None  # Started on first use
+        self.stats = {'tasks': 0, 'pages': 0}
+
+    def configure(self, workers):
+        """Set the number of worker processes; None = one per core, 0 = clean on the event loop"""
+        self.close()
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def _executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    async def run(self, fn, *args):
+        """fn(*args) in a worker, or directly when there are no workers"""
+        if not self.workers:
+            return fn(*args)
+        self.stats['tasks'] += 1
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    async def clean_pages(self, clean, pages):
+        """parse_and_clean() over [(extracted_content, url)], split into tasks of `pages_per_task` pages"""
+        self.stats['pages'] += len(pages)
+        chunks = [pages[i:i + self.pages_per_task] for i in range(0, len(pages), self.pages_per_task)]
+        results = await asyncio.gather(*(self.run(parse_and_clean, clean, chunk) for chunk in chunks))
+        return [page for chunk in results for page in chunk]
+
+    async def clean_page(self, clean, content, url):
+        """Cleaned products of one page, or None when it had no rows; parse errors are raised"""
+        products, _, error = (await self.clean_pages(clean, [(content, url)]))[0]
+        if error is not None:
+            raise error
+        return products
+
+    def summary(self):
+        if not self.workers:
+            return "🧮 Cleaning: on the event loop"
+        return f"🧮 Cleaning: {self.stats['pages']} pages in {self.stats['tasks']} tasks on {self.workers} worker processes"
+
+cleaning_pool = CleaningPool()
@@ -0,0 +1,168 @@
+"""
+CSV/JSON output shared by the store scrapers.
+
+save_products() writes a finished product list in one go. ProductWriter is the
+streaming counterpart: pages are appended to <basename>.ndjson and
+<basename>.csv as they arrive and flushed, so nothing has to hold the whole
+catalogue in memory, and another process can follow the NDJSON file with
+tail_ndjson() while the scrape is still running.
+"""
+
+import os, csv, json, asyncio
+
+OUTPUT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_COLUMNS = ['name', 'supermarket', 'quantity', 'price', 'promotion_description',
+               'promotion_end_date_text', 'product_url', 'image_url', 'embedding']
+
+def save_products(products, basename, output_dir=OUTPUT_DIR, columnar=False):
+    """Save products to <basename>.csv and <basename>.json; returns the two paths
+
+    With `columnar`, also write typed columns and a float32 embedding matrix
+    (see core.columnar).
+    """
+    if not products:
+        print("⚠️ No products to save")
+        return None, None
+
+    # Save to CSV
+    csv_file = os.path.join(output_dir, f"{basename}.csv")
+    with open(csv_file, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for product in products:
+            cleaned_product = {col: product.get(col, '') for col in CSV_COLUMNS}
+            writer.writerow(cleaned_product)
+
+    # Save to JSON
+    json_file = os.path.join(output_dir, f"{basename}.json")
+    with open(json_file, mode='w', encoding='utf-8') as f:
+        json.dump(products, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ Saved {len(products)} products to:")
+    print(f"   📄 CSV: {csv_file}")
+    print(f"   📄 JSON: {json_file}")
+    if columnar:
+        from core.columnar import save_columnar
+        save_columnar(products, basename, output_dir)
+
+    # Show sample products
+    print("\n📦 Sample products:")
+    for i, product in enumerate(products[:3]):
+        print(f"   {i+1}. {product.get('name')} - {product.get('price')} ({product.get('quantity')})")
+        print(f"      URL: {product.get('product_url')}")
+    return csv_file, json_file
+
+DONE_SUFFIX = '.done'  # Marker created next to the NDJSON file once the writer is closed
+
+class ProductWriter:
+    """Append-as-you-go NDJSON + CSV writer, flushed after every page
+
+    USAGE:
+        with ProductWriter("coldstorage_products") as writer:
+            writer.write(page_products)
+        products = writer.reader()  # streams the NDJSON file back, any number of times
+    """
+
+    def __init__(self, basename, output_dir=OUTPUT_DIR):
+        self.basename = basename
+        self.output_dir = output_dir
+        self.ndjson_file = os.path.join(output_dir, f"{basename}.ndjson")
+        self.csv_file = os.path.join(output_dir, f"{basename}.csv")
+        self.json_file = os.path.join(output_dir, f"{basename}.json")
+        self.count = 0
+        self.sample = []
+        if os.path.exists(self.ndjson_file + DONE_SUFFIX):
+            os.remove(self.ndjson_file + DONE_SUFFIX)
+        self._ndjson = open(self.ndjson_file, mode='w', encoding='utf-8')
+        self._csv = open(self.csv_file, mode='w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._csv, fieldnames=CSV_COLUMNS)
+        self._writer.writeheader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, products):
+        """Append one page of products to both files and flush them"""
+        if not products:
+            return
+        self._ndjson.write(''.join(json.dumps(p, ensure_ascii=False) + '\n' for p in products))
+        self._writer.writerows({col: p.get(col, '') for col in CSV_COLUMNS} for p in products)
+        self._ndjson.flush()
+        self._csv.flush()
+        self.count += len(products)
+        self.sample.extend(products[:3 - len(self.sample)])
+
+    def close(self, write_json=True):
+        """Close both files, mark the NDJSON file done and (by default) also write <basename>.json"""
+        if self._ndjson.closed:
+            return
+        self._ndjson.close()
+        self._csv.close()
+        if write_json:
+            # Same content as save_products' JSON array, copied line by line from the NDJSON file
+            with open(self.ndjson_file, 'r', encoding='utf-8') as src, \
+                    open(self.json_file, mode='w', encoding='utf-8') as dst:
+                dst.write('[')
+                for i, line in enumerate(src):
+                    dst.write((',\n' if i else '\n') + line.rstrip('\n'))
+                dst.write('\n]\n')
+        open(self.ndjson_file + DONE_SUFFIX, 'w').close()
+
+        print(f"✅ Streamed {self.count} products to:")
+        print(f"   📄 NDJSON: {self.ndjson_file}")
+        print(f"   📄 CSV: {self.csv_file}")
+        for i, product in enumerate(self.sample):
+            print(f"   {i+1}. {product.get('name')} - {product.get('price')} ({product.get('quantity')})")
+
+    def reader(self):
+        return NdjsonProducts(self.ndjson_file)
+
+def read_ndjson(path):
+    """Yield the products of an NDJSON file one at a time"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+class NdjsonProducts:
+    """Re-iterable view of an NDJSON product file; every pass streams it from disk"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        return read_ndjson(self.path)
+
+async def tail_ndjson(path, batch_size=200, poll_interval=0.5):
+    """Follow an NDJSON file that a ProductWriter is still appending to
+
+    Yields lists of up to `batch_size` products as complete lines appear, and
+    returns once the writer has closed the file (its .done marker exists) and
+    every line has been read.
+    """
+    while not os.path.exists(path):
+        await asyncio.sleep(poll_interval)
+    with open(path, 'r', encoding='utf-8') as f:
+        partial, batch = '', []
+        while True:
+            done = os.path.exists(path + DONE_SUFFIX)
+            chunk = f.read(1 << 20)
+            if chunk:
+                lines = (partial + chunk).split('\n')
+                partial = lines.pop()  # Incomplete last line; finished by a later read
+                for line in lines:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                continue
+            if batch:
+                yield batch
+                batch = []
+            if done:
+                return
+            await asyncio.sleep(poll_interval)
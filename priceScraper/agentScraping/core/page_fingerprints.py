@@ -0,0 +1,147 @@
+"""
+Per-page fingerprints for conditional re-crawls.
+
+For every listing page (the URL includes the page number) the store keeps:
+  - a hash of the cleaned product list extracted from it, and the list itself
+  - the ETag / Last-Modified validators the site sent for that URL
+  - the page count the pager showed (Cold Storage page 1)
+
+In fast refresh mode, a conditional HEAD request (If-None-Match /
+If-Modified-Since) asks the site whether a page changed before it is
+rendered. A page whose probe matches is not rendered at all: its last
+product list is replayed into the pipeline instead, so an hourly refresh only
+pays for the pages that moved. Other runs do not probe (a round trip per page
+they could not use); they keep the validators of the last probe, which still
+name a version no newer than the products rendered since. Pages on sites that
+send neither validator are always rendered; their content hash still shows
+how many pages actually changed.
+"""
+
+import os, json, time, sqlite3, hashlib, asyncio
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_PAGE_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       "cache", "pages.sqlite")
+PROBE_TIMEOUT = 10
+MAX_REPLAY_AGE = 24 * 3600  # Seconds; older pages are rendered again even if the probe matches
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+def products_hash(products):
+    """Hash of a cleaned product list, independent of embeddings added later"""
+    rows = [{k: v for k, v in p.items() if k != 'embedding'} for p in products]
+    return hashlib.sha256(json.dumps(rows, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class PageFingerprintStore:
+    """SQLite store of what each listing page looked like the last time it was rendered"""
+
+    def __init__(self, path=DEFAULT_PAGE_STORE_PATH, fast_refresh=False, max_age=MAX_REPLAY_AGE):
+        self.path = path
+        self.fast_refresh = fast_refresh
+        self.max_age = max_age
+        self.db = None  # Opened on first use, so importing a store script creates no files
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.stats = {'rendered': 0, 'replayed': 0, 'changed': 0, 'unchanged': 0, 'probe_matches': 0}
+
+    def _connect(self):
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(self.path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, products TEXT NOT NULL,"
+                " page_count INTEGER NOT NULL, etag TEXT, last_modified TEXT, rendered_at REAL NOT NULL)"
+            )
+        return self.db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def previous(self, url):
+        row = self._connect().execute(
+            "SELECT content_hash, products, page_count, etag, last_modified, rendered_at FROM pages WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('content_hash', 'products', 'page_count', 'etag', 'last_modified', 'rendered_at')
+        return dict(zip(keys, row))
+
+    def probe(self, url, previous):
+        """Conditional HEAD request; returns (unchanged, etag, last_modified)"""
+        headers = {}
+        if previous and previous['etag']:
+            headers['If-None-Match'] = previous['etag']
+        if previous and previous['last_modified']:
+            headers['If-Modified-Since'] = previous['last_modified']
+        try:
+            response = self.session.head(url, headers=headers, timeout=PROBE_TIMEOUT, allow_redirects=True)
+        except requests.RequestException:
+            return False, None, None
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if not previous or response.status_code not in (200, 304):
+            return False, etag, last_modified
+        etag = etag or (previous['etag'] if response.status_code == 304 else None)
+        last_modified = last_modified or (previous['last_modified'] if response.status_code == 304 else None)
+        # Some servers ignore conditional headers; equal validators on a 200 mean the same thing
+        unchanged = response.status_code == 304 or \
+            (etag is not None and etag == previous['etag']) or \
+            (last_modified is not None and last_modified == previous['last_modified'])
+        return unchanged, etag, last_modified
+
+    async def fetch(self, url, render):
+        """Products for `url`: replayed when allowed and unchanged, else `await render()`
+
+        `render` returns (products, page_count). Returns the same pair.
+        """
+        previous = self.previous(url)
+        if not self.fast_refresh:
+            unchanged = False
+            etag, last_modified = (previous['etag'], previous['last_modified']) if previous else (None, None)
+        else:
+            unchanged, etag, last_modified = await asyncio.to_thread(self.probe, url, previous)
+        if unchanged:
+            self.stats['probe_matches'] += 1
+        if unchanged and time.time() - previous['rendered_at'] < self.max_age:
+            self.stats['replayed'] += 1
+            print(f"⏩ Unchanged since last render, replaying: {url}")
+            products = [dict(p, embedding=None) for p in json.loads(previous['products'])]
+            return products, previous['page_count']
+
+        products, page_count = await render()
+        self.stats['rendered'] += 1
+        if products:
+            self.record(url, products, page_count, etag, last_modified, previous)
+        return products, page_count
+
+    def record(self, url, products, page_count=0, etag=None, last_modified=None, previous=None):
+        """Remember a rendered page (failed or empty renders are not recorded)"""
+        content_hash = products_hash(products)
+        if previous is not None:
+            self.stats['unchanged' if previous['content_hash'] == content_hash else 'changed'] += 1
+        rows = [{k: v for k, v in p.items() if k != 'embedding'} for p in products]
+        self._connect().execute(
+            "INSERT OR REPLACE INTO pages (url, content_hash, products, page_count, etag, last_modified, rendered_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, content_hash, json.dumps(rows, ensure_ascii=False), page_count, etag, last_modified, time.time())
+        )
+        self.db.commit()
+
+    def summary(self):
+        s = self.stats
+        return (f"🔎 Pages: {s['rendered']} rendered, {s['replayed']} replayed without rendering "
+                f"({s['probe_matches']} probes matched); of re-rendered pages {s['changed']} changed, "
+                f"{s['unchanged']} unchanged")
@@ -0,0 +1,129 @@
+"""
+Streaming scrape -> embed -> upload pipeline.
+
+Instead of waiting for every category to finish before embedding starts (and
+for every embedding before uploading starts), scrapers push each cleaned page
+into the pipeline as soon as it is extracted. Stages are connected by bounded
+asyncio queues, so a slow stage applies backpressure to the one before it
+instead of letting pages pile up in memory, and total wall time approaches
+the slowest stage rather than the sum of all stages.
+
+USAGE:
+    async with StreamingPipeline(embed=client.embed_products, upload=upload_fn) as pipeline:
+        await scrape_url_with_pagination(crawler, url, config, on_page=pipeline.put)
+    products = pipeline.products
+
+Pass `sink` (e.g. output.ProductWriter.write) together with collect=False to
+write each embedded batch out instead of keeping the catalogue in memory.
+With `name` set, each embed/upload batch is timed as a metrics span labelled
+with it (core/metrics.py).
+"""
+
+import time, asyncio
+from core.metrics import metrics
+
+_DONE = object()
+
+class StreamingPipeline:
+    """Bounded embed and upload stages fed page by page"""
+
+    def __init__(self, embed=None, upload=None, queue_size=8, embed_batch_size=64,
+                 upload_batch_size=200, embed_workers=2, upload_workers=1, collect=True, dedup=None,
+                 sink=None, name=None):
+        self.embed = embed
+        self.dedup = dedup
+        self.upload = upload
+        self.embed_batch_size = embed_batch_size
+        self.upload_batch_size = upload_batch_size
+        self.embed_workers = embed_workers if embed else 0
+        self.upload_workers = upload_workers if upload else 0
+        self.collect = collect
+        self.sink = sink
+        self.labels = {'store': name} if name else {}
+        self.embed_queue = asyncio.Queue(maxsize=queue_size)
+        self.upload_queue = asyncio.Queue(maxsize=queue_size)
+        self.products = []
+        self.stats = {stage: {'products': 0, 'busy': 0.0} for stage in ('scrape', 'embed', 'upload')}
+        self._start = None
+        self.elapsed = 0.0
+
+    async def __aenter__(self):
+        self._start = time.perf_counter()
+        self._embedders = [asyncio.create_task(self._embed_worker()) for _ in range(self.embed_workers)]
+        self._uploaders = [asyncio.create_task(self._upload_worker()) for _ in range(self.upload_workers)]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for _ in self._embedders:
+            await self.embed_queue.put(_DONE)
+        await asyncio.gather(*self._embedders)
+        for _ in self._uploaders:
+            await self.upload_queue.put(_DONE)
+        await asyncio.gather(*self._uploaders)
+        self.elapsed = time.perf_counter() - self._start
+        print(self.summary())
+
+    async def put(self, page_products):
+        """Entry point for scrapers: hand over one cleaned page (blocks while the pipeline is full)"""
+        if self.dedup:
+            # Drop products already seen on earlier pages or in other categories
+            page_products = self.dedup.filter(page_products)
+        if not page_products:
+            return
+        self.stats['scrape']['products'] += len(page_products)
+        if self.embed:
+            await self.embed_queue.put(page_products)
+        else:
+            await self._forward(page_products)
+
+    async def _forward(self, products):
+        if self.sink:
+            self.sink(products)
+        if self.collect:
+            self.products.extend(products)
+        if self.upload:
+            await self.upload_queue.put(products)
+
+    async def _next_batch(self, queue, size):
+        """Wait for one page, then top up with whatever is already queued (up to `size` products)"""
+        item = await queue.get()
+        if item is _DONE:
+            return None
+        batch = list(item)
+        while len(batch) < size and not queue.empty():
+            item = queue.get_nowait()
+            if item is _DONE:
+                # Put the sentinel back for this worker's next call
+                queue.put_nowait(_DONE)
+                break
+            batch.extend(item)
+        return batch
+
+    async def _run_stage(self, stage, fn, batch):
+        start = time.perf_counter()
+        try:
+            with metrics.span(stage, **self.labels):
+                await fn(batch)
+        except Exception as e:
+            print(f"⚠️ {stage.capitalize()} stage failed for {len(batch)} products: {e}")
+        self.stats[stage]['busy'] += time.perf_counter() - start
+        self.stats[stage]['products'] += len(batch)
+
+    async def _embed_worker(self):
+        while (batch := await self._next_batch(self.embed_queue, self.embed_batch_size)) is not None:
+            await self._run_stage('embed', self.embed, batch)
+            await self._forward(batch)
+
+    async def _upload_worker(self):
+        while (batch := await self._next_batch(self.upload_queue, self.upload_batch_size)) is not None:
+            await self._run_stage('upload', self.upload, batch)
+
+    def summary(self):
+        lines = [f"🧵 Pipeline finished in {self.elapsed:.1f}s"]
+        if self.dedup and self.dedup.dropped:
+            lines.append(f"   dedup   {self.dedup.dropped:>6} duplicates dropped")
+        for stage in ('embed', 'upload'):
+            stats = self.stats[stage]
+            if stats['products']:
+                lines.append(f"   {stage:<7} {stats['products']:>6} products, busy {stats['busy']:.1f}s")
+        return '\n'.join(lines)
@@ -0,0 +1,83 @@
+"""
+Per-category, per-unit price index for cross-store comparison.
+
+Products are grouped by category and unit price basis ('100g', '100ml', 'pc')
+and each group is sorted by unit price, so "cheapest X across stores" is the
+head of a list and a price band is a bisect range scan; nothing has to parse
+"$3.50" or "6 x 250ml" at query time. The '*' category holds every product,
+since the stores do not share category names.
+
+Two files are written next to the product files:
+    unit_price_index.json  {"fields": [...], "index": {category: {basis: [row, ...]}}}, to serve as is
+    unit_price_index.csv   one row per product, sorted by (category, basis, unit price), for bulk loading
+"""
+
+import os, csv, json, bisect
+from core.output import OUTPUT_DIR
+
+INDEX_BASENAME = 'unit_price_index'
+ALL_CATEGORIES = '*'
+INDEX_FIELDS = ['unit_price_cents', 'supermarket', 'name', 'quantity', 'price', 'product_url']
+CSV_COLUMNS = ['category', 'unit_price_basis'] + INDEX_FIELDS
+
+def build_index(products):
+    """{category: {basis: [row, ...]}} with each row's values in INDEX_FIELDS order, cheapest first
+
+    `products` can be any iterable (e.g. output.read_ndjson); only the index
+    rows are kept.
+    """
+    index = {}
+    for product in products:
+        if product.get('unit_price_cents') is None or not product.get('unit_price_basis'):
+            continue
+        row = [product.get(field) for field in INDEX_FIELDS]
+        basis = product['unit_price_basis']
+        for category in {product.get('category') or ALL_CATEGORIES, ALL_CATEGORIES}:
+            index.setdefault(category, {}).setdefault(basis, []).append(row)
+    for groups in index.values():
+        for rows in groups.values():
+            rows.sort(key=lambda row: (row[0], row[1], row[2]))
+    return index
+
+def save_index(products, basename=INDEX_BASENAME, output_dir=OUTPUT_DIR):
+    """Build the index and write <basename>.json and <basename>.csv; returns the two paths"""
+    index = build_index(products)
+    if not index:
+        print("⚠️ No unit prices to index")
+        return None, None
+
+    json_file = os.path.join(output_dir, f"{basename}.json")
+    with open(json_file, mode='w', encoding='utf-8') as f:
+        json.dump({'fields': INDEX_FIELDS, 'index': index}, f, ensure_ascii=False, separators=(',', ':'))
+
+    # The '*' group is every other group merged, so it is left out of the bulk-load file
+    csv_file = os.path.join(output_dir, f"{basename}.csv")
+    with open(csv_file, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for category in sorted(c for c in index if c != ALL_CATEGORIES):
+            for basis in sorted(index[category]):
+                writer.writerows([category, basis] + row for row in index[category][basis])
+
+    indexed = sum(len(rows) for rows in index[ALL_CATEGORIES].values())
+    print(f"✅ Indexed {indexed} unit prices in {len(index) - 1} categories:")
+    print(f"   📄 JSON: {json_file}")
+    print(f"   📄 CSV: {csv_file}")
+    return json_file, csv_file
+
+def load_index(path):
+    """Read a unit_price_index.json back into {category: {basis: [row, ...]}}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['index']
+
+def cheapest(index, basis, category=ALL_CATEGORIES, limit=10, min_cents=None, max_cents=None):
+    """Cheapest products per `basis`, optionally within [min_cents, max_cents] per unit
+
+    Returns dicts keyed by INDEX_FIELDS. The band is found by bisecting the
+    sorted group, so the cost is O(log n + limit).
+    """
+    rows = index.get(category, {}).get(basis, [])
+    unit_cents = lambda row: row[0]
+    start = 0 if min_cents is None else bisect.bisect_left(rows, min_cents, key=unit_cents)
+    end = len(rows) if max_cents is None else bisect.bisect_right(rows, max_cents, key=unit_cents)
+    return [dict(zip(INDEX_FIELDS, row)) for row in rows[start:min(end, start + limit)]]
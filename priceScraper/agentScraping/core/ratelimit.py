@@ -0,0 +1,36 @@
+"""
+Per-host rate limiting for concurrent page fetches.
+"""
+
+import time, asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+class HostRateLimiter:
+    """At most `max_concurrent` requests in flight per host, started at least `min_interval` seconds apart"""
+
+    def __init__(self, max_concurrent=4, min_interval=0.5):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._hosts = {}
+
+    def _host_state(self, host):
+        # Created lazily so the limiter can be built outside a running event loop
+        if host not in self._hosts:
+            self._hosts[host] = {
+                'semaphore': asyncio.Semaphore(self.max_concurrent),
+                'lock': asyncio.Lock(),
+                'next_start': 0.0,
+            }
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def limit(self, url):
+        state = self._host_state(urlparse(url).netloc)
+        async with state['semaphore']:
+            async with state['lock']:
+                wait = state['next_start'] - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                state['next_start'] = time.monotonic() + self.min_interval
+            yield
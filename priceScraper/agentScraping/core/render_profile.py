@@ -0,0 +1,133 @@
+"""
+Render profiles: what the browser loads while rendering a listing page.
+
+Extraction only reads text and attribute values (an <img>'s src is in the DOM
+whether or not the image is downloaded), so a listing page does not need its
+images, video, web fonts or third-party trackers. A light profile aborts those
+requests at the page level (Playwright routing) and scrolls only as slowly as
+the page needs to attach all its products. Routing is per page, so stores with
+different profiles can share one browser (run_all.py).
+
+    install_render_hooks(crawler)                    # once per AsyncWebCrawler
+    CrawlerRunConfig(..., **profile.run_kwargs())    # per crawl config
+    print(profile.summary())
+
+BrowserConfig(text_mode=True) is not used for this: it applies to the whole
+browser and asks Chromium to turn JavaScript off, which infinite scroll and
+lazily rendered product tiles need.
+"""
+
+import weakref
+from urllib.parse import urlparse
+
+BLOCKED_RESOURCE_TYPES = ('image', 'media', 'font')
+THIRD_PARTY_RESOURCE_TYPES = ('script',)  # Blocked only when served from another site
+PROFILE_KEY = 'render_profile'  # Key in CrawlerRunConfig.shared_data
+
+def site_host(host):
+    host = (host or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def is_main_document(request):
+    try:
+        return request.resource_type == 'document' and request.frame.parent_frame is None
+    except Exception:  # Service worker requests have no frame
+        return False
+
+class RenderProfile:
+    """Which requests a listing page may make, and how the crawler scrolls it
+
+    `first_party_hosts` are sites whose scripts are never blocked (e.g. the
+    store's CDN); the host of the page itself always counts as first party,
+    and so do its subdomains.
+    """
+
+    def __init__(self, block_types=BLOCKED_RESOURCE_TYPES, block_third_party=THIRD_PARTY_RESOURCE_TYPES,
+                 first_party_hosts=(), scan_full_page=True, scroll_delay=0.5):
+        self.block_types = frozenset(block_types)
+        self.block_third_party = frozenset(block_third_party)
+        self.first_party_hosts = tuple(site_host(h) for h in first_party_hosts)
+        self.scan_full_page = scan_full_page
+        self.scroll_delay = scroll_delay
+        self.stats = {'allowed': 0, 'blocked': {}}
+
+    @classmethod
+    def full(cls, scan_full_page=True, scroll_delay=1.0):
+        """Load everything, like a desktop browser (the settings the stores used before)"""
+        return cls(block_types=(), block_third_party=(), scan_full_page=scan_full_page, scroll_delay=scroll_delay)
+
+    @property
+    def blocks_requests(self):
+        return bool(self.block_types or self.block_third_party)
+
+    def run_kwargs(self):
+        """CrawlerRunConfig keyword arguments for this profile"""
+        return {
+            'scan_full_page': self.scan_full_page,
+            'scroll_delay': self.scroll_delay,
+            'shared_data': {PROFILE_KEY: self},
+        }
+
+    def should_block(self, resource_type, url, first_party):
+        if resource_type in self.block_types:
+            return True
+        if resource_type not in self.block_third_party:
+            return False
+        host = site_host(urlparse(url).hostname)
+        return not any(host == h or host.endswith('.' + h) for h in first_party)
+
+    def router(self):
+        """Playwright route handler for one page"""
+        first_party = set(self.first_party_hosts)
+
+        async def handle(route):
+            request = route.request
+            if is_main_document(request):
+                first_party.add(site_host(urlparse(request.url).hostname))
+            if self.should_block(request.resource_type, request.url, first_party):
+                blocked = self.stats['blocked']
+                blocked[request.resource_type] = blocked.get(request.resource_type, 0) + 1
+                await route.abort()
+            else:
+                self.stats['allowed'] += 1
+                await route.continue_()
+        return handle
+
+    def summary(self):
+        if not self.blocks_requests:
+            return "🖼️ Rendering: full pages, nothing blocked"
+        blocked = self.stats['blocked']
+        if not blocked:
+            return f"🖼️ Rendering: {self.stats['allowed']} requests, none blocked"
+        by_type = ', '.join(f"{kind} {count}" for kind, count in sorted(blocked.items(), key=lambda kv: -kv[1]))
+        return (f"🖼️ Rendering: blocked {sum(blocked.values())} requests ({by_type}), "
+                f"allowed {self.stats['allowed']}")
+
+_routed = weakref.WeakKeyDictionary()  # Page -> profile whose router it runs
+
+async def on_page_context_created(page, context=None, config=None, **kwargs):
+    """crawl4ai hook: route the page through the profile of the config that is about to use it
+
+    crawl4ai 0.6.3 calls this as hook(page, context=context, config=config)
+    right after get_page(), before every crawl and not only for a new page,
+    so a reused session page (core/browser_pool.py) is only routed again
+    when its profile changes; otherwise every crawl would stack one more
+    route handler on the page.
+    """
+    profile = (getattr(config, 'shared_data', None) or {}).get(PROFILE_KEY)
+    if profile is not None and not profile.blocks_requests:
+        profile = None
+    current = _routed.get(page)
+    if current is profile:
+        return page
+    if current is not None:
+        await page.unroute('**/*')
+        del _routed[page]
+    if profile is not None:
+        await page.route('**/*', profile.router())
+        _routed[page] = profile
+    return page
+
+def install_render_hooks(crawler):
+    """Apply render profiles to every page `crawler` opens"""
+    crawler.crawler_strategy.set_hook('on_page_context_created', on_page_context_created)
@@ -0,0 +1,238 @@
+"""
+Record/replay of crawls, for offline development and repeatable benchmarks.
+
+In record mode every crawler.arun() result (rendered HTML, extracted JSON,
+status) and every plain-HTTP response of the sessions mounted on the store
+(direct extraction, page fingerprint probes) is saved; in replay mode they are
+served back without a browser or network, through the same
+clean_and_filter_products() path, so the rest of the pipeline cannot tell the
+difference:
+
+    cache/replay/objects/ab/cdef....gz   gzip blobs named by the SHA-256 of their content
+    cache/replay/index.sqlite            (url, deep crawl?) -> results, (method, url) -> response
+
+Content addressing means a page that did not change between two recordings,
+or a product page reached from several categories, is stored once.
+
+    store = ReplayStore(mode='record')            # or 'replay'
+    crawler = ReplayCrawler(real_crawler, store)  # None instead of a crawler when replaying
+    store.mount(data_source.session)
+"""
+
+import os, gzip, json, time, sqlite3, hashlib, threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_REPLAY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "replay")
+MODES = ('record', 'replay')
+
+class ReplayMiss(LookupError):
+    """Replay asked for something that was never recorded"""
+
+class ReplayResult:
+    """Stand-in for a crawl4ai CrawlResult; the HTML blob is read on first access"""
+
+    def __init__(self, store, record, extracted_content=None):
+        self._store = store
+        self._html_hash = record.get('html')
+        self._html = None
+        self.url = record['url']
+        self.success = record['success']
+        self.status_code = record.get('status_code')
+        self.error_message = record.get('error_message') or ''
+        self.extracted_content = extracted_content if extracted_content is not None else \
+            store.get_blob(record.get('extracted'), '')
+
+    @property
+    def html(self):
+        if self._html is None:
+            self._html = self._store.get_blob(self._html_hash, '')
+        return self._html
+
+class ReplayStore:
+    """Content-addressed store of crawl results and HTTP responses
+
+    `mode` is 'record' or 'replay'. With `reextract` on, replay runs the crawl
+    config's extraction strategy over the recorded HTML instead of returning
+    the recorded JSON, so selector changes can be tried offline.
+    """
+
+    def __init__(self, root=DEFAULT_REPLAY_DIR, mode='replay', reextract=False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown replay mode {mode!r}; expected one of {MODES}")
+        self.root = root
+        self.mode = mode
+        self.reextract = reextract
+        self.db = None  # Opened on first use; shared with the threads requests runs in
+        self.lock = threading.Lock()
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0, 'blobs_written': 0}
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def _connect(self):
+        if self.db is None:
+            os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS crawls ("
+                " url TEXT NOT NULL, deep INTEGER NOT NULL, results TEXT NOT NULL, recorded_at REAL NOT NULL,"
+                " PRIMARY KEY (url, deep))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " method TEXT NOT NULL, url TEXT NOT NULL, status INTEGER NOT NULL, headers TEXT NOT NULL,"
+                " body TEXT, recorded_at REAL NOT NULL, PRIMARY KEY (method, url))"
+            )
+        return self.db
+
+    def _execute(self, sql, params):
+        """Run one statement under the lock; returns the first row"""
+        with self.lock:
+            row = self._connect().execute(sql, params).fetchone()
+            self.db.commit()
+            return row
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest[2:]}.gz")
+
+    def put_blob(self, data):
+        """Store bytes or text; returns its hash (None for empty content)"""
+        if not data:
+            return None
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            os.replace(tmp_path, path)
+            self.stats['blobs_written'] += 1
+        return digest
+
+    def get_blob(self, digest, default=None, binary=False):
+        if not digest:
+            return default
+        with open(self._blob_path(digest), 'rb') as f:
+            data = gzip.decompress(f.read())
+        return data if binary else data.decode('utf-8')
+
+    def record_crawl(self, url, deep, results):
+        records = [{
+            'url': getattr(result, 'url', url),
+            'success': bool(getattr(result, 'success', False)),
+            'status_code': getattr(result, 'status_code', None),
+            'error_message': getattr(result, 'error_message', None),
+            'html': self.put_blob(getattr(result, 'html', None)),
+            'extracted': self.put_blob(getattr(result, 'extracted_content', None)),
+        } for result in results]
+        self._execute(
+            "INSERT OR REPLACE INTO crawls (url, deep, results, recorded_at) VALUES (?, ?, ?, ?)",
+            (url, int(deep), json.dumps(records), time.time())
+        )
+        self.stats['recorded'] += 1
+
+    def replay_crawl(self, url, deep, config=None):
+        row = self._execute("SELECT results FROM crawls WHERE url = ? AND deep = ?", (url, int(deep)))
+        if row is None:
+            self.stats['missed'] += 1
+            raise ReplayMiss(url)
+        self.stats['replayed'] += 1
+        strategy = getattr(config, 'extraction_strategy', None) if self.reextract else None
+        results = []
+        for record in json.loads(row[0]):
+            if strategy is not None and record['success']:
+                result = ReplayResult(self, record, extracted_content='')
+                result.extracted_content = json.dumps(strategy.extract(result.url, result.html))
+            else:
+                result = ReplayResult(self, record)
+            results.append(result)
+        return results
+
+    def record_response(self, response):
+        self._execute(
+            "INSERT OR REPLACE INTO responses (method, url, status, headers, body, recorded_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (response.request.method, response.request.url, response.status_code,
+             json.dumps(dict(response.headers)), self.put_blob(response.content), time.time())
+        )
+        self.stats['recorded'] += 1
+
+    def replay_response(self, request):
+        row = self._execute("SELECT status, headers, body FROM responses WHERE method = ? AND url = ?",
+                            (request.method, request.url))
+        if row is None:
+            self.stats['missed'] += 1
+            raise requests.ConnectionError(f"Not recorded: {request.method} {request.url}", request=request)
+        self.stats['replayed'] += 1
+        status, headers, body = row
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = self.get_blob(body, b'', binary=True)
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def mount(self, session):
+        """Route a requests.Session's http(s) traffic through the store"""
+        adapter = ReplayHTTPAdapter(self)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def summary(self):
+        s = self.stats
+        if self.replaying:
+            return f"📼 Replay: {s['replayed']} crawls/responses served from {self.root}, {s['missed']} not recorded"
+        return f"📼 Recorded {s['recorded']} crawls/responses to {self.root} ({s['blobs_written']} new blobs)"
+
+class ReplayHTTPAdapter(HTTPAdapter):
+    """requests transport that records real responses or serves recorded ones"""
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        if self.store.replaying:
+            return self.store.replay_response(request)
+        response = super().send(request, **kwargs)
+        self.store.record_response(response)
+        return response
+
+class ReplayCrawler:
+    """AsyncWebCrawler stand-in that records or replays arun()
+
+    `crawler` is the real crawler when recording and may be None when replaying.
+    A URL that was not recorded replays as one failed result, like a page
+    that failed to load.
+    """
+
+    def __init__(self, crawler, store):
+        self.crawler = crawler
+        self.store = store
+
+    async def arun(self, url, config=None, **kwargs):
+        deep = getattr(config, 'deep_crawl_strategy', None) is not None
+        if self.store.replaying:
+            try:
+                return self.store.replay_crawl(url, deep, config)
+            except ReplayMiss:
+                print(f"📼 Not recorded, nothing to replay: {url}")
+                return [ReplayResult(self.store, {'url': url, 'success': False, 'error_message': 'not recorded'}, '')]
+        results = list(await self.crawler.arun(url, config=config, **kwargs))
+        self.store.record_crawl(url, deep, results)
+        return results
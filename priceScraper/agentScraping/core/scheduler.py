@@ -0,0 +1,66 @@
+"""
+Bounded-concurrency category scheduler with per-category timing and retries.
+"""
+
+import time, asyncio
+
+class ScrapeFailed(Exception):
+    """A category lost pages to failed renders; `products` are the ones it scraped anyway
+
+    Raised instead of returning a partial list, so a run that missed pages is
+    never mistaken for a complete one (which would settle its products as removed).
+    """
+
+    def __init__(self, message, products=()):
+        super().__init__(message)
+        self.products = list(products)
+
+async def run_categories(urls, scrape, concurrency=3, retries=1, keep_results=True, failed=None):
+    """Run `await scrape(url)` for every category, at most `concurrency` at once
+
+    A category that raises or returns no products is retried up to `retries`
+    times. Returns one product list per url, in url order, and prints a timing
+    table once all categories are done. With keep_results=False only the product
+    counts are returned, for callers that already stream products elsewhere.
+    Categories whose last attempt still failed are added to the `failed` set;
+    a ScrapeFailed keeps the products it carries.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    timings = {}
+
+    async def run_one(index, url):
+        products = []
+        for attempt in range(retries + 1):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    products = await scrape(url)
+                    error = None
+                except Exception as e:
+                    products, error = (e.products if isinstance(e, ScrapeFailed) else []), e
+                elapsed = time.perf_counter() - start
+
+            previous = timings.get(url, (0.0,))[0]
+            timings[url] = (previous + elapsed, len(products), attempt + 1)
+            if products and error is None:
+                print(f"✅ [{index + 1}/{len(urls)}] {url}: {len(products)} products in {elapsed:.1f}s")
+                return products if keep_results else len(products)
+            reason = f"error: {error}" if error else "no products"
+            if attempt < retries:
+                print(f"🔁 [{index + 1}/{len(urls)}] {url} failed ({reason}), retrying")
+            else:
+                print(f"❌ [{index + 1}/{len(urls)}] {url} failed ({reason}) after {attempt + 1} attempts")
+        if failed is not None:
+            failed.add(url)
+        return products if keep_results else len(products)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(i, url) for i, url in enumerate(urls)))
+    total = time.perf_counter() - start
+
+    print(f"\n⏱️ Category timings ({concurrency} concurrent, {total:.1f}s wall time):")
+    for url in sorted(timings, key=lambda u: timings[u][0], reverse=True):
+        elapsed, count, attempts = timings[url]
+        retried = f" ({attempts} attempts)" if attempts > 1 else ""
+        print(f"   {elapsed:7.1f}s {count:6} products  {url}{retried}")
+    return results
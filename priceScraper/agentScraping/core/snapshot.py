@@ -0,0 +1,128 @@
+"""
+Snapshot of the last uploaded state per (supermarket, product_url).
+
+After a run, the freshly scraped products are diffed against the snapshot:
+  - new:     product_url not seen before
+  - changed: any uploaded field (price, promotion, image, name, quantity) differs
+  - removed: in the snapshot but not scraped this run (full runs only)
+
+Only new + changed products need uploading, so upload time follows the
+size of the delta instead of the size of the catalogue. The snapshot is only
+updated for products the backend accepted, so failed uploads are retried on
+the next run. The backend silently drops products without an embedding, so
+those are neither sent nor recorded, and go out once embedding succeeds.
+"""
+
+import os, json, sqlite3, hashlib
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "cache", "snapshot.sqlite")
+
+# Fields that make a product "changed" when they differ from the last upload
+FINGERPRINT_FIELDS = ['name', 'quantity', 'price', 'promotion_description',
+                      'promotion_end_date_text', 'image_url']
+
+def has_embedding(product):
+    """Whether the backend will store the product (it keeps only products with a non-empty embedding list)"""
+    embedding = product.get('embedding')
+    return isinstance(embedding, list) and len(embedding) > 0
+
+def product_fingerprint(product):
+    values = [str(product.get(field) or '') for field in FINGERPRINT_FIELDS]
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class Delta:
+    """Result of diffing one store's scrape against its snapshot"""
+
+    def __init__(self, supermarket, new, changed, unchanged, removed):
+        self.supermarket = supermarket
+        self.new = new
+        self.changed = changed
+        self.unchanged = unchanged
+        self.removed = removed  # list of {'supermarket', 'product_url'}
+
+    @property
+    def to_upload(self):
+        return [p for p in self.new + self.changed if has_embedding(p)]
+
+    @property
+    def unembedded(self):
+        """New or changed products held back until they have an embedding"""
+        return sum(1 for p in self.new + self.changed if not has_embedding(p))
+
+    def summary(self):
+        line = (f"🧮 {self.supermarket} delta: {len(self.new)} new, {len(self.changed)} changed, "
+                f"{self.unchanged} unchanged, {len(self.removed)} removed")
+        if self.unembedded:
+            line += f" ({self.unembedded} without an embedding held back)"
+        return line
+
+class SnapshotStore:
+    """SQLite store of the fingerprint last uploaded for each product"""
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot ("
+            " supermarket TEXT NOT NULL, product_url TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " PRIMARY KEY (supermarket, product_url))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def diff(self, supermarket, products, full_run=True):
+        """Sort products into new/changed/unchanged; removed is only computed for full runs"""
+        previous = dict(self.db.execute(
+            "SELECT product_url, fingerprint FROM snapshot WHERE supermarket = ?", (supermarket,)
+        ))
+        new, changed, unchanged = [], [], 0
+        seen = set()
+        for product in products:
+            url = product.get('product_url', '')
+            if url in seen:
+                continue
+            seen.add(url)
+            old = previous.get(url)
+            if old is None:
+                new.append(product)
+            elif old != product_fingerprint(product):
+                changed.append(product)
+            else:
+                unchanged += 1
+
+        removed = self.removed(supermarket, seen, previous) if full_run else []
+        return Delta(supermarket, new, changed, unchanged, removed)
+
+    def removed(self, supermarket, product_urls, previous=None):
+        """Snapshot entries of `supermarket` whose product_url is not in `product_urls`"""
+        if previous is None:
+            previous = [url for (url,) in self.db.execute(
+                "SELECT product_url FROM snapshot WHERE supermarket = ?", (supermarket,))]
+        seen = product_urls if isinstance(product_urls, set) else set(product_urls)
+        return [{'supermarket': supermarket, 'product_url': url} for url in previous if url not in seen]
+
+    def record(self, products):
+        """Remember products as uploaded (except those the backend dropped for lacking an embedding)"""
+        self.db.executemany(
+            "INSERT OR REPLACE INTO snapshot (supermarket, product_url, fingerprint) VALUES (?, ?, ?)",
+            [(p.get('supermarket', ''), p.get('product_url', ''), product_fingerprint(p))
+             for p in products if has_embedding(p)]
+        )
+        self.db.commit()
+
+    def forget(self, removed):
+        """Drop removed products so they count as new if they come back"""
+        self.db.executemany(
+            "DELETE FROM snapshot WHERE supermarket = ? AND product_url = ?",
+            [(r['supermarket'], r['product_url']) for r in removed]
+        )
+        self.db.commit()
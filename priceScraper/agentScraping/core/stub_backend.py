@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the backend routes the scrapers talk to.
+
+Serves /products/embed-text, /products/embed-batch and /products/upload with
+deterministic fake embeddings and a configurable per-request latency, so embedding and upload throughput can be measured
+without the real backend or an LLM key. With an error rate, that fraction of
+requests is answered 503 (from a seeded generator, so a run is repeatable),
+to measure how retries and fallbacks hold up. Like the backend, /products/upload
+answers 400 for the whole batch when its first product lacks a required field,
+and with a body limit it answers 413 for larger uploads.
+
+USAGE:
+    python -m core.stub_backend --port 3000 --latency-ms 50
+    python -m core.stub_backend --no-batch     # behave like the current backend
+    python -m core.stub_backend --error-rate 0.05
+    python -m core.stub_backend --max-upload-kb 64
+"""
+
+import json, time, random, hashlib, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIMENSION = 768
+
+def fake_embedding(text, dimension=EMBEDDING_DIMENSION):
+    """Deterministic pseudo-embedding derived from the text hash"""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return [((digest[i % len(digest)] + i) % 256) / 255.0 for i in range(dimension)]
+
+def valid_upload(product):
+    """The backend's check on the first product of an upload (uploadProductController.ts)"""
+    return (all(product.get(field) for field in ('name', 'supermarket', 'quantity'))
+            and 'price' in product and 'embedding' in product)
+
+class StubBackendHandler(BaseHTTPRequestHandler):
+    # Set per server in start_stub_backend()
+    settings = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _fail(self):
+        """Count the request and decide whether to answer it with an injected error"""
+        settings = self.settings
+        with settings['lock']:
+            settings['stats']['requests'] += 1
+            failed = settings['error_rate'] > 0 and settings['rng'].random() < settings['error_rate']
+            if failed:
+                settings['stats']['errors'] += 1
+        return failed
+
+    def do_POST(self):
+        settings = self.settings
+        body = self._read_json()
+        dimension = settings['dimension']
+
+        if self._fail():
+            time.sleep(settings['latency'])
+            self._send(503, {'statusCode': 503, 'message': "Injected error"})
+            return
+
+        if self.path == '/products/embed-text':
+            time.sleep(settings['latency'] + settings['per_item_latency'])
+            self._send(200, {'statusCode': 200, 'embedding': fake_embedding(body['text'], dimension),
+                             'dimension': dimension})
+        elif self.path == '/products/embed-batch' and settings['batch']:
+            texts = body['texts']
+            time.sleep(settings['latency'] + settings['per_item_latency'] * len(texts))
+            self._send(200, {'statusCode': 200, 'embeddings': [fake_embedding(t, dimension) for t in texts],
+                             'dimension': dimension})
+        elif self.path == '/products/upload':
+            limit = settings['max_upload_bytes']
+            if limit and int(self.headers.get('Content-Length', 0)) > limit:
+                time.sleep(settings['latency'])
+                self._send(413, {'statusCode': 413, 'message': "request entity too large"})
+                return
+            if not body or not valid_upload(body[0]):
+                time.sleep(settings['latency'])
+                self._send(400, {'statusCode': 400, 'message': "At least one product is missing required fields "
+                                                               "(name, supermarket, quantity, price, embedding)."})
+                return
+            time.sleep(settings['latency'] + settings['per_item_latency'] * len(body))
+            with settings['lock']:
+                settings['stats']['uploaded'] += len(body)
+            self._send(200, {'statusCode': 200, 'message': f"Successfully ingested {len(body)} products from scraper."})
+        else:
+            self._send(404, {'statusCode': 404, 'message': f"Cannot POST {self.path}"})
+
+def start_stub_backend(port=0, latency=0.02, per_item_latency=0.001, batch=True,
+                       dimension=EMBEDDING_DIMENSION, error_rate=0.0, seed=0, max_upload_bytes=None):
+    """Start the stub in a daemon thread; returns (server, base_url)
+
+    server.stats counts requests and injected errors, and the products accepted by /products/upload.
+    """
+    settings = {
+        'latency': latency,
+        'per_item_latency': per_item_latency,
+        'batch': batch,
+        'dimension': dimension,
+        'error_rate': error_rate,
+        'max_upload_bytes': max_upload_bytes,
+        'rng': random.Random(seed),
+        'lock': threading.Lock(),
+        'stats': {'requests': 0, 'errors': 0, 'uploaded': 0},
+    }
+    handler = type('Handler', (StubBackendHandler,), {'settings': settings})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.stats = settings['stats']
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub backend for scraper benchmarks")
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="fixed latency per request")
+    parser.add_argument('--per-item-ms', type=float, default=1.0, help="extra latency per text/product")
+    parser.add_argument('--no-batch', action='store_true', help="answer 404 on /products/embed-batch")
+    parser.add_argument('--dimension', type=int, default=EMBEDDING_DIMENSION)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the injected errors")
+    parser.add_argument('--max-upload-kb', type=float, help="answer 413 on larger upload bodies")
+    args = parser.parse_args()
+
+    max_upload_bytes = int(args.max_upload_kb * 1024) if args.max_upload_kb else None
+    server, url = start_stub_backend(args.port, args.latency_ms / 1000, args.per_item_ms / 1000,
+                                     not args.no_batch, args.dimension, args.error_rate, args.seed,
+                                     max_upload_bytes)
+    print(f"🧪 Stub backend listening on {url} (batch {'off' if args.no_batch else 'on'})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Upload of scraped products to the backend (/products/upload).
+
+upload_products() sends whatever it is given through AdaptiveUploader;
+upload_delta() first diffs against the local snapshot (core/snapshot.py) and
+only sends what changed; upload_ndjson() follows an NDJSON file that a
+ProductWriter is still writing and uploads it as it grows.
+
+USAGE (uploader in its own process, next to a running scraper):
+    python -m core.upload coldstorage_products.ndjson
+"""
+
+import json, time, random, asyncio, argparse
+from collections import deque
+from email.utils import parsedate_to_datetime
+from core.embedding import BACKEND_URL, make_session
+from core.snapshot import SnapshotStore
+from core.output import tail_ndjson
+from core.metrics import metrics
+
+UPLOAD_PATH = '/products/upload'
+DEFAULT_CONCURRENCY = 4
+TARGET_PAYLOAD_BYTES = 512 * 1024  # Upper bound on one request body
+TARGET_LATENCY = 2.0  # Seconds; batches grow while faster than this and shrink when slower
+MAX_BATCH_SIZE = 500
+MAX_RETRIES = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def retry_after_seconds(response, attempt):
+    """Delay before retrying: the Retry-After header if present, else exponential backoff with jitter"""
+    header = response.headers.get('Retry-After') if response is not None else None
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(header).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+class AdaptiveUploader:
+    """Uploads products over one pooled session with N batches in flight
+
+    Each product is serialized once; batches are cut so their body stays under
+    `target_bytes`, and the product count per batch grows while batches finish
+    faster than `target_latency` and halves when they are slower.
+    """
+
+    def __init__(self, base_url=BACKEND_URL, concurrency=DEFAULT_CONCURRENCY,
+                 target_bytes=TARGET_PAYLOAD_BYTES, target_latency=TARGET_LATENCY,
+                 max_batch_size=MAX_BATCH_SIZE, initial_batch_size=25, timeout=120):
+        self.url = f"{base_url.rstrip('/')}{UPLOAD_PATH}"
+        self.concurrency = max(1, concurrency)
+        self.target_bytes = target_bytes
+        self.target_latency = target_latency
+        self.max_batch_size = max_batch_size
+        self.batch_size = min(initial_batch_size, max_batch_size)
+        self.timeout = timeout
+        self.session = make_session(self.concurrency)
+        self.latencies = []
+        self.retries = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _next_batch(self, queue):
+        """Pop the next batch of (product, encoded) pairs within the size limits"""
+        batch, size = [], 2
+        while queue and len(batch) < self.batch_size:
+            encoded = queue[0][1]
+            if batch and size + len(encoded) + 1 > self.target_bytes:
+                break
+            batch.append(queue.popleft())
+            size += len(encoded) + 1
+        return batch
+
+    def _adapt(self, latency):
+        if latency > self.target_latency:
+            self.batch_size = max(1, self.batch_size // 2)
+        elif latency < self.target_latency / 2:
+            self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 2))
+
+    def _post(self, body):
+        return self.session.post(self.url, data=body, timeout=self.timeout)
+
+    async def _send(self, batch, batch_num):
+        """POST one batch with retries; returns the products the backend accepted"""
+        body = b'[' + b','.join(encoded for _, encoded in batch) + b']'
+        for attempt in range(MAX_RETRIES + 1):
+            response = None
+            start = time.perf_counter()
+            try:
+                response = await asyncio.to_thread(self._post, body)
+            except Exception as e:
+                print(f"⚠️ Batch {batch_num} upload failed: {e}")
+            latency = time.perf_counter() - start
+            metrics.observe('request_seconds', latency, endpoint=UPLOAD_PATH)
+            metrics.inc('requests_total', endpoint=UPLOAD_PATH,
+                        status=response.status_code if response is not None else 'error')
+            metrics.inc('upload_bytes_total', len(body))
+
+            if response is not None and response.status_code == 200:
+                self.latencies.append(latency)
+                self._adapt(latency)
+                print(f"✅ Batch {batch_num} uploaded ({len(batch)} products, {latency:.2f}s)")
+                return [product for product, _ in batch]
+            if response is not None and response.status_code in (400, 413) and len(batch) > 1:
+                if response.status_code == 413:
+                    # Body too large for the backend: shrink future batches too
+                    self.target_bytes = max(1024, len(body) // 2)
+                    self.batch_size = max(1, len(batch) // 2)
+                # Split this one; on a 400 the halves narrow the rejection down to the bad products
+                middle = len(batch) // 2
+                first = await self._send(batch[:middle], f"{batch_num}a")
+                second = await self._send(batch[middle:], f"{batch_num}b")
+                return first + second
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                rejected = f" ({batch[0][0].get('product_url')})" if len(batch) == 1 else ''
+                print(f"⚠️ Batch {batch_num} failed: {response.status_code}{rejected}")
+                return []
+            if attempt == MAX_RETRIES:
+                break
+
+            delay = retry_after_seconds(response, attempt)
+            self.retries += 1
+            metrics.inc('retries_total', endpoint=UPLOAD_PATH)
+            if response is not None:
+                self._adapt(self.target_latency * 2)  # Server is struggling: back off batch size too
+                print(f"⏳ Batch {batch_num} got {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        print(f"⚠️ Batch {batch_num} gave up after {MAX_RETRIES} retries")
+        return []
+
+    async def upload(self, products):
+        """Upload products; returns the products that were accepted"""
+        queue = deque((p, json.dumps(p, ensure_ascii=False).encode('utf-8')) for p in products)
+        uploaded = []
+        counter = iter(range(1, len(products) + 1))
+
+        async def worker():
+            while queue:
+                batch = self._next_batch(queue)
+                batch_num = next(counter)
+                self.batches += 1
+                uploaded.extend(await self._send(batch, batch_num))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        self.elapsed += time.perf_counter() - start
+        return uploaded
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return (f"⏱️ Upload batches: {self.batches} sent, {self.retries} retries, latency "
+                f"p50 {percentile(latencies, 50):.2f}s / p90 {percentile(latencies, 90):.2f}s / "
+                f"p99 {percentile(latencies, 99):.2f}s / max {percentile(latencies, 100):.2f}s")
+
+async def upload_products(products, base_url=BACKEND_URL, concurrency=DEFAULT_CONCURRENCY):
+    """Upload products with the adaptive uploader; returns the products that were accepted"""
+    if not products:
+        return []
+
+    print(f"🚀 Uploading {len(products)} products ({concurrency} batches in flight)...")
+    with AdaptiveUploader(base_url, concurrency=concurrency) as uploader:
+        uploaded = await uploader.upload(products)
+        print(f"🎉 Upload completed: {len(uploaded)}/{len(products)} products uploaded "
+              f"in {uploader.elapsed:.1f}s")
+        print(uploader.summary())
+    return uploaded
+
+async def upload_delta(supermarket, products, full_run=True, base_url=BACKEND_URL, concurrency=DEFAULT_CONCURRENCY):
+    """Upload only products that are new or changed since the last successful upload"""
+    with SnapshotStore() as snapshot:
+        delta = snapshot.diff(supermarket, products, full_run=full_run)
+        print(delta.summary())
+
+        uploaded = await upload_products(delta.to_upload, base_url, concurrency)
+        snapshot.record(uploaded)
+        snapshot.forget(delta.removed)
+
+async def settle_removed(supermarket, product_urls):
+    """Forget products missing from a full run whose uploads were streamed with full_run=False
+
+    The backend has no route for removed products, so they only leave the
+    snapshot: one that comes back is uploaded again as new.
+    """
+    with SnapshotStore() as snapshot:
+        removed = snapshot.removed(supermarket, product_urls)
+        if removed:
+            print(f"🧮 {supermarket}: {len(removed)} products no longer listed")
+        snapshot.forget(removed)
+
+async def upload_ndjson(path, base_url=BACKEND_URL, concurrency=DEFAULT_CONCURRENCY, batch_size=MAX_BATCH_SIZE):
+    """Upload an NDJSON product file while it is being written; returns the number of products accepted"""
+    total = accepted = 0
+    print(f"📡 Following {path}...")
+    with AdaptiveUploader(base_url, concurrency=concurrency) as uploader:
+        async for products in tail_ndjson(path, batch_size=batch_size * concurrency):
+            total += len(products)
+            accepted += len(await uploader.upload(products))
+        print(f"🎉 Upload completed: {accepted}/{total} products uploaded")
+        print(uploader.summary())
+    return accepted
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload an NDJSON product file, following it while it grows")
+    parser.add_argument('path', help="<basename>.ndjson written by core.output.ProductWriter")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(upload_ndjson(args.path, concurrency=args.concurrency))
+
+if __name__ == "__main__":
+    main()
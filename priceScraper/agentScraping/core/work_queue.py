@@ -0,0 +1,606 @@
+"""
+Work queue for spreading one crawl over several worker processes or machines.
+
+A coordinator puts one task per category ({"store": ..., "url": ...}) into
+a named run; workers lease tasks, scrape them on their own browser and
+complete them with the products they found (the queue is also the shared
+result sink) and with any follow-up tasks, e.g. the other pages of a Cold
+Storage category once page 1 has shown the page count. A task is only
+queued once per run (keyed by its JSON), so two workers discovering the
+same page cannot duplicate it.
+
+A lease lasts `seconds` and is extended while the worker is busy. A lease
+that runs out (the worker died or hung) and a task that raised are queued
+again, first for the other workers: the worker that failed it only gets it
+back after a lease period, so a retry lands elsewhere when there is anyone
+else. A worker on its own (no other worker has leased or extended within
+half a lease period) gets it back after `retry_seconds` instead. After
+MAX_ATTEMPTS a task is given up and reported by failures().
+
+Backends, picked by URL in open_queue():
+    sqlite:///path/to/queue.sqlite   (or a bare path) one machine, any number of processes
+    redis://host:6379/0              several machines; needs `pip install redis`
+    memory://                        RedisQueue on MemoryRedis, in this process only (tests)
+
+    queue = open_queue(url)
+    queue.put(run, [{'store': 'coldstorage', 'url': url}])
+    for task_id, task in queue.lease(run, worker, count=2):
+        queue.complete(run, worker, task_id, products, follow_ups)
+    products = queue.results(run, 'coldstorage')
+"""
+
+import os, json, time, uuid, socket, sqlite3, asyncio, threading, itertools
+
+try:
+    import redis
+except ImportError:  # optional; only redis:// queues need it
+    redis = None
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "work_queue.sqlite")
+LEASE_SECONDS = 300  # A task not completed or extended within this is handed to another worker
+MAX_ATTEMPTS = 3  # Leases of one task (failed or expired) before it is given up
+RETRY_SECONDS = 30  # Wait before a worker with no one else around retries a task it failed
+POLL_INTERVAL = 2.0  # Seconds an idle worker waits before asking for tasks again
+RESULT_BATCH = 500  # Products per results() read
+
+def task_key(task):
+    return json.dumps(task, sort_keys=True, ensure_ascii=False)
+
+def worker_name():
+    """Default worker id: host and process, plus a suffix so a restarted process is a new worker"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+
+class SqliteQueue:
+    """Queue and result sink in one SQLite file, shared by the processes of one machine"""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=MAX_ATTEMPTS, retry_seconds=RETRY_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.lock = threading.Lock()  # The connection is shared by the worker's threads
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, run TEXT NOT NULL, key TEXT NOT NULL, task TEXT NOT NULL,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, owner TEXT, lease_expires REAL,"
+            " avoid TEXT, retry_after REAL NOT NULL DEFAULT 0, failed_at REAL NOT NULL DEFAULT 0,"
+            " products INTEGER, error TEXT, UNIQUE (run, key))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (run, status)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            " run TEXT NOT NULL, worker TEXT NOT NULL, seen REAL NOT NULL, PRIMARY KEY (run, worker))"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " run TEXT NOT NULL, store TEXT NOT NULL, task_id INTEGER NOT NULL, product TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_store ON results (run, store)")
+
+    def _transaction(self, fn):
+        """fn(db) inside BEGIN IMMEDIATE, so leases are exclusive across processes"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.db)
+                self.db.execute("COMMIT")
+                return result
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        self.db.close()
+
+    def clear(self, run):
+        """Forget every task and result of `run`"""
+        def clear(db):
+            db.execute("DELETE FROM tasks WHERE run = ?", (run,))
+            db.execute("DELETE FROM results WHERE run = ?", (run,))
+            db.execute("DELETE FROM workers WHERE run = ?", (run,))
+        self._transaction(clear)
+
+    def put(self, run, tasks):
+        """Queue tasks not seen before in `run`; returns how many were new"""
+        def put(db):
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO tasks (run, key, task, status) VALUES (?, ?, ?, 'queued')",
+                           [(run, task_key(t), json.dumps(t, ensure_ascii=False)) for t in tasks])
+            return db.total_changes - before
+        return self._transaction(put)
+
+    def _seen(self, db, run, worker, now, seconds):
+        """Record `worker` as around; True if another worker was too within half a lease period"""
+        db.execute("INSERT OR REPLACE INTO workers (run, worker, seen) VALUES (?, ?, ?)", (run, worker, now))
+        return db.execute("SELECT 1 FROM workers WHERE run = ? AND worker != ? AND seen > ? LIMIT 1",
+                          (run, worker, now - seconds / 2)).fetchone() is not None
+
+    def lease(self, run, worker, count=1, seconds=LEASE_SECONDS):
+        """Up to `count` (task_id, task) pairs, leased to `worker` for `seconds`"""
+        def lease(db):
+            now = time.time()
+            others = self._seen(db, run, worker, now, seconds)
+            # Expired leases count as failed attempts of their owner
+            db.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+                " avoid = owner, retry_after = ?, failed_at = ?, error = 'lease expired', owner = NULL"
+                " WHERE run = ? AND status = 'leased' AND lease_expires <= ?",
+                (self.max_attempts, now + seconds, now, run, now))
+            rows = db.execute(
+                "SELECT id, task FROM tasks WHERE run = ? AND status = 'queued'"
+                " AND (avoid IS NULL OR avoid != ? OR retry_after <= ? OR (? AND failed_at + ? <= ?))"
+                " ORDER BY id LIMIT ?",
+                (run, worker, now, not others, self.retry_seconds, now, count)).fetchall()
+            db.executemany(
+                "UPDATE tasks SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1"
+                " WHERE id = ?", [(worker, now + seconds, task_id) for task_id, _ in rows])
+            return [(task_id, json.loads(task)) for task_id, task in rows]
+        return self._transaction(lease)
+
+    def extend(self, run, worker, task_ids, seconds=LEASE_SECONDS):
+        """Push back the expiry of tasks `worker` still holds"""
+        def extend(db):
+            now = time.time()
+            self._seen(db, run, worker, now, seconds)
+            db.executemany("UPDATE tasks SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+                           [(now + seconds, task_id, worker) for task_id in task_ids])
+        self._transaction(extend)
+
+    def complete(self, run, worker, task_id, products, follow_ups=()):
+        """Store the task's products and queue its follow-ups; False if the lease was lost meanwhile"""
+        def complete(db):
+            held = db.execute("SELECT task FROM tasks WHERE id = ? AND owner = ? AND status = 'leased'",
+                              (task_id, worker)).fetchone()
+            if held is None:
+                return False  # Another worker has the task now; its result will count instead
+            store = json.loads(held[0]).get('store')
+            db.executemany("INSERT INTO results (run, store, task_id, product) VALUES (?, ?, ?, ?)",
+                           [(run, store, task_id, json.dumps(p, ensure_ascii=False)) for p in products])
+            db.executemany("INSERT OR IGNORE INTO tasks (run, key, task, status) VALUES (?, ?, ?, 'queued')",
+                           [(run, task_key(t), json.dumps(t, ensure_ascii=False)) for t in follow_ups])
+            db.execute("UPDATE tasks SET status = 'done', owner = NULL, products = ?, error = NULL WHERE id = ?",
+                       (len(products), task_id))
+            return True
+        return self._transaction(complete)
+
+    def fail(self, run, worker, task_id, error, seconds=LEASE_SECONDS):
+        """Queue the task again for the other workers, or give it up after max_attempts"""
+        def fail(db):
+            now = time.time()
+            db.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+                " owner = NULL, avoid = ?, retry_after = ?, failed_at = ?, error = ?"
+                " WHERE id = ? AND owner = ? AND status = 'leased'",
+                (self.max_attempts, worker, now + seconds, now, str(error)[:500], task_id, worker))
+        self._transaction(fail)
+
+    def stats(self, run):
+        with self.lock:
+            counts = dict(self.db.execute("SELECT status, COUNT(*) FROM tasks WHERE run = ? GROUP BY status",
+                                          (run,)).fetchall())
+            products = self.db.execute("SELECT COALESCE(SUM(products), 0) FROM tasks WHERE run = ?",
+                                       (run,)).fetchone()[0]
+        stats = {status: counts.get(status, 0) for status in ('queued', 'leased', 'done', 'failed')}
+        stats['products'] = products
+        return stats
+
+    def failures(self, run):
+        """(task, error) of every task given up"""
+        with self.lock:
+            rows = self.db.execute("SELECT task, error FROM tasks WHERE run = ? AND status = 'failed' ORDER BY id",
+                                   (run,)).fetchall()
+        return [(json.loads(task), error) for task, error in rows]
+
+    def results(self, run, store):
+        """Stream the products workers found for `store`, in task order"""
+        last = (0, 0)
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT task_id, rowid, product FROM results WHERE run = ? AND store = ? AND (task_id, rowid) > (?, ?)"
+                    " ORDER BY task_id, rowid LIMIT ?", (run, store, *last, RESULT_BATCH)).fetchall()
+            if not rows:
+                return
+            for task_id, rowid, product in rows:
+                yield json.loads(product)
+            last = (rows[-1][0], rows[-1][1])
+
+class _MemoryPipeline:
+    """The pipe MemoryRedis.transaction() hands its callable: every command runs at once"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def multi(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+class MemoryRedis:
+    """The few Redis commands RedisQueue uses, on dicts in this process
+
+    Stands in for redis.Redis(decode_responses=True) in tests and single
+    process runs; every command is atomic, like on a Redis server, and a
+    transaction() runs with no other command in between, which is what
+    WATCH/MULTI guarantees there.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.RLock()
+
+    def _get(self, key, kind):
+        return self.data.setdefault(key, kind())
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        with self.lock:
+            result = func(_MemoryPipeline(self))
+        return result if value_from_callable else []
+
+    def incrby(self, key, amount=1):
+        with self.lock:
+            self.data[key] = int(self.data.get(key, 0)) + amount
+            return self.data[key]
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip('*')
+        with self.lock:
+            return [key for key in self.data if key.startswith(prefix)]
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self.lock:
+            h = self._get(key, dict)
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            h.update({k: str(v) for k, v in items.items()})
+            return len(items)
+
+    def hmget(self, key, fields):
+        with self.lock:
+            h = self.data.get(key, {})
+            return [h.get(field) for field in fields]
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self.data.get(key, {}))
+
+    def hincrby(self, key, field, amount=1):
+        with self.lock:
+            h = self._get(key, dict)
+            h[field] = str(int(h.get(field, 0)) + amount)
+            return int(h[field])
+
+    def rpush(self, key, *values):
+        with self.lock:
+            items = self._get(key, list)
+            items.extend(str(v) for v in values)
+            return len(items)
+
+    def lrem(self, key, count, value):
+        with self.lock:
+            items = self.data.get(key, [])
+            if str(value) in items:
+                items.remove(str(value))
+                return 1
+            return 0
+
+    def lrange(self, key, start, end):
+        with self.lock:
+            items = self.data.get(key, [])
+            return items[start:None if end == -1 else end + 1]
+
+    def llen(self, key):
+        with self.lock:
+            return len(self.data.get(key, []))
+
+    def zadd(self, key, mapping):
+        with self.lock:
+            z = self._get(key, dict)
+            added = sum(1 for member in mapping if str(member) not in z)
+            z.update({str(member): float(score) for member, score in mapping.items()})
+            return added
+
+    def zrem(self, key, *members):
+        with self.lock:
+            z = self.data.get(key, {})
+            return sum(1 for m in members if z.pop(str(m), None) is not None)
+
+    def zrangebyscore(self, key, low, high):
+        low, high = float(low), float(high)
+        with self.lock:
+            z = self.data.get(key, {})
+            return [m for m, s in sorted(z.items(), key=lambda kv: kv[1]) if low <= s <= high]
+
+    def zcard(self, key):
+        with self.lock:
+            return len(self.data.get(key, {}))
+
+    def close(self):
+        pass
+
+class RedisQueue:
+    """Queue and result sink in Redis, shared by workers on any number of machines
+
+    Per run (keys under `<prefix>:<run>:`): a `queued` list of task ids, a
+    `leases` sorted set of lease expiries, a hash per task, a `workers`
+    sorted set of when each worker was last around, and one list of product
+    JSON per store (and `failed`, the ids given up). Every change of a task
+    is one transaction that WATCHes its hash: it reads the task, checks it is
+    still in the expected state and then writes all its keys in one MULTI,
+    so of two workers racing for a task (or a late complete() and the expiry
+    of its lease) exactly one succeeds and the other sees the new state.
+    """
+
+    def __init__(self, client, prefix='scraper', max_attempts=MAX_ATTEMPTS, retry_seconds=RETRY_SECONDS):
+        self.r = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+
+    def _k(self, run, *parts):
+        return ':'.join((self.prefix, run) + parts)
+
+    def _transaction(self, fn, *watches):
+        """fn(pipe): reads, then pipe.multi() and writes; retried if a watched key changed meanwhile"""
+        return self.r.transaction(fn, *watches, value_from_callable=True)
+
+    def close(self):
+        self.r.close()
+
+    def clear(self, run):
+        keys = list(self.r.scan_iter(match=self._k(run, '*')))
+        if keys:
+            self.r.delete(*keys)
+
+    def _new_tasks(self, pipe, run, tasks):
+        """Before multi(): the tasks not seen before in `run`, each with a fresh id"""
+        fresh = {}
+        for task in tasks:
+            fresh.setdefault(task_key(task), task)
+        if not fresh:
+            return []
+        seen = pipe.hmget(self._k(run, 'keys'), list(fresh))
+        fresh = [(key, task) for (key, task), task_id in zip(fresh.items(), seen) if task_id is None]
+        if not fresh:
+            return []
+        last = pipe.incrby(self._k(run, 'ids'), len(fresh))
+        return [(str(last - len(fresh) + i + 1), key, task) for i, (key, task) in enumerate(fresh)]
+
+    def _queue_new(self, pipe, run, new):
+        """After multi(): queue what _new_tasks() returned"""
+        for task_id, key, task in new:
+            pipe.hset(self._k(run, 'keys'), key, task_id)
+            pipe.hset(self._k(run, 'task', task_id),
+                      mapping={'task': json.dumps(task, ensure_ascii=False), 'status': 'queued', 'attempts': 0})
+        if new:
+            pipe.rpush(self._k(run, 'queued'), *(task_id for task_id, _, _ in new))
+
+    def put(self, run, tasks):
+        tasks = list(tasks)
+
+        def put(pipe):
+            new = self._new_tasks(pipe, run, tasks)
+            pipe.multi()
+            self._queue_new(pipe, run, new)
+            return len(new)
+        return self._transaction(put, self._k(run, 'keys'))
+
+    def _requeue(self, pipe, run, task_id, task, worker, error, seconds):
+        """After multi(): back to `queued` (or given up) after a failure or an expired lease of `worker`"""
+        key = self._k(run, 'task', task_id)
+        now = time.time()
+        pipe.zrem(self._k(run, 'leases'), task_id)
+        if int(task.get('attempts') or 0) >= self.max_attempts:
+            pipe.hset(key, mapping={'status': 'failed', 'error': error, 'owner': ''})
+            pipe.hincrby(self._k(run, 'counts'), 'failed')
+            pipe.rpush(self._k(run, 'failed'), task_id)
+            return
+        pipe.hset(key, mapping={'status': 'queued', 'error': error, 'owner': '', 'avoid': worker,
+                                'retry_after': now + seconds, 'failed_at': now})
+        pipe.rpush(self._k(run, 'queued'), task_id)
+
+    def _seen(self, run, worker, now, seconds):
+        """Record `worker` as around; True if another worker was too within half a lease period"""
+        workers = self._k(run, 'workers')
+        self.r.zadd(workers, {worker: now})
+        return any(w != worker for w in self.r.zrangebyscore(workers, now - seconds / 2, '+inf'))
+
+    def _expire(self, run, task_id, now, seconds):
+        key = self._k(run, 'task', task_id)
+
+        def expire(pipe):
+            task = pipe.hgetall(key)
+            if task.get('status') != 'leased' or float(task.get('lease_expires') or 0) > now:
+                return  # Completed, failed or extended meanwhile
+            pipe.multi()
+            self._requeue(pipe, run, task_id, task, task.get('owner') or '', 'lease expired', seconds)
+        self._transaction(expire, key)
+
+    def _take(self, run, worker, task_id, now, seconds, others):
+        """Lease one queued task to `worker`; None if it was taken meanwhile or is left to the others"""
+        key = self._k(run, 'task', task_id)
+
+        def take(pipe):
+            task = pipe.hgetall(key)
+            if task.get('status') != 'queued':
+                return None
+            if (task.get('avoid') == worker and float(task.get('retry_after') or 0) > now
+                    and (others or float(task.get('failed_at') or 0) + self.retry_seconds > now)):
+                return None  # This worker failed it last time; leave it to the others for now
+            pipe.multi()
+            pipe.lrem(self._k(run, 'queued'), 1, task_id)
+            pipe.zadd(self._k(run, 'leases'), {task_id: now + seconds})
+            pipe.hset(key, mapping={'status': 'leased', 'owner': worker, 'lease_expires': now + seconds})
+            pipe.hincrby(key, 'attempts')
+            return json.loads(task['task'])
+        return self._transaction(take, key)
+
+    def lease(self, run, worker, count=1, seconds=LEASE_SECONDS):
+        now = time.time()
+        others = self._seen(run, worker, now, seconds)
+        for task_id in self.r.zrangebyscore(self._k(run, 'leases'), 0, now):
+            self._expire(run, task_id, now, seconds)
+
+        leased = []
+        for start in itertools.count(0, RESULT_BATCH):
+            task_ids = self.r.lrange(self._k(run, 'queued'), start, start + RESULT_BATCH - 1)
+            for task_id in task_ids:
+                task = self._take(run, worker, task_id, now, seconds, others)
+                if task is not None:
+                    leased.append((int(task_id), task))
+                    if len(leased) >= count:
+                        return leased
+            if len(task_ids) < RESULT_BATCH:
+                return leased
+
+    def _held(self, pipe, run, worker, task_id):
+        """The task's hash if `worker` still holds its lease, else None"""
+        task = pipe.hgetall(self._k(run, 'task', task_id))
+        return task if task.get('status') == 'leased' and task.get('owner') == worker else None
+
+    def extend(self, run, worker, task_ids, seconds=LEASE_SECONDS):
+        now = time.time()
+        self._seen(run, worker, now, seconds)
+        for task_id in map(str, task_ids):
+            def extend(pipe):
+                if self._held(pipe, run, worker, task_id) is None:
+                    return
+                pipe.multi()
+                pipe.zadd(self._k(run, 'leases'), {task_id: now + seconds})
+                pipe.hset(self._k(run, 'task', task_id), 'lease_expires', now + seconds)
+            self._transaction(extend, self._k(run, 'task', task_id))
+
+    def complete(self, run, worker, task_id, products, follow_ups=()):
+        task_id = str(task_id)
+        follow_ups = list(follow_ups)
+        products_json = [json.dumps(p, ensure_ascii=False) for p in products]
+
+        def complete(pipe):
+            task = self._held(pipe, run, worker, task_id)
+            if task is None:
+                return False  # Another worker has the task now; its result will count instead
+            new = self._new_tasks(pipe, run, follow_ups)
+            store = json.loads(task['task']).get('store')
+            pipe.multi()
+            pipe.zrem(self._k(run, 'leases'), task_id)
+            if products_json:
+                pipe.rpush(self._k(run, 'results', store), *products_json)
+            self._queue_new(pipe, run, new)
+            pipe.hset(self._k(run, 'task', task_id), mapping={'status': 'done', 'owner': '', 'error': '',
+                                                              'products': len(products)})
+            pipe.hincrby(self._k(run, 'counts'), 'done')
+            pipe.hincrby(self._k(run, 'counts'), 'products', len(products))
+            return True
+        return self._transaction(complete, self._k(run, 'task', task_id), self._k(run, 'keys'))
+
+    def fail(self, run, worker, task_id, error, seconds=LEASE_SECONDS):
+        task_id = str(task_id)
+
+        def fail(pipe):
+            task = self._held(pipe, run, worker, task_id)
+            if task is None:
+                return
+            pipe.multi()
+            self._requeue(pipe, run, task_id, task, worker, str(error)[:500], seconds)
+        self._transaction(fail, self._k(run, 'task', task_id))
+
+    def stats(self, run):
+        counts = self.r.hgetall(self._k(run, 'counts'))
+        return {'queued': self.r.llen(self._k(run, 'queued')), 'leased': self.r.zcard(self._k(run, 'leases')),
+                'done': int(counts.get('done', 0)), 'failed': int(counts.get('failed', 0)),
+                'products': int(counts.get('products', 0))}
+
+    def failures(self, run):
+        failed = []
+        for task_id in self.r.lrange(self._k(run, 'failed'), 0, -1):
+            task = self.r.hgetall(self._k(run, 'task', task_id))
+            failed.append((json.loads(task['task']), task.get('error')))
+        return failed
+
+    def results(self, run, store):
+        key = self._k(run, 'results', store)
+        for start in itertools.count(0, RESULT_BATCH):
+            rows = self.r.lrange(key, start, start + RESULT_BATCH - 1)
+            if not rows:
+                return
+            for product in rows:
+                yield json.loads(product)
+
+_memory = {}
+
+def open_queue(url=None):
+    """SqliteQueue / RedisQueue for `url` (see the module docstring); default: cache/work_queue.sqlite"""
+    url = url or DEFAULT_QUEUE_PATH
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        if redis is None:
+            raise ImportError("redis:// work queues need: pip install redis")
+        return RedisQueue(redis.Redis.from_url(url, decode_responses=True))
+    if url.startswith('memory://'):
+        return RedisQueue(_memory.setdefault(url, MemoryRedis()))
+    if url.startswith('sqlite://'):
+        url = url[len('sqlite://'):]
+    return SqliteQueue(url)
+
+def run_finished(stats):
+    return not stats['queued'] and not stats['leased']
+
+async def work(queue, run, handle, worker=None, concurrency=1, seconds=LEASE_SECONDS,
+               poll_interval=POLL_INTERVAL, keep_running=False):
+    """Worker loop: lease tasks of `run` and complete each with `await handle(task)`
+
+    `handle` returns (products, follow-up tasks) and may raise to fail the
+    task. Up to `concurrency` tasks run at once, and their leases are
+    extended every third of a lease period. Returns when the run has nothing
+    queued or leased, or only when cancelled with keep_running=True.
+    """
+    worker = worker or worker_name()
+    running = {}  # task_id -> asyncio task
+    stats = {'done': 0, 'failed': 0, 'lost': 0, 'products': 0}
+    last_extend = time.monotonic()
+
+    async def run_task(task_id, task):
+        try:
+            products, follow_ups = await handle(task)
+        except Exception as e:
+            print(f"❌ Task {task_id} failed on {worker}: {e}")
+            await asyncio.to_thread(queue.fail, run, worker, task_id, f"{type(e).__name__}: {e}", seconds)
+            stats['failed'] += 1
+            return
+        if await asyncio.to_thread(queue.complete, run, worker, task_id, products, follow_ups):
+            stats['done'] += 1
+            stats['products'] += len(products)
+        else:
+            stats['lost'] += 1
+            print(f"⚠️ Task {task_id}: lease expired before it finished, result dropped")
+
+    try:
+        while True:
+            if len(running) < concurrency:
+                for task_id, task in await asyncio.to_thread(queue.lease, run, worker,
+                                                             concurrency - len(running), seconds):
+                    running[task_id] = asyncio.create_task(run_task(task_id, task))
+            if not running:
+                if not keep_running and run_finished(await asyncio.to_thread(queue.stats, run)):
+                    break
+                await asyncio.sleep(poll_interval)
+                continue
+            done, _ = await asyncio.wait(running.values(), timeout=poll_interval,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task_id in [t for t, future in running.items() if future in done]:
+                del running[task_id]
+            if running and time.monotonic() - last_extend > seconds / 3:
+                await asyncio.to_thread(queue.extend, run, worker, list(running), seconds)
+                last_extend = time.monotonic()
+    finally:
+        for future in running.values():
+            future.cancel()
+    return stats
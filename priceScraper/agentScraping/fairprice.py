@@ -2,7 +2,7 @@
 # pip install crawl4ai openai pydantic python-dotenv
 # playwright install
 
-import os, json, asyncio, csv, requests, math
+import os, asyncio, time, functools
 from crawl4ai.deep_crawling import BFSDeepCrawlStrategy
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
@@ -18,6 +18,17 @@ from crawl4ai.deep_crawling.filters import (
     URLPatternFilter,
 )
 from crawl4ai.extraction_strategy import LLMExtractionStrategy
+from core.embedding import make_embedder, BACKEND_URL
+from core.upload import upload_products
+from core.output import ProductWriter
+from core.columnar import save_columnar
+from core.pipeline import StreamingPipeline
+from core.adapter import StoreAdapter
+from core.scheduler import ScrapeFailed
+from core.normalize import annotate_products, category_from_url
+from core.datasource import DataSource, DEFAULT_FIELDS as DATA_SOURCE_FIELDS
+from core.metrics import metrics
+from core.offload import cleaning_pool
 
 # Code scraps FairPrice website for products and their details. It embeds the
 # product details, store the vectors and pushes it to DB to keep
@@ -26,6 +37,22 @@ from crawl4ai.extraction_strategy import LLMExtractionStrategy
 load_dotenv()
 api = os.getenv("BACKEND_URL")
 
+# Embedding settings
+EMBEDDER = os.getenv("EMBEDDER", "remote") # 'remote' (backend), 'hashing' (in-process, no model) or 'sentence-transformers'
+EMBEDDING_BATCH_SIZE = 64 # Texts per embedding request (batch route only)
+EMBEDDING_CONCURRENCY = 4 # Embedding requests in flight at once
+ENABLE_EMBEDDING_CACHE = True # Set to False to re-embed every product
+UPLOAD_CONCURRENCY = 4 # Upload batches in flight at once
+COLUMNAR_OUTPUT = True # Also write typed columns (.parquet/.npz) and a float32 .embeddings.npy matrix
+
+# Crawl concurrency. Browser pages in use ~= MAX_CONCURRENT_CATEGORIES * PAGES_PER_CATEGORY
+MAX_CONCURRENT_CATEGORIES = 3 # Category deep crawls running at once (1 = old sequential loop)
+PAGES_PER_CATEGORY = 4 # Product pages each deep crawl renders at once
+DIRECT_EXTRACTION = False # Read the category's products from its __NEXT_DATA__ over plain HTTP instead of deep crawling; falls back to the crawl
+CLEANING_WORKERS = 0 # Processes for JSON parsing and cleaning (None = one per core, 0 = on the event loop)
+
+STORE = 'fairprice'  # Adapter name and metrics label
+
 # URL used for scrape testing
 URL_TO_SCRAPE = "https://www.fairprice.com.sg/category/international-selections"
 
@@ -97,178 +124,258 @@ css_schema = {
     ]
 }
 
-# Crawler settings
-crawl_cfg = CrawlerRunConfig(
-    deep_crawl_strategy=BFSDeepCrawlStrategy(
-        max_depth=1, # Enters maximum (its own page) + 1 pages
-        include_external=True, # Enters other pages
-        filter_chain=filter_chain, # Filter; Params set above
-    ),
-    # scan_full_page=True, # Fairprice page is dynamic and requires scrolling all the way down to load all products
-    # scroll_delay=0.5,
-    extraction_strategy=JsonCssExtractionStrategy(css_schema, verbose=True),
-    verbose=True,
-    remove_overlay_elements=True,
-    page_timeout=180000,
-)
+# Crawler settings. The BFS strategy keeps per-crawl state (visited URLs, page
+# counters), so every concurrent category crawl needs its own instance
+def make_crawl_cfg():
+    return CrawlerRunConfig(
+        deep_crawl_strategy=BFSDeepCrawlStrategy(
+            max_depth=1, # Enters maximum (its own page) + 1 pages
+            include_external=True, # Enters other pages
+            filter_chain=filter_chain, # Filter; Params set above
+        ),
+        # scan_full_page=True, # Fairprice page is dynamic and requires scrolling all the way down to load all products
+        # scroll_delay=0.5,
+        extraction_strategy=JsonCssExtractionStrategy(css_schema, verbose=True),
+        verbose=True,
+        remove_overlay_elements=True,
+        page_timeout=180000,
+        semaphore_count=PAGES_PER_CATEGORY, # Product pages rendered at once inside one category crawl
+    )
+
 
 # Browser settings. Headless hence kinda irrelevant
 browser_cfg = BrowserConfig(headless=True, verbose=True, text_mode=True)
 
-# CSV settings
-csv_file = "products.csv"
-csvCol = ['name', 'supermarket', 'quantity', 'price', 'promotion_description', 'promotion_end_date_text', 'product_url', 'image_url', 'embedding']
+# Direct extraction: products in the category page's Next.js data link to /product/<slug>
+data_source = DataSource(dict(
+    {k: v for k, v in DATA_SOURCE_FIELDS.items() if k != 'product_link'},
+    product_url=lambda item: item.get('url') or (f"/product/{item['slug']}" if item.get('slug') else ''),
+)) if DIRECT_EXTRACTION else None
 
+# Output settings: writes products.ndjson, products.csv and products.json next to this script
+OUTPUT_BASENAME = "products"
 
 
-async def main():
-    all_products = []
-    async with AsyncWebCrawler(config=browser_cfg) as crawler:
-        # Scrap single page. Used for testing
-        # results = await crawler.arun(URL_TO_SCRAPE, config=crawl_cfg)    
-        # for i, result in enumerate(results):
-        #     try:
-        #         if hasattr(result, "success") and result.success:
-        #             data = json.loads(result.extracted_content)
-        #             product_url = result.url
-        #             if isinstance(data, list):
-        #                 for product in data:
-        #                     product["product_url"] = product_url
-        #                     product["supermarket"] = "FairPrice"
-                            
-        #                     # Name, Quantity and Price are being embedded. Change this to adjust embedding accuracy
-        #                     embedding_input = f"{product.get('name', '')} {product.get('quantity', '')} {product.get('price', '')}"
-
-        #                     # sends to embedding service
-        #                     response = await asyncio.to_thread(
-        #                         requests.post,
-        #                         "http://localhost:3000/products/embed-text",
-        #                         headers={
-        #                             'Content-Type': 'application/json',
-        #                             'X-API-Key': os.getenv("JWT_SECRET")
-        #                         },
-        #                         json={"text": embedding_input},
-        #                         timeout=60,
-        #                     )
-        #                     output = response.json()
-        #                     embedding = output.get('embedding')
-        #                     product["embedding"] = embedding
-        #                     all_products.append(product)
-        #             elif isinstance(data, dict):
-        #                 all_products.append(data)
-        #             else:
-        #                 print(f"⚠️ [{i}] Unexpected data format: {type(data)}")
-        #     except Exception as e:
-        #         print(f"⚠️ [{i}] JSON decode failed: {e}")
-
-        # Scraping multiple pages in concurrency. Do not know why parallel does not work
-        for target_url in LIST_URL_TO_SCRAPE:
-            results = await crawler.arun(target_url, config=crawl_cfg)
-            for i, result in enumerate(results):
-                try:
-                    if hasattr(result, "success") and result.success:
-                        data = json.loads(result.extracted_content)
-                        product_url = result.url
-                        if isinstance(data, list):
-                            for product in data:
-                                product["product_url"] = product_url
-                                product["supermarket"] = "FairPrice"
-                                
-                                # Name, Quantity and Price are being embedded. Change this to adjust embeddding accuracy
-                                embedding_input = f"{product.get('name', '')} {product.get('quantity', '')} {product.get('price', '')}"
-                                
-                                # sends to embedding service
-                                response = await asyncio.to_thread(
-                                    requests.post,
-                                    "/products/embed-text",
-                                    headers={
-                                        'Content-Type': 'application/json',
-                                        'X-API-Key': os.getenv("JWT_SECRET")
-                                    },
-                                    json={"text": embedding_input},
-                                    timeout=60,
-                                )
-                                output = response.json()
-                                embedding = output.get('embedding')
-                                product["embedding"] = embedding
-                                all_products.append(product)
-                        elif isinstance(data, dict):
-                            all_products.append(data)
-                        else:
-                            print(f"⚠️ [{i}] Unexpected data format: {type(data)}")
-                except Exception as e:
-                    print(f"⚠️ [{i}] JSON decode failed: {e}")
-
-
-        # Scrap list of pages on parallel. I do not know why i cannot.
-        # results = await crawler.arun_many(LIST_URL_TO_SCRAPE, config=crawl_cfg)
-        # for i, result in enumerate(results[0]):
-        #     for j , res in enumerate(result[0]):
-        #         if hasattr(result, "success") and result.success:
-        #             try:
-        #                 data = json.loads(result.extracted_content)
-        #                 if isinstance(data, list):
-        #                     all_products.extend(data)
-        #                 elif isinstance(data, dict):
-        #                     all_products.append(data)
-        #                 else:
-        #                     print(f"⚠️ [{i}] Unexpected data format: {type(data)}")
-        #             except Exception as e:
-        #                 print(f"⚠️ [{i}] JSON decode failed: {e}")
-        #         else:
-        #             print(f"⚠️ [{i}] Crawl failed for {result.url}: {result.error_message}")
-                
-    # Save to CSV
-    if all_products:
-        # Write CSV
-        with open(csv_file, mode='w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=csvCol)
-            writer.writeheader()
-            for product in all_products:
-                print(product)  # For debugging
-                writer.writerow(product)
-
-        # Write JSON
-        json_file = "products.json"
-        with open(json_file, mode='w', encoding='utf-8') as jf:
-            json.dump(all_products, jf, indent=2, ensure_ascii=False)
-
-        print(f"✅ Saved {len(all_products)} products to '{csv_file}' and '{json_file}'")
-        
-        # Size of each chunk of JSON to upload to DB
-        BATCH_SIZE = 5 # Edit this to change the size of each chunk
-        
+
+def clean_and_filter_products(raw_products, page_url, category=None):
+    """FairPrice rows are used as extracted; tag them with their page, store and category and parse price/quantity"""
+    for product in raw_products:
+        # Rows from the direct extraction carry their own product link
+        product["product_url"] = product.get("product_url") or page_url
+        product["supermarket"] = "FairPrice"
+    return annotate_products(raw_products, category=category)
+
+
+async def extract_products(results, category=None):
+    """Turn the results of one deep crawl into product dicts
+
+    Deep-crawl results are product pages, so the category comes from the
+    crawl's start URL rather than from each result's URL. All the pages are
+    parsed and cleaned in one cleaning_pool call. If any page failed to render,
+    ScrapeFailed is raised carrying the products of the others.
+    """
+    products = []
+    with metrics.span('extract', store=STORE):
+        succeeded = []
+        for result in results:
+            if getattr(result, 'success', False):
+                succeeded.append(result)
+                metrics.inc('pages_total', store=STORE, result='ok')
+                metrics.inc('page_bytes_total', len(getattr(result, 'html', None) or ''), store=STORE)
+            else:
+                metrics.inc('pages_total', store=STORE, result='failed')
+        clean = functools.partial(clean_and_filter_products, category=category)
+        pages = await cleaning_pool.clean_pages(clean, [(result.extracted_content, result.url) for result in succeeded])
+        for i, (page_products, data, error) in enumerate(pages):
+            if error is not None:
+                print(f"⚠️ [{i}] JSON decode failed: {error}")
+            elif page_products is not None:
+                products.extend(page_products)
+            elif isinstance(data, dict):
+                products.append(data)
+            elif not isinstance(data, list):
+                print(f"⚠️ [{i}] Unexpected data format: {type(data)}")
+    metrics.inc('products_total', len(products), store=STORE, stage='scraped')
+    if len(succeeded) < len(results):
+        raise ScrapeFailed(f"{len(results) - len(succeeded)} of {len(results)} pages failed to render", products)
+    return products
+
+
+def merge_products(per_category, seen=None):
+    """Concatenate category results in LIST_URL_TO_SCRAPE order, dropping products reached from several categories
+
+    Pass the same `seen` set to merge categories one at a time as they finish.
+    """
+    merged = []
+    seen = set() if seen is None else seen
+    for products in per_category:
+        for product in products:
+            key = (product.get('product_url'), product.get('name'), product.get('quantity'), product.get('price'))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(product)
+    return merged
+
+
+async def extract_direct(target_url):
+    """Category products from the page's embedded JSON, or None to fall back to the deep crawl"""
+    if not data_source:
+        return None
+    with metrics.span('direct', store=STORE):
+        rows, _ = await data_source.extract(target_url)
+    if not rows:
+        return None
+    products = await cleaning_pool.run(clean_and_filter_products, rows, target_url, category_from_url(target_url))
+    metrics.inc('pages_total', store=STORE, result='direct')
+    metrics.inc('products_total', len(products), store=STORE, stage='scraped')
+    return products
+
+
+async def render(crawler, target_url):
+    """Deep-crawl one category; a crawl that errors out is counted and raised as ScrapeFailed"""
+    try:
+        with metrics.span('render', store=STORE):
+            return await crawler.arun(target_url, config=make_crawl_cfg())
+    except Exception as e:
+        metrics.inc('pages_total', store=STORE, result='failed')
+        print(f"⚠️ Crawl failed for {target_url}: {e}")
+        raise ScrapeFailed(f"crawl failed: {e}") from e
+
+
+async def scrape_category(crawler, target_url, semaphore, failed):
+    async with semaphore:
+        start = time.perf_counter()
+        products = await extract_direct(target_url)
+        if products is not None:
+            print(f"⚡ {target_url}: {len(products)} products without the browser "
+                  f"in {time.perf_counter() - start:.1f}s")
+            return products
         try:
-            with open(json_file, 'r', encoding='utf-8') as json_file:
-                json_data = json.load(json_file)    
-            
-            # Calculate number of chunks needed  
-            total_products = len(json_data)
-            total_batches = math.ceil(total_products / BATCH_SIZE)
-           
-            # Break into chunks and upload chunks into DB
-            print(f"Uploading {total_products} products in {total_batches} batches of {BATCH_SIZE} products each...") 
-            for batch_num in range(total_batches):
-                start = batch_num * BATCH_SIZE
-                end = start + BATCH_SIZE
-                chunk = json_data[start:end]
-                
-                response = await asyncio.to_thread(
-                    requests.post,
-                    f"{api}/products/upload",
-                    headers={
-                        'Content-Type': 'application/json',
-                        'X-API-Key': os.getenv("JWT_SECRET")
-                    },
-                    json=chunk,
-                )
-                output = response.json()
-                if output.gEt('statusCode') == 200:
-                    print(output.get('message'))
-                else:
-                    print(f"⚠️ [{i}] Upload To DB Failed: {output.get('message')}")
-        except Exception as e:
-            print(f"⚠️ [{i}] Upload To DB Failed: {e}")
+            results = await render(crawler, target_url)
+        except ScrapeFailed:
+            failed.add(target_url)
+            return []
+        try:
+            products = await extract_products(results, category_from_url(target_url))
+        except ScrapeFailed as e:
+            print(f"⚠️ {target_url}: {e}")
+            failed.add(target_url)
+            products = e.products
+        print(f"✅ {target_url}: {len(products)} products from {len(results)} pages "
+              f"in {time.perf_counter() - start:.1f}s")
+        return products
+
+
+async def scrape_categories(crawler, urls, concurrency, on_page=None, failed=None):
+    """Deep-crawl every category with at most `concurrency` crawls in flight; 1 = sequential
+
+    Returns the merged products. With `on_page`, each category's new products
+    are awaited into it as soon as its crawl is done, and only their count is
+    returned. Categories whose crawl failed, fully or in part, are added to the
+    `failed` set and listed in the summary.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    start = time.perf_counter()
+    failed = set() if failed is None else failed
+    if on_page is None:
+        per_category = await asyncio.gather(*(scrape_category(crawler, url, semaphore, failed) for url in urls))
+        products = merge_products(per_category)
+        count = len(products)
+    else:
+        seen = set()
+
+        async def scrape(url):
+            new = merge_products([await scrape_category(crawler, url, semaphore, failed)], seen)
+            if new:
+                await on_page(new)
+            return len(new)
+
+        products = count = sum(await asyncio.gather(*(scrape(url) for url in urls)))
+    print(f"📊 {count} products from {len(urls)} categories in {time.perf_counter() - start:.1f}s "
+          f"({concurrency} concurrent)")
+    if failed:
+        print(f"❌ {len(failed)} of {len(urls)} categories failed: {', '.join(sorted(failed))}")
+    return products
+
+
+class FairPriceAdapter(StoreAdapter):
+    """FairPrice for run_all.py: BFS deep crawl from each category into its product pages"""
+    name = STORE
+    supermarket = 'FairPrice'
+    css_schema = css_schema
+    urls = LIST_URL_TO_SCRAPE
+    test_urls = [URL_TO_SCRAPE]
+    # A SKU shows up on its category page and on its own product page with the same
+    # name and price, and only the latter carries the product URL; merge_products()
+    # handles FairPrice's exact repeats instead
+    run_dedup = False
+
+    def crawl_config(self):
+        return make_crawl_cfg()
+
+    def clean_and_filter_products(self, raw_products, page_url):
+        return clean_and_filter_products(raw_products, page_url)
+
+    async def scrape_category(self, crawler, url, on_page=None):
+        products = await extract_direct(url)
+        if products is None:
+            results = await render(crawler, url)
+            try:
+                products = await extract_products(results, category_from_url(url))
+            except ScrapeFailed as e:
+                if on_page and e.products:
+                    await on_page(e.products)  # Keep what did render; the category still counts as failed
+                raise
+        if on_page and products:
+            await on_page(products)
+        return products
+
+
+async def main():
+    metrics.report_at_exit(STORE)
+    metrics.watch_event_loop()
+    cleaning_pool.configure(CLEANING_WORKERS)
+
+    # Each category is embedded (name, quantity and price; see core.embedding.embedding_text),
+    # uploaded and appended to products.ndjson/.csv as soon as its crawl is done
+    writer = ProductWriter(OUTPUT_BASENAME)
+    client = make_embedder(EMBEDDER, api or BACKEND_URL, batch_size=EMBEDDING_BATCH_SIZE,
+                           concurrency=EMBEDDING_CONCURRENCY, use_cache=ENABLE_EMBEDDING_CACHE)
+
+    async def embed(products):
+        await client.embed_products(products)
+        metrics.inc('products_total', sum(1 for p in products if p.get('embedding')), store=STORE, stage='embedded')
+
+    async def upload(products):
+        # Batch size adapts to payload size and backend latency
+        await upload_products(products, api or BACKEND_URL, concurrency=UPLOAD_CONCURRENCY)
+
+    pipeline = StreamingPipeline(
+        embed=embed,
+        upload=upload,
+        embed_batch_size=EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY,
+        sink=writer.write,
+        collect=False,
+        name=STORE,
+    )
+    async with AsyncWebCrawler(config=browser_cfg) as crawler, pipeline:
+        # Each category is its own BFS deep crawl; they run in parallel, bounded by
+        # MAX_CONCURRENT_CATEGORIES. (arun_many with a shared deep-crawl config
+        # mixed the crawls' state and returns nested result lists, which is why
+        # the old parallel attempt did not work.)
+        await scrape_categories(crawler, LIST_URL_TO_SCRAPE, MAX_CONCURRENT_CATEGORIES, on_page=pipeline.put)
+    print(cleaning_pool.summary())
+    cleaning_pool.close()
+    client.close()
+    if client.cache:
+        print(client.cache.summary())
+        client.cache.close()
+
+    # products.json is copied from the NDJSON file when the writer closes
+    writer.close()
+    if COLUMNAR_OUTPUT and writer.count:
+        save_columnar(writer.reader(), writer.basename)
 
 
 
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Multi-Store Product Scraper
+
+Scrapes FairPrice, Cold Storage and Sheng Siong in one process. All stores
+share one browser and its pool of warm pages (core/browser_pool.py), so the
+browser starts once and pages are reused across categories, and categories from
+every store are scheduled through one global concurrency limit (interleaved
+by store so no single site gets all the pages at once). Each store's pages
+stream through its own embed -> upload pipeline while scraping continues and
+is appended to <store>_products.ndjson/.csv as soon as it is embedded, so
+memory stays flat however large the catalogue grows. A cross-store unit price
+index (core/price_index.py) and candidate groups of the same item across
+stores (core/matching.py) are written at the end.
+
+USAGE:
+    python3 run_all.py                       # all stores
+    python3 run_all.py coldstorage shengsiong
+    python3 run_all.py --fast-refresh        # replay listing pages the sites report unchanged
+    python3 run_all.py --record              # save every crawl and HTTP response to cache/replay
+    python3 run_all.py --replay              # run offline from cache/replay (add --reextract to re-run selectors)
+    python3 run_all.py --daemon              # keep the browser warm and run jobs posted to DAEMON_PORT (see core/daemon.py)
+
+CONFIGURATION:
+    - TEST_MODE: Set to True to scrape each store's test category only
+    - ENABLE_EMBEDDING / EMBEDDER / ENABLE_DB_UPLOAD: Same meaning as in the store scripts
+    - MAX_CONCURRENT_CATEGORIES: Categories scraped at once across all stores
+    - BROWSER_PAGES / PAGE_RECYCLE_AFTER: Warm pages kept open, and navigations before one is replaced
+    - CLEANING_WORKERS: Processes that parse and clean extracted JSON off the event loop (see core/offload.py)
+    - COLUMNAR_OUTPUT: Also save typed columns and an embedding matrix (see core/columnar.py)
+    - MATCH_PRODUCTS / MATCH_THRESHOLD: Group the same item across stores by embedding similarity
+    - FAST_REFRESH: Same as --fast-refresh (see core/page_fingerprints.py; FairPrice's deep crawl always renders)
+    - CRAWL_REPLAY / REPLAY_DIR: 'record' or 'replay' crawls for offline runs and benchmarks (see core/replay.py)
+    - DAEMON / DAEMON_PORT / DAEMON_INTERVAL: Same as --daemon; the job API's port, and seconds between scheduled runs
+
+Per-stage timings (render, extract, embed, upload per store), page/product
+counters and the event loop's lag are printed at exit and written to
+cache/metrics/run_all.json/.prom (see core/metrics.py).
+"""
+
+import os, sys, asyncio
+from itertools import zip_longest
+from contextlib import AsyncExitStack
+from dotenv import load_dotenv
+from crawl4ai import BrowserConfig
+from core.embedding import make_embedder
+from core.pipeline import StreamingPipeline
+from core.scheduler import run_categories
+from core.upload import upload_products, upload_delta, settle_removed
+from core.output import ProductWriter
+from core.columnar import save_columnar
+from core.dedup import Deduplicator
+from core.price_index import save_index
+from core.matching import save_matches
+from core.render_profile import install_render_hooks
+from core.replay import ReplayStore, ReplayCrawler, DEFAULT_REPLAY_DIR
+from core.browser_pool import BrowserPool
+from core.daemon import ScrapeDaemon, DEFAULT_PORT as DEFAULT_DAEMON_PORT
+from core.metrics import metrics
+from core.offload import cleaning_pool
+from coldstorage import ColdStorageAdapter
+from shengsiong import ShengSiongAdapter
+from fairprice import FairPriceAdapter
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+TEST_MODE = False  # Set to False for production scraping
+ENABLE_EMBEDDING = True  # Set to True when backend is ready
+ENABLE_DB_UPLOAD = True  # Set to True when ready to upload to database
+MAX_CONCURRENT_CATEGORIES = 6  # Across all stores
+BROWSER_PAGES = 8  # Warm browser pages shared by all stores; also caps the renders in flight
+PAGE_RECYCLE_AFTER = 50  # Navigations before a page is closed and replaced, to cap its memory
+CATEGORY_RETRIES = 1  # Extra attempts for a category that fails or returns no products
+CLEANING_WORKERS = None  # Processes for JSON parsing and cleaning (None = one per core, 0 = on the event loop)
+EMBEDDER = os.getenv("EMBEDDER", "remote")  # 'remote' (backend), 'hashing' (in-process, no model) or 'sentence-transformers'
+EMBEDDING_BATCH_SIZE = 64  # Texts per embedding request (batch route only)
+EMBEDDING_CONCURRENCY = 4  # Embedding requests in flight at once
+ENABLE_EMBEDDING_CACHE = True  # Set to False to bypass the on-disk embedding cache
+DELTA_UPLOAD = True  # Only upload products that changed since the last run
+UPLOAD_CONCURRENCY = 4  # Upload batches in flight at once per store
+COLUMNAR_OUTPUT = True  # Also write typed columns (.parquet/.npz) and a float32 .embeddings.npy matrix
+MATCH_PRODUCTS = True  # Write cross_store_matches.json/.csv: the same item at different stores (needs embeddings)
+MATCH_THRESHOLD = 0.92  # Cosine similarity two products need to be grouped
+FAST_REFRESH = False  # Replay listing pages whose ETag/Last-Modified probe matches instead of rendering them
+CRAWL_REPLAY = None  # 'record' saves every crawl to REPLAY_DIR, 'replay' runs from it without browser or network
+REPLAY_DIR = DEFAULT_REPLAY_DIR  # cache/replay
+DAEMON = False  # Keep running and scrape on every job posted to DAEMON_PORT (same as --daemon)
+DAEMON_PORT = DEFAULT_DAEMON_PORT  # 8765, on 127.0.0.1
+DAEMON_INTERVAL = None  # Seconds between scheduled full runs in daemon mode (None = only posted jobs)
+
+ADAPTERS = [FairPriceAdapter(), ColdStorageAdapter(), ShengSiongAdapter()]
+
+def interleave(job_lists):
+    """Round-robin jobs across stores: [a1, b1, c1, a2, b2, ...]"""
+    return [job for group in zip_longest(*job_lists) for job in group if job is not None]
+
+def make_replay_store(adapters, page_stores, mode):
+    """ReplayStore for --record/--replay (or CRAWL_REPLAY), with the stores' HTTP sessions routed through it"""
+    if not mode:
+        return None
+    replay = ReplayStore(REPLAY_DIR, mode, reextract='--reextract' in sys.argv[1:])
+    for adapter in adapters:
+        if adapter.data_source:
+            replay.mount(adapter.data_source.session)
+        if replay.replaying and adapter.rate_limiter:
+            adapter.rate_limiter.min_interval = 0  # Nothing to be polite to
+    for page_store in page_stores:
+        replay.mount(page_store.session)
+        if replay.replaying:
+            # Fingerprints of replayed pages stay with the recording, not with the live ones
+            page_store.path = os.path.join(REPLAY_DIR, "pages.sqlite")
+    print(f"📼 {'Replaying' if replay.replaying else 'Recording'} crawls: {REPLAY_DIR}")
+    return replay
+
+def make_uploader(adapter):
+    async def upload(batch):
+        if DELTA_UPLOAD:
+            # Removed products are settled once after the run, when the full catalogue is known
+            await upload_delta(adapter.supermarket, batch, full_run=False, concurrency=UPLOAD_CONCURRENCY)
+        else:
+            await upload_products(batch, concurrency=UPLOAD_CONCURRENCY)
+    return upload
+
+def make_browser_pool(size=None):
+    """BrowserPool of `size` pages (default BROWSER_PAGES)"""
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=False,
+        text_mode=False,
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    )
+    return BrowserPool(browser_config, size=size or BROWSER_PAGES, recycle_after=PAGE_RECYCLE_AFTER)
+
+async def scrape_stores(selected=(), fast_refresh=False, test_mode=None, pool=None, replay_mode=None):
+    """One full run over the `selected` stores (all when empty); returns {store: product count}
+
+    Pages are rendered on `pool` when given (daemon mode), otherwise on a
+    browser pool started for this run. test_mode=None means TEST_MODE.
+    """
+    test_mode = TEST_MODE if test_mode is None else test_mode
+    adapters = [a for a in ADAPTERS if not selected or a.name in selected]
+    page_stores = {adapter.page_store for adapter in adapters if adapter.page_store}
+    for page_store in page_stores:
+        page_store.fast_refresh = fast_refresh
+    replay = make_replay_store(adapters, page_stores, replay_mode)
+    print(f"🚀 Starting Multi-Store Product Scraper: {', '.join(a.supermarket for a in adapters)}")
+    print("=" * 50)
+
+    jobs = interleave([[(adapter, url) for url in (adapter.test_urls if test_mode else adapter.urls)]
+                       for adapter in adapters])
+    adapter_for_url = {url: adapter for adapter, url in jobs}
+
+    # Embedded pages go straight to <store>_products.ndjson/.csv; nothing keeps the whole catalogue
+    writers = {adapter.name: ProductWriter(f"{adapter.name}_products") for adapter in adapters}
+    with make_embedder(EMBEDDER, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY,
+                       use_cache=ENABLE_EMBEDDING and ENABLE_EMBEDDING_CACHE) as client:
+        pipelines = {
+            adapter.name: StreamingPipeline(
+                embed=client.embed_products if ENABLE_EMBEDDING else None,
+                upload=make_uploader(adapter) if ENABLE_DB_UPLOAD else None,
+                embed_batch_size=EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY,
+                dedup=Deduplicator() if adapter.run_dedup else None,
+                sink=writers[adapter.name].write,
+                collect=False,
+                name=adapter.name,
+            )
+            for adapter in adapters
+        }
+
+        async with AsyncExitStack() as stack:
+            crawler = None
+            if not (replay and replay.replaying):
+                if pool is None:
+                    pool = await stack.enter_async_context(make_browser_pool())
+                    # Each store's crawl config carries its render profile; blocking is applied per page
+                    install_render_hooks(pool)
+                crawler = pool
+            if replay:
+                crawler = ReplayCrawler(crawler, replay)
+            for pipeline in pipelines.values():
+                await stack.enter_async_context(pipeline)
+
+            async def scrape(url):
+                adapter = adapter_for_url[url]
+                return await adapter.scrape_category(crawler, url, on_page=pipelines[adapter.name].put)
+
+            print(f"\n🔄 Scraping {len(jobs)} categories (max {MAX_CONCURRENT_CATEGORIES} concurrent)...")
+            failed = set()
+            await run_categories([url for _, url in jobs], scrape, concurrency=MAX_CONCURRENT_CATEGORIES,
+                                 retries=CATEGORY_RETRIES, keep_results=False, failed=failed)
+
+    print(cleaning_pool.summary())
+    if pool is not None:
+        print(pool.summary())
+    if client.cache:
+        print(client.cache.summary())
+        client.cache.close()
+    for adapter in adapters:
+        if adapter.render_profile:
+            print(f"{adapter.supermarket}: {adapter.render_profile.summary()}")
+    for page_store in page_stores:
+        print(page_store.summary())
+        page_store.close()
+    if replay:
+        print(replay.summary())
+        replay.close()
+
+    failed_stores = {adapter_for_url[url].name for url in failed}
+    return await finish_outputs(adapters, writers, failed_stores, test_mode)
+
+async def finish_outputs(adapters, writers, failed_stores, test_mode):
+    """Close the stores' writers, settle removed products and write the cross-store index and matches"""
+    for adapter in adapters:
+        writer = writers[adapter.name]
+        print(f"\n📊 {adapter.supermarket}: {writer.count} products")
+        writer.close()
+        if COLUMNAR_OUTPUT and writer.count:
+            save_columnar(writer.reader(), writer.basename)
+
+        # Only a complete run can tell which products disappeared
+        if ENABLE_DB_UPLOAD and DELTA_UPLOAD and not test_mode and adapter.name not in failed_stores:
+            await settle_removed(adapter.supermarket, [p['product_url'] for p in writer.reader()])
+
+    # Cross-store unit price index, cheapest first per category and unit
+    print("\n📊 Unit price index")
+    save_index(p for adapter in adapters for p in writers[adapter.name].reader())
+
+    if MATCH_PRODUCTS and ENABLE_EMBEDDING and len(adapters) > 1:
+        print("\n🔗 Cross-store matching")
+        save_matches({adapter.supermarket: writers[adapter.name].reader() for adapter in adapters},
+                     threshold=MATCH_THRESHOLD)
+
+    print(f"\n{'='*50}")
+    print("🏁 Scraper finished!")
+    return {adapter.name: writers[adapter.name].count for adapter in adapters}
+
+async def serve(selected, fast_refresh):
+    """Daemon mode: one warm browser pool, a scrape_stores() run per posted job
+
+    A job may set "stores", "fast_refresh" and "test_mode"; anything it
+    leaves out comes from the command line and the settings above.
+    """
+    async def run_job(args):
+        unknown = set(args) - {'stores', 'fast_refresh', 'test_mode'}
+        if unknown:
+            raise ValueError(f"Unknown job settings: {', '.join(sorted(unknown))}")
+        counts = await scrape_stores(args.get('stores') or selected, args.get('fast_refresh', fast_refresh),
+                                     args.get('test_mode', TEST_MODE), pool=pool)
+        metrics.save('run_all')  # Keep the Prometheus textfile current between jobs
+        return counts
+
+    async with make_browser_pool() as pool:
+        install_render_hooks(pool)
+        await ScrapeDaemon(run_job, port=DAEMON_PORT, interval=DAEMON_INTERVAL).serve()
+    print(pool.summary())
+
+async def main():
+    metrics.report_at_exit('run_all')
+    metrics.watch_event_loop()
+    cleaning_pool.configure(CLEANING_WORKERS)
+    args = sys.argv[1:]
+    selected = [arg for arg in args if not arg.startswith('--')]
+    fast_refresh = FAST_REFRESH or '--fast-refresh' in args
+    try:
+        if DAEMON or '--daemon' in args:
+            await serve(selected, fast_refresh)
+        else:
+            replay_mode = 'replay' if '--replay' in args else 'record' if '--record' in args else CRAWL_REPLAY
+            await scrape_stores(selected, fast_refresh, replay_mode=replay_mode)
+    finally:
+        cleaning_pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Distributed Multi-Store Scraper
+
+Spreads one run_all.py crawl over any number of worker processes, on one
+machine or on several, through a work queue (core/work_queue.py). The
+coordinator queues every category and waits while workers lease and scrape
+them; Cold Storage categories fan out into one task per listing page. Each
+worker renders on its own browser pool and embeds what it scrapes, so both
+scale with the number of workers. The products go back into the queue, and
+once the queue is drained the coordinator writes the same outputs as
+run_all.py from them: <store>_products.ndjson/.csv, the columnar files, the
+unit price index and the cross-store matches. Only the coordinator uploads,
+so delta uploads still see the whole catalogue.
+
+USAGE:
+    python3 run_distributed.py coordinator                     # queue all stores, wait, write outputs
+    python3 run_distributed.py coordinator coldstorage --work  # one store, and scrape in this process too
+    python3 run_distributed.py worker                          # scrape until the queue is empty
+    python3 run_distributed.py worker --keep-running           # stay up for the next run
+    python3 run_distributed.py status
+
+    # Several machines: one queue for all of them
+    WORK_QUEUE=redis://queue-host:6379/0 python3 run_distributed.py worker
+
+CONFIGURATION:
+    - WORK_QUEUE: Queue URL: a SQLite path, redis:// or memory:// (default cache/work_queue.sqlite)
+    - RUN_NAME: The run's name in the queue; a coordinator clears the earlier run of that name
+    - WORKER_CONCURRENCY: Tasks a worker scrapes at once (and the size of its browser pool)
+    - LEASE_SECONDS: How long a silent worker keeps a task before it goes to another worker
+    - Scraping, embedding, upload and output settings are run_all.py's
+"""
+
+import os, time, asyncio, argparse
+from itertools import islice
+from dotenv import load_dotenv
+import run_all
+from run_all import ADAPTERS, interleave, make_browser_pool, make_uploader, finish_outputs
+from core.embedding import make_embedder
+from core.pipeline import StreamingPipeline
+from core.output import ProductWriter
+from core.dedup import Deduplicator
+from core.render_profile import install_render_hooks
+from core.scheduler import ScrapeFailed
+from core.work_queue import open_queue, work, worker_name, run_finished, RESULT_BATCH
+from core.work_queue import LEASE_SECONDS as DEFAULT_LEASE_SECONDS
+from core.metrics import metrics
+from core.offload import cleaning_pool
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+WORK_QUEUE = os.getenv("WORK_QUEUE")  # None = cache/work_queue.sqlite
+RUN_NAME = os.getenv("RUN_NAME", "crawl")
+WORKER_CONCURRENCY = 6  # Tasks a worker scrapes at once
+LEASE_SECONDS = DEFAULT_LEASE_SECONDS  # 300; leases are extended while a task runs, so this only bounds a dead worker
+PROGRESS_INTERVAL = 10  # Seconds between the coordinator's progress lines
+
+async def run_worker(queue, run, worker=None, concurrency=WORKER_CONCURRENCY, keep_running=False):
+    """Scrape and embed tasks of `run` until it is drained; returns the worker's task counts"""
+    worker = worker or worker_name()
+    adapters = {adapter.name: adapter for adapter in ADAPTERS}
+    pool = make_browser_pool(concurrency)
+    with make_embedder(run_all.EMBEDDER, batch_size=run_all.EMBEDDING_BATCH_SIZE,
+                       concurrency=run_all.EMBEDDING_CONCURRENCY,
+                       use_cache=run_all.ENABLE_EMBEDDING and run_all.ENABLE_EMBEDDING_CACHE) as client:
+        async with pool:
+            install_render_hooks(pool)
+
+            async def handle(task):
+                adapter = adapters[task['store']]
+                with metrics.span('task', store=adapter.name):
+                    products, follow_ups = await adapter.scrape_task(pool, task)
+                    if not products and task.get('page', 1) == 1:
+                        # An empty category is retried and then given up, as in run_all.py
+                        raise ScrapeFailed("no products")
+                    if run_all.ENABLE_EMBEDDING and products:
+                        await client.embed_products(products)
+                metrics.inc('tasks_total', store=adapter.name)
+                return products, follow_ups
+
+            print(f"👷 Worker {worker} on run '{run}' ({concurrency} tasks at once)")
+            stats = await work(queue, run, handle, worker, concurrency, seconds=LEASE_SECONDS,
+                               keep_running=keep_running)
+        print(pool.summary())
+
+    if client.cache:
+        print(client.cache.summary())
+        client.cache.close()
+    for page_store in {adapter.page_store for adapter in ADAPTERS if adapter.page_store}:
+        print(page_store.summary())
+        page_store.close()
+    print(f"👷 Worker {worker}: {stats['done']} tasks done, {stats['failed']} failed, "
+          f"{stats['lost']} lost to expired leases, {stats['products']} products")
+    return stats
+
+async def collect_results(queue, run, adapters, failed_stores, test_mode):
+    """Stream the workers' products through dedup and upload into the usual output files"""
+    writers = {adapter.name: ProductWriter(f"{adapter.name}_products") for adapter in adapters}
+    for adapter in adapters:
+        pipeline = StreamingPipeline(
+            upload=make_uploader(adapter) if run_all.ENABLE_DB_UPLOAD else None,
+            dedup=Deduplicator() if adapter.run_dedup else None,
+            sink=writers[adapter.name].write,
+            collect=False,
+            name=adapter.name,
+        )
+        async with pipeline:
+            products = queue.results(run, adapter.name)
+            while batch := list(islice(products, RESULT_BATCH)):
+                await pipeline.put(batch)
+    return await finish_outputs(adapters, writers, failed_stores, test_mode)
+
+async def run_coordinator(queue, run, selected=(), test_mode=None, work_too=False, concurrency=WORKER_CONCURRENCY):
+    """Queue the selected stores' categories as `run`, wait for the workers, then write the outputs"""
+    test_mode = run_all.TEST_MODE if test_mode is None else test_mode
+    adapters = [a for a in ADAPTERS if not selected or a.name in selected]
+    tasks = interleave([[{'store': adapter.name, 'url': url}
+                         for url in (adapter.test_urls if test_mode else adapter.urls)] for adapter in adapters])
+    queue.clear(run)
+    queue.put(run, tasks)
+    print(f"🚀 Distributed scrape '{run}': {len(tasks)} categories of {', '.join(a.supermarket for a in adapters)}")
+    print("=" * 50)
+
+    local = asyncio.create_task(run_worker(queue, run, concurrency=concurrency)) if work_too else None
+    start = last_report = time.perf_counter()
+    while True:
+        stats = await asyncio.to_thread(queue.stats, run)
+        if run_finished(stats):
+            break
+        if local and local.done():
+            local.result()  # Raises what stopped the local worker
+            local = None
+        if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.perf_counter()
+            print(f"⏳ {stats['done']} tasks done, {stats['leased']} running, {stats['queued']} queued, "
+                  f"{stats['failed']} given up, {stats['products']} products ({last_report - start:.0f}s)")
+        await asyncio.sleep(1)
+    if local:
+        await local
+    print(f"\n✅ {stats['done']} tasks, {stats['products']} products in {time.perf_counter() - start:.1f}s")
+
+    failures = queue.failures(run)
+    for task, error in failures:
+        page = f" page {task['page']}" if 'page' in task else ''
+        print(f"❌ Given up: {task['url']}{page} ({error})")
+    return await collect_results(queue, run, adapters, {task['store'] for task, _ in failures}, test_mode)
+
+def print_status(queue, run):
+    stats = queue.stats(run)
+    print(f"📋 Run '{run}': {stats['queued']} queued, {stats['leased']} running, {stats['done']} done, "
+          f"{stats['failed']} given up, {stats['products']} products")
+    for task, error in queue.failures(run):
+        print(f"   ❌ {task} ({error})")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Distributed multi-store scraper")
+    parser.add_argument('role', choices=['coordinator', 'worker', 'status'])
+    parser.add_argument('stores', nargs='*', help="coordinator: stores to scrape (default: all)")
+    parser.add_argument('--queue', default=WORK_QUEUE, help="work queue URL (default: cache/work_queue.sqlite)")
+    parser.add_argument('--run', default=RUN_NAME, help="run name in the queue")
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY, help="tasks per worker at once")
+    parser.add_argument('--work', action='store_true', help="coordinator: also scrape in this process")
+    parser.add_argument('--keep-running', action='store_true', help="worker: wait for new tasks when idle")
+    parser.add_argument('--id', help="worker id (default: host-pid-random)")
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue)
+    try:
+        if args.role == 'status':
+            print_status(queue, args.run)
+            return
+        metrics.report_at_exit(f"distributed_{args.role}")
+        metrics.watch_event_loop()
+        cleaning_pool.configure(run_all.CLEANING_WORKERS)
+        if args.role == 'worker':
+            await run_worker(queue, args.run, args.id, args.concurrency, args.keep_running)
+        else:
+            await run_coordinator(queue, args.run, args.stores, work_too=args.work, concurrency=args.concurrency)
+    finally:
+        cleaning_pool.close()
+        queue.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
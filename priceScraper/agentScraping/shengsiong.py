@@ -9,14 +9,45 @@ USAGE:
 
 CONFIGURATION:
     - TEST_MODE: Set to True for single page testing, False for full scraping
-    - ENABLE_EMBEDDING: Set to True to generate embeddings (requires backend)
+    - ENABLE_EMBEDDING: Set to True to generate embeddings (requires backend unless EMBEDDER is local)
+    - EMBEDDER: Where embeddings come from; the local ones run offline (see core/local_embedding.py)
     - ENABLE_DB_UPLOAD: Set to True to upload to database (requires backend)
+    - EMBEDDING_BATCH_SIZE / EMBEDDING_CONCURRENCY: Tune the batched embedding client
+    - ENABLE_EMBEDDING_CACHE: Reuse embeddings of unchanged products from cache/embeddings.sqlite
+    - DELTA_UPLOAD: Upload only the delta against cache/snapshot.sqlite
+    - UPLOAD_CONCURRENCY: Number of upload batches in flight
+    - CATEGORY_CONCURRENCY / CATEGORY_RETRIES: Parallel category scraping and retries
+    - COLUMNAR_OUTPUT: Also save typed columns and an embedding matrix (see core/columnar.py)
+    - PAGE_FINGERPRINTS / FAST_REFRESH: Skip rendering pages that did not change (see core/page_fingerprints.py)
+    - DIRECT_EXTRACTION: Try embedded page JSON before the browser (see core/datasource.py)
+    - LIGHT_RENDERING / SCROLL_DELAY: Render profile for listing pages (see core/render_profile.py)
+    - CLEANING_WORKERS: Processes that parse and clean extracted JSON off the event loop (see core/offload.py)
+    - BROWSER_PAGES / PAGE_RECYCLE_AFTER: Warm pages kept open, and navigations before one is replaced (see core/browser_pool.py)
+
+Stage timings and counters are printed at exit and written to
+cache/metrics/shengsiong.json/.prom (see core/metrics.py).
 """
 
-import os, json, asyncio, csv, requests, math, re
+import os, asyncio
 from dotenv import load_dotenv
 from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+from crawl4ai import BrowserConfig, CrawlerRunConfig
+from core.embedding import make_embedder
+from core.output import ProductWriter
+from core.columnar import save_columnar
+from core.adapter import StoreAdapter
+from core.dedup import dedup_key, Deduplicator
+from core.normalize import (clean_whitespace, slugify, quantity_slug, join_slug, format_price,
+                            annotate_products, category_from_url)
+from core.upload import upload_products, upload_delta, settle_removed
+from core.pipeline import StreamingPipeline
+from core.scheduler import run_categories, ScrapeFailed
+from core.page_fingerprints import PageFingerprintStore
+from core.render_profile import RenderProfile, install_render_hooks
+from core.datasource import DataSource
+from core.metrics import metrics
+from core.offload import cleaning_pool
+from core.browser_pool import BrowserPool
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +56,25 @@ load_dotenv()
 TEST_MODE = False  # Set to False for production scraping
 ENABLE_EMBEDDING = True  # Set to True when backend is ready
 ENABLE_DB_UPLOAD = True  # Set to True when ready to upload to database
+EMBEDDER = os.getenv("EMBEDDER", "remote")  # 'remote' (backend), 'hashing' (in-process, no model) or 'sentence-transformers'
+EMBEDDING_BATCH_SIZE = 64  # Texts per embedding request (batch route only)
+EMBEDDING_CONCURRENCY = 4  # Embedding requests in flight at once
+ENABLE_EMBEDDING_CACHE = True  # Set to False to bypass the on-disk embedding cache
+DELTA_UPLOAD = True  # Only upload products that changed since the last run
+UPLOAD_CONCURRENCY = 4  # Upload batches in flight at once (batch size adapts automatically)
+CATEGORY_CONCURRENCY = 3  # Categories scraped at once
+CATEGORY_RETRIES = 1  # Extra attempts for a category that fails or returns no products
+BROWSER_PAGES = CATEGORY_CONCURRENCY  # Warm browser pages reused across categories; also caps the renders in flight
+PAGE_RECYCLE_AFTER = 50  # Navigations before a page is closed and replaced, to cap its memory
+COLUMNAR_OUTPUT = True  # Also write typed columns (.parquet/.npz) and a float32 .embeddings.npy matrix
+PAGE_FINGERPRINTS = True  # Record each category page's products in cache/pages.sqlite (probed only with FAST_REFRESH)
+FAST_REFRESH = False  # Replay pages the site reports unchanged instead of rendering them (hourly refreshes)
+DIRECT_EXTRACTION = False  # Read products from the page's JSON over plain HTTP first; falls back to the browser
+LIGHT_RENDERING = True  # Block images, media, fonts and third-party scripts while rendering listing pages
+SCROLL_DELAY = 0.5  # Seconds per scroll step; each infinite-scroll batch has to arrive within it
+CLEANING_WORKERS = 0  # Processes for JSON parsing and cleaning (None = one per core, 0 = on the event loop)
+
+STORE = 'shengsiong'  # Adapter name and metrics label
 
 # URLs
 URL_TO_SCRAPE = "https://shengsiong.com.sg/breakfast-spreads"
@@ -44,6 +94,14 @@ LIST_URL_TO_SCRAPE = [
     "https://shengsiong.com.sg/snacks-confectioneries"
 ]
 
+# Category page fingerprints and direct extraction, shared with ShengSiongAdapter
+page_store = PageFingerprintStore(fast_refresh=FAST_REFRESH) if PAGE_FINGERPRINTS else None
+# Categories are infinite-scroll pages; check that the plain-HTTP page carries the whole category before enabling
+data_source = DataSource() if DIRECT_EXTRACTION else None
+# Listing pages are read, not looked at: the light profile skips images, fonts and trackers
+render_profile = RenderProfile(first_party_hosts=('shengsiong.com.sg',), scroll_delay=SCROLL_DELAY) if LIGHT_RENDERING \
+    else RenderProfile.full()
+
 # CSS selectors for Sheng Siong
 css_schema = {
     "name": "base", 
@@ -60,6 +118,7 @@ css_schema = {
 def clean_and_filter_products(raw_products, page_url):
     """Clean and filter products extracted via CSS selectors"""
     cleaned_products = []
+    seen = set()
     
     for raw_product in raw_products:
         # Extract fields
@@ -74,32 +133,25 @@ def clean_and_filter_products(raw_products, page_url):
             continue
             
         # Clean name
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = clean_whitespace(name)
         
         # Validate and format price
-        price_match = re.search(r'\$(\d+(?:,\d{3})*(?:\.\d{2})?)', price)
-        if not price_match:
+        price = format_price(price, require_sign=True)
+        if not price:
             continue
-        price = f"${price_match.group(1)}"
         
         # Clean quantity
         if quantity:
-            quantity = re.sub(r'\s+', ' ', quantity).strip()
+            quantity = clean_whitespace(quantity)
         
         # Clean promotion
         if promotion:
-            promotion = re.sub(r'\s+', ' ', promotion).strip()
+            promotion = clean_whitespace(promotion)
         
         # Construct product URL from name and quantity
-        slug = name.lower()
-        slug = re.sub(r'[^\w\s-]', '', slug)
-        slug = re.sub(r'[-\s]+', '-', slug)
-        slug = slug.strip('-')
-        
+        slug = slugify(name)
         if quantity:
-            qty_clean = re.sub(r'[^\w]', '-', quantity.lower())
-            slug = f"{slug}-{qty_clean}"
-            slug = re.sub(r'-+', '-', slug).strip('-')
+            slug = join_slug(slug, quantity_slug(quantity))
         
         product_url = f"https://shengsiong.com.sg/product/{slug}"
         
@@ -110,13 +162,12 @@ def clean_and_filter_products(raw_products, page_url):
             else:
                 image_url = f"https://shengsiong.com.sg/{image_url}"
         
-        # Check for duplicates
-        duplicate = any(
-            existing['name'].lower() == name.lower() and existing['price'] == price
-            for existing in cleaned_products
-        )
-        if duplicate:
-            continue
+        # Check for duplicates (only skip if both name and price match; O(1) set lookup)
+        key = dedup_key(name, price)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
         
         cleaned_products.append({
             'name': name,
@@ -130,135 +181,94 @@ def clean_and_filter_products(raw_products, page_url):
             'embedding': None
         })
     
-    return cleaned_products
+    return annotate_products(cleaned_products, category=category_from_url(page_url))
 
 async def scrape_url(crawler, url, config):
-    """Scrape a single URL and return products"""
-    try:
-        results = await crawler.arun(url, config=config)
+    """Scrape a single URL and return products; raises ScrapeFailed if the page failed to render"""
+    async def render():
+        if data_source:
+            with metrics.span('direct', store=STORE):
+                rows, _ = await data_source.extract(url)
+            if rows:
+                products = await cleaning_pool.run(clean_and_filter_products, rows, url)
+                metrics.inc('pages_total', store=STORE, result='direct')
+                metrics.inc('products_total', len(products), store=STORE, stage='scraped')
+                return products, 0
+        with metrics.span('render', store=STORE):
+            results = await crawler.arun(url, config=config)
         products = []
         
-        for result in results:
-            if hasattr(result, "success") and result.success:
-                print(f"✅ Successfully scraped: {result.url}")
-                
-                data = json.loads(result.extracted_content)
-                if isinstance(data, list) and len(data) > 0:
-                    raw_products = clean_and_filter_products(data, result.url)
-                    products.extend(raw_products)
-                    print(f"📦 Found {len(raw_products)} products")
-            else:
-                print(f"❌ Failed to scrape: {url}")
-                
+        with metrics.span('extract', store=STORE):
+            for result in results:
+                if hasattr(result, "success") and result.success:
+                    print(f"✅ Successfully scraped: {result.url}")
+                    metrics.inc('page_bytes_total', len(result.html or ''), store=STORE)
+
+                    raw_products = await cleaning_pool.clean_page(clean_and_filter_products,
+                                                                  result.extracted_content, result.url)
+                    if raw_products is not None:
+                        products.extend(raw_products)
+                        metrics.inc('pages_total', store=STORE, result='ok')
+                        print(f"📦 Found {len(raw_products)} products")
+                    else:
+                        metrics.inc('pages_total', store=STORE, result='empty')
+                else:
+                    metrics.inc('pages_total', store=STORE, result='failed')
+                    print(f"❌ Failed to scrape: {url}")
+                    raise ScrapeFailed(f"page failed to render: {getattr(result, 'error_message', '')}", products)
+
+        metrics.inc('products_total', len(products), store=STORE, stage='scraped')
+        return products, 0
+
+    try:
+        if page_store:
+            products, _ = await page_store.fetch(url, render)
+        else:
+            products, _ = await render()
         return products
     except Exception as e:
         print(f"⚠️ Error scraping {url}: {e}")
-        return []
-
-async def add_embeddings(products):
-    """Add embeddings to products via backend API"""
-    if not ENABLE_EMBEDDING:
-        return
-        
-    for product in products:
-        embedding_input = f"{product.get('name', '')} {product.get('quantity', '')} {product.get('price', '')}"
-        
-        try:
-            response = await asyncio.to_thread(
-                requests.post,
-                "http://localhost:3000/products/embed-text",
-                headers={
-                    'Content-Type': 'application/json',
-                    'X-API-Key': os.getenv("JWT_SECRET")
-                },
-                json={"text": embedding_input},
-                timeout=60,
-            )
-            if response.status_code == 200:
-                output = response.json()
-                product["embedding"] = output.get('embedding')
-            else:
-                print(f"⚠️ Embedding failed for: {product.get('name', 'Unknown')}")
-        except Exception as e:
-            print(f"⚠️ Embedding request failed: {e}")
+        raise
 
 async def upload_to_database(products):
-    """Upload products to database in batches"""
-    if not ENABLE_DB_UPLOAD or not products:
-        return
-        
-    BATCH_SIZE = 5
-    total_batches = math.ceil(len(products) / BATCH_SIZE)
-    
-    print(f"🚀 Uploading {len(products)} products in {total_batches} batches...")
-    
-    success_count = 0
-    for i in range(0, len(products), BATCH_SIZE):
-        batch = products[i:i + BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        
-        try:
-            response = await asyncio.to_thread(
-                requests.post,
-                "http://localhost:3000/products/upload",
-                headers={
-                    'Content-Type': 'application/json',
-                    'X-API-Key': os.getenv("JWT_SECRET")
-                },
-                json=batch,
-                timeout=120,
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ Batch {batch_num}/{total_batches} uploaded")
-                success_count += len(batch)
-            else:
-                print(f"⚠️ Batch {batch_num} failed: {response.status_code}")
-                
-        except Exception as e:
-            print(f"⚠️ Batch {batch_num} upload failed: {e}")
-            
-        await asyncio.sleep(1)  # Rate limiting
-    
-    print(f"🎉 Upload completed: {success_count}/{len(products)} products uploaded")
+    """Upload one pipeline batch (only new/changed products when DELTA_UPLOAD is on)"""
+    if DELTA_UPLOAD:
+        # Removed products are settled once after the run, when the full catalogue is known
+        await upload_delta('Sheng Siong', products, full_run=False, concurrency=UPLOAD_CONCURRENCY)
+    else:
+        await upload_products(products, concurrency=UPLOAD_CONCURRENCY)
 
-def save_products(products):
-    """Save products to CSV and JSON files"""
-    if not products:
-        print("⚠️ No products to save")
-        return
-        
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Save to CSV
-    csv_file = os.path.join(script_dir, "shengsiong_products.csv")
-    csv_columns = ['name', 'supermarket', 'quantity', 'price', 'promotion_description', 
-                   'promotion_end_date_text', 'product_url', 'image_url', 'embedding']
-    
-    with open(csv_file, mode='w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=csv_columns)
-        writer.writeheader()
-        for product in products:
-            cleaned_product = {col: product.get(col, '') for col in csv_columns}
-            writer.writerow(cleaned_product)
+def make_crawl_config():
+    """Crawler settings for one Sheng Siong category page"""
+    return CrawlerRunConfig(
+        extraction_strategy=JsonCssExtractionStrategy(css_schema, verbose=False),
+        verbose=False,
+        remove_overlay_elements=True,
+        **render_profile.run_kwargs(),
+        page_timeout=60000,
+    )
 
-    # Save to JSON
-    json_file = os.path.join(script_dir, "shengsiong_products.json")
-    with open(json_file, mode='w', encoding='utf-8') as f:
-        json.dump(products, f, indent=2, ensure_ascii=False)
+class ShengSiongAdapter(StoreAdapter):
+    """Sheng Siong for run_all.py: one infinite-scroll page per category"""
+    name = STORE
+    supermarket = 'Sheng Siong'
+    css_schema = css_schema
+    urls = LIST_URL_TO_SCRAPE
+    test_urls = [URL_TO_SCRAPE]
+    page_store = page_store
+    data_source = data_source
+    render_profile = render_profile
 
-    print(f"✅ Saved {len(products)} products to:")
-    print(f"   📄 CSV: {csv_file}")
-    print(f"   📄 JSON: {json_file}")
-    
-    # Show sample products
-    print(f"\n📦 Sample products:")
-    for i, product in enumerate(products[:3]):
-        print(f"   {i+1}. {product['name']} - {product['price']} ({product['quantity']})")
-        print(f"      URL: {product['product_url']}")
+    def crawl_config(self):
+        return make_crawl_config()
+
+    def clean_and_filter_products(self, raw_products, page_url):
+        return clean_and_filter_products(raw_products, page_url)
 
 async def main():
+    metrics.report_at_exit(STORE)
+    metrics.watch_event_loop()
+    cleaning_pool.configure(CLEANING_WORKERS)
     print("🚀 Starting Sheng Siong Product Scraper")
     print("=" * 50)
     
@@ -270,14 +280,7 @@ async def main():
         urls_to_scrape = LIST_URL_TO_SCRAPE
     
     # Configure crawler
-    crawl_config = CrawlerRunConfig(
-        scan_full_page=True,
-        scroll_delay=1.0,
-        extraction_strategy=JsonCssExtractionStrategy(css_schema, verbose=False),
-        verbose=False,
-        remove_overlay_elements=True,
-        page_timeout=60000,
-    )
+    crawl_config = make_crawl_config()
     
     browser_config = BrowserConfig(
         headless=True,
@@ -286,27 +289,63 @@ async def main():
         user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     )
     
-    # Scrape products
-    all_products = []
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        for url in urls_to_scrape:
-            print(f"\n🔍 Scraping: {url}")
-            products = await scrape_url(crawler, url, crawl_config)
-            all_products.extend(products)
+    # Each category is embedded, uploaded and appended to shengsiong_products.ndjson/.csv
+    # as soon as it is scraped; nothing keeps the whole catalogue
+    writer = ProductWriter("shengsiong_products")
+    with make_embedder(EMBEDDER, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY,
+                       use_cache=ENABLE_EMBEDDING and ENABLE_EMBEDDING_CACHE) as client:
+        async def embed(products):
+            await client.embed_products(products)
+            metrics.inc('products_total', sum(1 for p in products if p.get('embedding')), store=STORE, stage='embedded')
+
+        pipeline = StreamingPipeline(
+            embed=embed if ENABLE_EMBEDDING else None,
+            upload=upload_to_database if ENABLE_DB_UPLOAD else None,
+            embed_batch_size=EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY,
+            # The same SKU is listed in several categories; keep its first occurrence
+            dedup=Deduplicator(),
+            sink=writer.write,
+            collect=False,
+            name=STORE,
+        )
+
+        # Scrape products (bounded parallel categories, failed categories retried)
+        async with BrowserPool(browser_config, size=BROWSER_PAGES, recycle_after=PAGE_RECYCLE_AFTER) as crawler:
+            install_render_hooks(crawler)
+            async with pipeline:
+                async def scrape(url):
+                    try:
+                        products = await scrape_url(crawler, url, crawl_config)
+                    except ScrapeFailed as e:
+                        await pipeline.put(e.products)
+                        raise
+                    await pipeline.put(products)
+                    return products
+
+                print(f"\n🔄 Scraping {len(urls_to_scrape)} categories (max {CATEGORY_CONCURRENCY} concurrent)...")
+                failed = set()
+                await run_categories(urls_to_scrape, scrape, concurrency=CATEGORY_CONCURRENCY,
+                                     retries=CATEGORY_RETRIES, keep_results=False, failed=failed)
     
-    print(f"\n📊 Total products found: {len(all_products)}")
+    print(f"\n📊 Total products found: {writer.count}")
+    print(render_profile.summary())
+    print(crawler.summary())
+    print(cleaning_pool.summary())
+    cleaning_pool.close()
+    if client.cache:
+        print(client.cache.summary())
+        client.cache.close()
+    if page_store:
+        print(page_store.summary())
+        page_store.close()
     
-    if all_products:
-        # Add embeddings if enabled
-        if ENABLE_EMBEDDING:
-            print("🔗 Adding embeddings...")
-            await add_embeddings(all_products)
-        
-        # Save products
-        save_products(all_products)
-        
-        # Upload to database if enabled
-        await upload_to_database(all_products)
+    writer.close()
+    if COLUMNAR_OUTPUT and writer.count:
+        save_columnar(writer.reader(), writer.basename)
+    
+    # Only a complete run can tell which products disappeared
+    if ENABLE_DB_UPLOAD and DELTA_UPLOAD and not TEST_MODE and not failed:
+        await settle_removed('Sheng Siong', [p['product_url'] for p in writer.reader()])
     
     print(f"\n{'='*50}")
     print("🏁 Scraper finished!")
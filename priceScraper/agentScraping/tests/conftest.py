@@ -0,0 +1,4 @@
+import os, sys
+
+# Tests import the scraper modules the way the entry scripts do (core.*, run_all)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from core.embedding import EmbeddingClient
+from core.stub_backend import start_stub_backend, fake_embedding
+
+TEXTS = [f"Product {i}" for i in range(10)]
+
+@pytest.fixture
+def backend():
+    servers = []
+
+    def start(**settings):
+        server, url = start_stub_backend(**{'latency': 0, 'per_item_latency': 0, **settings})
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def embed(client, texts=TEXTS):
+    async def run():
+        with client:
+            return await client.embed_texts(texts)
+    return asyncio.run(run())
+
+def test_batch_route_that_disappears_after_the_probe_falls_back_to_single_texts(backend):
+    server, url = backend()
+    client = EmbeddingClient(url, batch_size=3, concurrency=2)
+    post = client._post
+
+    def post_then_drop_batch_route(path, payload):
+        response = post(path, payload)
+        server.RequestHandlerClass.settings['batch'] = False
+        return response
+
+    client._post = post_then_drop_batch_route
+    assert embed(client) == [fake_embedding(t) for t in TEXTS]
+    assert client.batch_supported is False
+
+def test_probe_chunk_with_no_answer_is_retried_once_the_batch_route_is_missing(backend):
+    server, url = backend(batch=False)
+    client = EmbeddingClient(url, batch_size=3, concurrency=2)
+    post, calls = client._post, []
+
+    def refuse_first_request(path, payload):
+        calls.append(path)
+        if len(calls) == 1:
+            raise ConnectionError("connection reset")
+        return post(path, payload)
+
+    client._post = refuse_first_request
+    assert embed(client) == [fake_embedding(t) for t in TEXTS]
+    assert calls[:2] == ["/products/embed-batch", "/products/embed-batch"]
+    assert client.stats['failed'] == 0
+
+def test_injected_errors_leave_only_the_failed_chunks_empty(backend):
+    server, url = backend(error_rate=0.3, seed=2)
+    client = EmbeddingClient(url, batch_size=2, concurrency=2)
+    embeddings = embed(client)
+    assert len(embeddings) == len(TEXTS)
+    assert all(e is None or e == fake_embedding(t) for t, e in zip(TEXTS, embeddings))
+    assert client.stats['failed'] == sum(1 for e in embeddings if e is None)
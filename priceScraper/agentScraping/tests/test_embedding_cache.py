@@ -0,0 +1,31 @@
+import os, time
+from core.embedding_cache import EmbeddingCache
+
+def last_used(path):
+    with EmbeddingCache(path) as cache:
+        return dict(cache.db.execute("SELECT key, last_used FROM embeddings"))
+
+def test_get_many_persists_last_used_without_close(tmp_path):
+    path = os.path.join(tmp_path, 'embeddings.sqlite')
+    with EmbeddingCache(path) as cache:
+        cache.put_many(["Milk 1 L $2.50"], [[0.25, 0.5]])
+    before = last_used(path)
+
+    time.sleep(0.01)
+    cache = EmbeddingCache(path)
+    assert cache.get_many(["Milk 1 L $2.50", "Eggs 10 pcs $3.20"]) == [[0.25, 0.5], None]
+    # A run that dies before close() still leaves the touched entries recently used
+    after = last_used(path)
+    cache.db.close()
+    assert after.keys() == before.keys()
+    assert all(after[key] > before[key] for key in before)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    with EmbeddingCache(os.path.join(tmp_path, 'embeddings.sqlite'), max_entries=2) as cache:
+        cache.put_many(["a", "b"], [[1.0], [2.0]])
+        time.sleep(0.01)
+        cache.get_many(["a"])
+        time.sleep(0.01)
+        cache.put_many(["c"], [[3.0]])
+        assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+        assert cache.evictions == 1
@@ -0,0 +1,44 @@
+import asyncio
+from core.page_fingerprints import PageFingerprintStore
+
+URL = "https://example.com/category/1.html"
+
+def fetch(store, products):
+    renders = []
+
+    async def render():
+        renders.append(URL)
+        return [dict(p) for p in products], 3
+
+    result = asyncio.run(store.fetch(URL, render))
+    return result, len(renders)
+
+def test_normal_runs_render_without_probing(tmp_path, monkeypatch):
+    store = PageFingerprintStore(str(tmp_path / 'pages.sqlite'))
+    probes = []
+    monkeypatch.setattr(store, 'probe', lambda url, previous: probes.append(url) or (True, '"v1"', None))
+    (products, page_count), renders = fetch(store, [{'name': 'Milk'}])
+    assert (products, page_count, renders) == ([{'name': 'Milk'}], 3, 1)
+    assert probes == []
+    store.close()
+
+def test_fast_refresh_replays_a_page_whose_probe_matches(tmp_path, monkeypatch):
+    store = PageFingerprintStore(str(tmp_path / 'pages.sqlite'), fast_refresh=True)
+    monkeypatch.setattr(store, 'probe', lambda url, previous: (previous is not None, '"v1"', None))
+    fetch(store, [{'name': 'Milk'}])
+    (products, page_count), renders = fetch(store, [{'name': 'Changed'}])
+    assert renders == 0
+    assert (products, page_count) == ([{'name': 'Milk', 'embedding': None}], 3)
+    assert store.stats['replayed'] == 1
+    store.close()
+
+def test_normal_runs_keep_the_last_probed_validators(tmp_path, monkeypatch):
+    path = str(tmp_path / 'pages.sqlite')
+    store = PageFingerprintStore(path, fast_refresh=True)
+    monkeypatch.setattr(store, 'probe', lambda url, previous: (False, '"v1"', 'Mon, 12 Oct 2026 08:00:00 GMT'))
+    fetch(store, [{'name': 'Milk'}])
+    store.fast_refresh = False
+    fetch(store, [{'name': 'Milk', 'price': '$2'}])
+    assert store.previous(URL)['etag'] == '"v1"'
+    assert store.previous(URL)['last_modified'] == 'Mon, 12 Oct 2026 08:00:00 GMT'
+    store.close()
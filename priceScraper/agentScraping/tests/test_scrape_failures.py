@@ -0,0 +1,106 @@
+import json, asyncio, functools
+from types import SimpleNamespace
+import pytest
+from core import upload
+from core.adapter import StoreAdapter
+from core.scheduler import run_categories, ScrapeFailed
+from core.snapshot import SnapshotStore
+
+GOOD = "https://example.com/category/fruit"
+BAD = "https://example.com/category/dairy"
+
+def rows(url, count):
+    return [{'name': f"{url.rsplit('/', 1)[-1]} {i}", 'product_url': f"{url}/p/{i}"} for i in range(count)]
+
+def result(url, count=2, success=True):
+    return SimpleNamespace(success=success, url=url, html='<html></html>',
+                           extracted_content=json.dumps(rows(url, count)) if success else None)
+
+class FakeCrawler:
+    """arun() answers with prepared results per URL"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def arun(self, url, config=None):
+        return self.pages[url]
+
+class FakeStore(StoreAdapter):
+    name = 'teststore'
+    supermarket = 'Test Store'
+
+    def crawl_config(self):
+        return None
+
+    def clean_and_filter_products(self, raw_products, page_url):
+        return [dict(row, supermarket=self.supermarket, embedding=[0.5]) for row in raw_products]
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'snapshot.sqlite')
+    monkeypatch.setattr(upload, 'SnapshotStore', functools.partial(SnapshotStore, path))
+    return path
+
+def run_store(crawler, urls):
+    """What run_all.py does for one store: stream the categories, settle removed products only if none failed"""
+    adapter = FakeStore()
+    streamed, failed = [], set()
+
+    async def on_page(products):
+        streamed.extend(products)
+
+    async def run():
+        await run_categories(urls, lambda url: adapter.scrape_category(crawler, url, on_page=on_page),
+                             retries=1, keep_results=False, failed=failed)
+        if not failed:
+            await upload.settle_removed(adapter.supermarket, [p['product_url'] for p in streamed])
+    asyncio.run(run())
+    return streamed, failed
+
+def test_a_failed_page_raises_with_the_products_that_rendered():
+    crawler = FakeCrawler({BAD: [result(BAD, 3), result(BAD, success=False)]})
+    streamed = []
+
+    async def on_page(products):
+        streamed.extend(products)
+
+    with pytest.raises(ScrapeFailed) as failure:
+        asyncio.run(FakeStore().scrape_category(crawler, BAD, on_page=on_page))
+    assert len(failure.value.products) == 3
+    assert streamed == failure.value.products
+
+def test_partly_failed_category_is_reported_and_nothing_is_settled(snapshot_path):
+    with SnapshotStore(snapshot_path) as snapshot:
+        snapshot.record(FakeStore().clean_and_filter_products(rows(GOOD, 2) + rows(BAD, 4), ''))
+
+    # Some of dairy's products still come back, so a product count alone would call the run complete
+    crawler = FakeCrawler({GOOD: [result(GOOD, 2)], BAD: [result(BAD, 2), result(BAD, success=False)]})
+    streamed, failed = run_store(crawler, [GOOD, BAD])
+
+    assert failed == {BAD}
+    assert {p['product_url'] for p in streamed} == {p['product_url'] for p in rows(GOOD, 2) + rows(BAD, 2)}
+    with SnapshotStore(snapshot_path) as snapshot:
+        assert len(snapshot.removed('Test Store', [])) == 6
+
+def test_complete_run_settles_removed_products(snapshot_path):
+    with SnapshotStore(snapshot_path) as snapshot:
+        snapshot.record(FakeStore().clean_and_filter_products(rows(GOOD, 3), ''))
+
+    streamed, failed = run_store(FakeCrawler({GOOD: [result(GOOD, 2)]}), [GOOD])
+
+    assert failed == set()
+    with SnapshotStore(snapshot_path) as snapshot:
+        assert [r['product_url'] for r in snapshot.removed('Test Store', [])] == [f"{GOOD}/p/0", f"{GOOD}/p/1"]
+
+def test_a_retry_that_succeeds_clears_the_failure():
+    attempts = []
+
+    async def scrape(url):
+        attempts.append(url)
+        if len(attempts) == 1:
+            raise ScrapeFailed("page 2 failed to render", [{'name': 'Partial'}])
+        return [{'name': 'Full'}, {'name': 'Catalogue'}]
+
+    failed = set()
+    counts = asyncio.run(run_categories([GOOD], scrape, retries=1, keep_results=False, failed=failed))
+    assert counts == [2] and failed == set()
@@ -0,0 +1,105 @@
+import json, asyncio
+from collections import deque
+import pytest
+from core import upload
+from core.upload import AdaptiveUploader, MAX_RETRIES
+from core.stub_backend import start_stub_backend
+
+def products(count, start=0):
+    return [{'name': f"Product {i}", 'supermarket': 'Sheng Siong', 'quantity': f"{100 + i} g",
+             'price': f"${1 + i % 50}.00", 'product_url': f"https://example.com/p/{i}", 'embedding': [0.5]}
+            for i in range(start, start + count)]
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(upload, 'retry_after_seconds', lambda response, attempt: 0.0)
+
+@pytest.fixture
+def backend():
+    servers = []
+
+    def start(**settings):
+        server, url = start_stub_backend(**{'latency': 0, 'per_item_latency': 0, **settings})
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def run_upload(url, items, **kwargs):
+    async def run():
+        with AdaptiveUploader(url, **kwargs) as uploader:
+            return await uploader.upload(items), uploader
+    return asyncio.run(run())
+
+def test_retries_injected_errors_until_every_batch_is_accepted(backend):
+    server, url = backend(error_rate=0.1, seed=1)
+    items = products(200)
+    uploaded, uploader = run_upload(url, items, concurrency=4, initial_batch_size=10)
+    assert sorted(p['product_url'] for p in uploaded) == sorted(p['product_url'] for p in items)
+    assert server.stats['errors'] > 0
+    assert uploader.retries == server.stats['errors']
+    assert server.stats['uploaded'] == len(items)
+
+def test_gives_up_after_max_retries(backend):
+    server, url = backend(error_rate=1.0)
+    uploaded, uploader = run_upload(url, products(5), concurrency=1, initial_batch_size=5)
+    assert uploaded == []
+    assert uploader.retries == MAX_RETRIES
+    assert server.stats['requests'] == MAX_RETRIES + 1
+
+def test_400_is_split_down_to_the_rejected_product(backend):
+    server, url = backend()
+    items = products(16)
+    items[0]['quantity'] = ''
+    uploaded, uploader = run_upload(url, items, concurrency=1, initial_batch_size=16)
+    assert [p['product_url'] for p in uploaded] == [p['product_url'] for p in items[1:]]
+    assert server.stats['uploaded'] == 15
+    assert uploader.retries == 0
+
+def test_413_splits_the_batch_and_shrinks_later_ones(backend):
+    server, url = backend(max_upload_bytes=2000)
+    items = products(40)
+    uploaded, uploader = run_upload(url, items, concurrency=1, initial_batch_size=40)
+    assert len(uploaded) == len(items)
+    assert server.stats['uploaded'] == len(items)
+    assert uploader.target_bytes <= 2000 * 2
+    assert uploader.batch_size < 40
+
+def test_batches_stay_under_the_target_body_size():
+    uploader = AdaptiveUploader(target_bytes=1000, initial_batch_size=100)
+    queue = deque((p, json.dumps(p).encode('utf-8')) for p in products(50))
+    batch = uploader._next_batch(queue)
+    assert 1 < len(batch) < 50
+    assert 2 + sum(len(e) + 1 for _, e in batch) <= 1000
+    assert len(batch) + len(queue) == 50
+    uploader.close()
+
+def test_batch_size_follows_latency():
+    uploader = AdaptiveUploader(target_latency=1.0, initial_batch_size=20, max_batch_size=40)
+    uploader._adapt(0.1)
+    assert uploader.batch_size == 30
+    uploader._adapt(0.1)
+    uploader._adapt(0.1)
+    assert uploader.batch_size == 40
+    uploader._adapt(0.7)
+    assert uploader.batch_size == 40
+    uploader._adapt(2.0)
+    assert uploader.batch_size == 20
+    uploader.close()
+
+def test_elapsed_adds_up_over_uploads(backend):
+    server, url = backend(latency=0.05)
+
+    async def run():
+        with AdaptiveUploader(url, concurrency=1, initial_batch_size=5) as uploader:
+            await uploader.upload(products(5))
+            first = uploader.elapsed
+            await uploader.upload(products(5, start=5))
+            return first, uploader.elapsed
+
+    first, total = asyncio.run(run())
+    assert first >= 0.05
+    assert total >= first + 0.05
@@ -0,0 +1,134 @@
+import os, time, asyncio, threading
+import pytest
+from core.work_queue import SqliteQueue, RedisQueue, MemoryRedis, MAX_ATTEMPTS, work
+
+RUN = 'test'
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def make_queue(request, tmp_path):
+    """Factory of queues on one shared backend, one per worker process in real use"""
+    client = MemoryRedis()
+    queues = []
+
+    def make(**settings):
+        if request.param == 'sqlite':
+            queue = SqliteQueue(os.path.join(tmp_path, 'queue.sqlite'), **settings)
+        else:
+            queue = RedisQueue(client, **settings)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+def tasks(count, store='coldstorage'):
+    return [{'store': store, 'url': f"https://example.com/c/{i}"} for i in range(count)]
+
+def test_put_queues_each_task_once(make_queue):
+    queue = make_queue()
+    assert queue.put(RUN, tasks(3)) == 3
+    assert queue.put(RUN, [{'url': "https://example.com/c/1", 'store': 'coldstorage'}, *tasks(1, 'fairprice')]) == 1
+    assert queue.stats(RUN)['queued'] == 4
+
+def test_expired_lease_is_leased_again(make_queue):
+    queue = make_queue()
+    queue.put(RUN, tasks(1))
+    [(task_id, task)] = queue.lease(RUN, 'w1', seconds=0.05)
+    assert queue.lease(RUN, 'w2', seconds=5) == []
+    time.sleep(0.1)
+    assert queue.lease(RUN, 'w2', seconds=5) == [(task_id, task)]
+    assert queue.stats(RUN)['leased'] == 1
+
+def test_extended_lease_does_not_expire(make_queue):
+    queue = make_queue()
+    queue.put(RUN, tasks(1))
+    [(task_id, _)] = queue.lease(RUN, 'w1', seconds=0.2)
+    time.sleep(0.1)
+    queue.extend(RUN, 'w1', [task_id], seconds=5)
+    time.sleep(0.15)
+    assert queue.lease(RUN, 'w2') == []
+    assert queue.complete(RUN, 'w1', task_id, [{'name': 'Milk'}])
+
+def test_late_complete_returns_false(make_queue):
+    queue = make_queue()
+    queue.put(RUN, tasks(1))
+    [(task_id, _)] = queue.lease(RUN, 'w1', seconds=0.05)
+    time.sleep(0.1)
+    queue.lease(RUN, 'w2', seconds=5)
+    assert not queue.complete(RUN, 'w1', task_id, [{'name': 'Stale'}])
+    assert queue.complete(RUN, 'w2', task_id, [{'name': 'Fresh'}])
+    assert list(queue.results(RUN, 'coldstorage')) == [{'name': 'Fresh'}]
+    assert queue.stats(RUN)['done'] == 1
+
+def test_failed_task_goes_to_another_worker(make_queue):
+    queue = make_queue()
+    queue.put(RUN, tasks(1))
+    [(task_id, task)] = queue.lease(RUN, 'w1')
+    assert queue.lease(RUN, 'w2') == []
+    queue.fail(RUN, 'w1', task_id, 'boom')
+    assert queue.lease(RUN, 'w1') == []
+    assert queue.lease(RUN, 'w2') == [(task_id, task)]
+
+def test_lone_worker_retries_after_the_retry_delay(make_queue):
+    queue = make_queue(retry_seconds=0.05)
+    queue.put(RUN, tasks(1))
+    [(task_id, task)] = queue.lease(RUN, 'w1')
+    queue.fail(RUN, 'w1', task_id, 'boom')
+    assert queue.lease(RUN, 'w1') == []
+    time.sleep(0.1)
+    assert queue.lease(RUN, 'w1') == [(task_id, task)]
+
+def test_gives_up_after_max_attempts(make_queue):
+    queue = make_queue(retry_seconds=0)
+    queue.put(RUN, tasks(1))
+    for attempt in range(MAX_ATTEMPTS):
+        [(task_id, _)] = queue.lease(RUN, 'w1')
+        queue.fail(RUN, 'w1', task_id, f"boom {attempt}")
+    assert queue.lease(RUN, 'w1') == []
+    assert queue.stats(RUN) == {'queued': 0, 'leased': 0, 'done': 0, 'failed': 1, 'products': 0}
+    assert queue.failures(RUN) == [(tasks(1)[0], f"boom {MAX_ATTEMPTS - 1}")]
+
+def test_follow_ups_are_queued_once(make_queue):
+    queue = make_queue()
+    queue.put(RUN, tasks(2))
+    leased = queue.lease(RUN, 'w1', count=2)
+    page_2 = {'store': 'coldstorage', 'url': "https://example.com/c/0", 'page': 2}
+    for task_id, _ in leased:
+        assert queue.complete(RUN, 'w1', task_id, [{'name': f"Product {task_id}"}], [page_2])
+    assert [task for _, task in queue.lease(RUN, 'w1', count=5)] == [page_2]
+    assert queue.put(RUN, [page_2]) == 0
+    assert queue.stats(RUN)['products'] == 2
+
+def test_each_task_is_leased_once_across_workers(make_queue):
+    make_queue().put(RUN, tasks(60))
+    queues = [make_queue() for _ in range(4)]
+    leased = []
+
+    def worker(queue, name):
+        while batch := queue.lease(RUN, name, count=3):
+            leased.extend(task_id for task_id, _ in batch)
+            for task_id, _ in batch:
+                assert queue.complete(RUN, name, task_id, [{'id': task_id}])
+
+    threads = [threading.Thread(target=worker, args=(queue, f"w{i}")) for i, queue in enumerate(queues)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased) == sorted(set(leased)) and len(leased) == 60
+    assert queues[0].stats(RUN)['done'] == 60
+
+def test_single_worker_retries_a_failed_task_without_waiting_a_lease(make_queue):
+    queue = make_queue(retry_seconds=0.05)
+    queue.put(RUN, tasks(2))
+    failed = set()
+
+    async def handle(task):
+        if task['url'] not in failed:
+            failed.add(task['url'])
+            raise RuntimeError("page did not load")
+        return [{'url': task['url']}], []
+
+    stats = asyncio.run(asyncio.wait_for(work(queue, RUN, handle, 'w1', concurrency=2, poll_interval=0.01), 5))
+    assert stats == {'done': 2, 'failed': 2, 'lost': 0, 'products': 2}